@@ -0,0 +1,342 @@
+"""
+Accumulators cộng dồn theo ngày cho drift / IV / KS-AUC.
+
+Mọi bins đều cố định theo reference profile (drift_bins, breaks WOE, lưới score), nên
+counts của từng partition (một ngày) cộng được với nhau:
+- drift: counts theo PSI bins (+ lưới KS / Wasserstein cho numeric) của mỗi cột
+- IV: good / bad theo slot bin WOE (woe_engine.bin_counts, bad = target == 0)
+- KS / AUC / Gini: ScoreHistogram theo class
+
+Mỗi ngày chỉ quét dữ liệu của ngày đó một lần (`accumulate`), lưu ra JSON nhỏ
+(`AccumulatorStore`); metrics monthly / rolling-N-ngày = cộng counts đã lưu rồi tính
+(`drift_table`, `iv_table`, `MonitoringAccumulator.score.result()`), không đọc lại raw rows.
+Kết quả trùng với tính trực tiếp trên toàn bộ dữ liệu của khoảng đó (drift theo drift_engine,
+IV theo breaks cố định; KS / AUC theo histogram, xem StreamingDiscrimination).
+
+So sánh với nhiều reference trong một run (`reference_drift_table`): current được gán bin và
+đếm một lần, mỗi reference (baseline của profile, kỳ trước, N kỳ gần nhất) chỉ khác counts
+phía reference, lấy từ accumulators đã lưu (`AccumulatorStore.previous`: các tháng / ngày
+liền trước period YYYYMM / YYYYMMDD; `preceding`: cùng số ngày trước một khoảng ngày bất kỳ).
+
+Accumulator chỉ merge được với accumulator cùng spec_id (cùng profile + breaks + lưới score).
+"""
+import hashlib
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .data_loader import period_bounds
+from .drift_engine import ColumnBins, assign_bins, batch_counts, batch_drift_from_counts, drift_from_counts
+from .metrics import woe_engine
+from .metrics.discrimination import ScoreHistogram
+from .metrics.scorecard_binning import BAD_LABEL, WOEBinning, prepare_binning_frame
+from .reference_profile import load_reference_profile
+
+
+@dataclass
+class AccumulatorSpec:
+    """Bins cố định cho accumulators của một model (suy ra từ reference profile)."""
+    spec_id: str
+    drift_bins: Dict[str, ColumnBins]
+    woe_breaks: Dict[str, list]
+    target_column: str
+    predict_column: str
+    score_bins: int = 10_000
+    score_range: Tuple[float, float] = (0.0, 1.0)
+
+
+def spec_from_profile(
+    profile_path: str,
+    target_column: str,
+    predict_column: str,
+    woe_breaks: Optional[Dict[str, list]] = None,
+    score_bins: int = 10_000,
+    score_range: Tuple[float, float] = (0.0, 1.0),
+) -> AccumulatorSpec:
+    """
+    Spec từ reference profile. woe_breaks mặc định = breaks của WOE bins trong profile
+    (truyền breaks artifact của scorecard nếu có).
+    """
+    profile = load_reference_profile(profile_path)
+    if woe_breaks is None:
+        woe_breaks = WOEBinning(profile.woe_bins, list(profile.woe_bins)).breaks_list
+    score_range = (float(score_range[0]), float(score_range[1]))
+    h = hashlib.sha256()
+    h.update(profile.fingerprint.encode())
+    h.update(json.dumps(
+        [target_column, predict_column, woe_breaks, score_bins, score_range], sort_keys=True, default=str,
+    ).encode())
+    return AccumulatorSpec(
+        spec_id=h.hexdigest()[:16],
+        drift_bins=profile.drift_bins,
+        woe_breaks=woe_breaks,
+        target_column=target_column,
+        predict_column=predict_column,
+        score_bins=score_bins,
+        score_range=score_range,
+    )
+
+
+def _merge_arrays(left: Dict[str, np.ndarray], right: Dict[str, np.ndarray]) -> None:
+    for key, value in right.items():
+        if key not in left:
+            left[key] = value.copy()
+        elif left[key].shape != value.shape:
+            raise ValueError(f"Cannot merge counts of '{key}': shape {left[key].shape} != {value.shape}")
+        else:
+            left[key] = left[key] + value
+
+
+@dataclass
+class MonitoringAccumulator:
+    """
+    Counts của một hoặc nhiều period (YYYYMMDD). woe_counts[f] là ma trận (2 x slot):
+    hàng 0 = good, hàng 1 = bad. score = None nếu period chưa có labels / score.
+    """
+    spec_id: str
+    periods: List[str] = field(default_factory=list)
+    n_rows: int = 0
+    drift_counts: Dict[str, np.ndarray] = field(default_factory=dict)
+    grid_counts: Dict[str, np.ndarray] = field(default_factory=dict)
+    n_missing: Dict[str, int] = field(default_factory=dict)
+    woe_counts: Dict[str, np.ndarray] = field(default_factory=dict)
+    score: Optional[ScoreHistogram] = None
+
+    def merge(self, other: "MonitoringAccumulator") -> "MonitoringAccumulator":
+        if other.spec_id != self.spec_id:
+            raise ValueError(f"Cannot merge accumulators with different spec_id ({self.spec_id} != {other.spec_id})")
+        overlap = set(self.periods) & set(other.periods)
+        if overlap:
+            raise ValueError(f"Periods counted twice: {sorted(overlap)}")
+        self.periods = sorted(self.periods + other.periods)
+        self.n_rows += other.n_rows
+        _merge_arrays(self.drift_counts, other.drift_counts)
+        _merge_arrays(self.grid_counts, other.grid_counts)
+        _merge_arrays(self.woe_counts, other.woe_counts)
+        for key, value in other.n_missing.items():
+            self.n_missing[key] = self.n_missing.get(key, 0) + value
+        if other.score is not None:
+            if self.score is None:
+                self.score = ScoreHistogram(other.score.n_bins, other.score.score_range)
+            self.score.merge(other.score)
+        return self
+
+    def to_dict(self) -> Dict:
+        return {
+            "spec_id": self.spec_id,
+            "periods": self.periods,
+            "n_rows": self.n_rows,
+            "drift_counts": {k: v.tolist() for k, v in self.drift_counts.items()},
+            "grid_counts": {k: v.tolist() for k, v in self.grid_counts.items()},
+            "n_missing": self.n_missing,
+            "woe_counts": {k: v.tolist() for k, v in self.woe_counts.items()},
+            "score": self.score.to_dict() if self.score is not None else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "MonitoringAccumulator":
+        arrays = lambda d: {k: np.asarray(v, dtype=np.int64) for k, v in d.items()}
+        return cls(
+            spec_id=data["spec_id"],
+            periods=list(data["periods"]),
+            n_rows=int(data["n_rows"]),
+            drift_counts=arrays(data["drift_counts"]),
+            grid_counts=arrays(data["grid_counts"]),
+            n_missing={k: int(v) for k, v in data["n_missing"].items()},
+            woe_counts=arrays(data["woe_counts"]),
+            score=ScoreHistogram.from_dict(data["score"]) if data.get("score") else None,
+        )
+
+
+def accumulate(spec: AccumulatorSpec, df: pd.DataFrame, period: str) -> MonitoringAccumulator:
+    """Counts của một partition (vd. một ngày) `df` đã ghép features + labels + score."""
+    acc = MonitoringAccumulator(spec_id=spec.spec_id, periods=[str(period)], n_rows=len(df))
+
+    for column, bins in spec.drift_bins.items():
+        if column not in df.columns:
+            continue
+        psi_codes, grid_codes = assign_bins(bins, df[column])
+        acc.drift_counts[column] = np.bincount(psi_codes[psi_codes >= 0], minlength=bins.n_psi_bins)
+        if bins.has_grid:
+            acc.grid_counts[column] = np.bincount(grid_codes[grid_codes >= 0], minlength=bins.n_grid_bins)
+        acc.n_missing[column] = int((psi_codes < 0).sum())
+
+    target, prediction = spec.target_column, spec.predict_column
+    if target in df.columns and df[target].notna().any():
+        frame, used = prepare_binning_frame(df, target, list(spec.woe_breaks))
+        counts = woe_engine.bin_counts(frame, target, {f: spec.woe_breaks[f] for f in used}, positive=BAD_LABEL)
+        acc.woe_counts = {f: np.vstack([good, bad]) for f, (good, bad) in counts.items()}
+        if prediction in df.columns:
+            acc.score = ScoreHistogram(spec.score_bins, spec.score_range).update(
+                df[target].to_numpy(dtype=float, na_value=np.nan),
+                df[prediction].to_numpy(dtype=float, na_value=np.nan),
+            )
+    return acc
+
+
+def drift_table(spec: AccumulatorSpec, acc: MonitoringAccumulator) -> pd.DataFrame:
+    """Drift của mỗi cột (so với reference) từ counts đã cộng dồn."""
+    rows = []
+    for column, counts in acc.drift_counts.items():
+        stats = drift_from_counts(spec.drift_bins[column], counts, acc.grid_counts.get(column))
+        rows.append({
+            "column": column,
+            "n_rows": int(stats["n_rows"][0]),
+            "n_missing": acc.n_missing.get(column, 0),
+            **{k: float(stats[k][0]) for k in ("psi", "ks", "ks_pvalue", "wasserstein")},
+        })
+    return pd.DataFrame(rows, columns=["column", "n_rows", "n_missing", "psi", "ks", "ks_pvalue", "wasserstein"])
+
+
+def flat_counts(spec: AccumulatorSpec, acc: MonitoringAccumulator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Counts của acc theo layout phẳng của batch_counts trên spec.drift_bins
+    (cột không có trong acc -> counts 0, drift của cột đó = NaN).
+    """
+    psi, grid = [], []
+    for column, bins in spec.drift_bins.items():
+        psi.append(acc.drift_counts.get(column, np.zeros(bins.n_psi_bins, dtype=np.int64)))
+        if bins.has_grid:
+            grid.append(acc.grid_counts.get(column, np.zeros(bins.n_grid_bins, dtype=np.int64)))
+    return (
+        np.concatenate(psi) if psi else np.zeros(0, dtype=np.int64),
+        np.concatenate(grid) if grid else np.zeros(0, dtype=np.int64),
+    )
+
+
+def reference_drift_table(
+    spec: AccumulatorSpec,
+    df: pd.DataFrame,
+    references: Dict[str, Optional[MonitoringAccumulator]],
+    with_pvalue: bool = True,
+) -> pd.DataFrame:
+    """
+    Drift của current `df` so với nhiều reference: current được gán bin + đếm một lần
+    (batch_counts theo spec.drift_bins), mỗi reference chỉ đổi counts phía reference.
+
+    Args:
+        references: {tên: accumulator}; None = baseline (counts của reference profile)
+
+    Return:
+        DataFrame dài [reference, column, n_rows, n_reference, psi, ks, ks_pvalue, wasserstein]
+    """
+    columns = ["reference", "column", "n_rows", "n_reference", "psi", "ks", "ks_pvalue", "wasserstein"]
+    bins = [b for c, b in spec.drift_bins.items() if c in df.columns]
+    if not bins or not references:
+        return pd.DataFrame(columns=columns)
+    psi_counts, grid_counts = batch_counts(bins, df)
+    in_df = [c in df.columns for c in spec.drift_bins]
+    psi_mask = np.repeat(in_df, [b.n_psi_bins for b in spec.drift_bins.values()])
+    grid_mask = np.repeat(
+        [keep for keep, b in zip(in_df, spec.drift_bins.values()) if b.has_grid],
+        [b.n_grid_bins for b in spec.drift_bins.values() if b.has_grid],
+    )
+
+    frames = []
+    for name, acc in references.items():
+        reference = None
+        if acc is not None:
+            ref_psi, ref_grid = flat_counts(spec, acc)
+            reference = (ref_psi[psi_mask], ref_grid[grid_mask])
+        stats = batch_drift_from_counts(bins, psi_counts, grid_counts, with_pvalue, reference=reference)
+        frames.append(pd.DataFrame({
+            "reference": name,
+            "column": [b.column for b in bins],
+            **{k: stats[k][0] for k in columns[2:]},
+        }))
+    table = pd.concat(frames, ignore_index=True)
+    table[["n_rows", "n_reference"]] = table[["n_rows", "n_reference"]].astype(np.int64)
+    return table[columns]
+
+
+def iv_table(acc: MonitoringAccumulator) -> pd.DataFrame:
+    """[feature, iv] sort giảm dần (cùng dạng WOEBinning.iv)."""
+    features = list(acc.woe_counts)
+    values = [woe_engine.iv_from_counts(*acc.woe_counts[f]) for f in features]
+    return (
+        pd.DataFrame({"feature": features, "iv": values})
+        .sort_values("iv", ascending=False, kind="stable")
+        .reset_index(drop=True)
+    )
+
+
+class AccumulatorStore:
+    """
+    Accumulators theo ngày trên disk: <directory>/<spec_id>/<YYYYMMDD>.json.
+    Ghi lại cùng ngày sẽ thay file cũ (vd. khi labels của ngày đó về muộn).
+    """
+
+    def __init__(self, directory, spec_id: str):
+        self.directory = Path(directory) / spec_id
+        self.spec_id = spec_id
+
+    def path(self, period: str) -> Path:
+        return self.directory / f"{period}.json"
+
+    def save(self, acc: MonitoringAccumulator) -> str:
+        if acc.spec_id != self.spec_id or len(acc.periods) != 1:
+            raise ValueError("AccumulatorStore only stores single-period accumulators of its own spec")
+        path = self.path(acc.periods[0])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Ghi ra file tạm rồi rename để không để lại file hỏng nếu bị ngắt giữa chừng
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(acc.to_dict(), f, separators=(",", ":"))
+        tmp.replace(path)
+        return str(path)
+
+    def load(self, period: str) -> MonitoringAccumulator:
+        with open(self.path(period), "r", encoding="utf-8") as f:
+            return MonitoringAccumulator.from_dict(json.load(f))
+
+    def periods(self) -> List[str]:
+        return sorted(p.stem for p in self.directory.glob("*.json"))
+
+    def merge_periods(self, periods: List[str]) -> MonitoringAccumulator:
+        """Cộng accumulators của các ngày có trong store; ngày thiếu được cảnh báo và bỏ qua."""
+        stored = set(self.periods())
+        missing = [p for p in periods if p not in stored]
+        if missing:
+            print(f"  ⚠ No accumulator for {len(missing)} period(s): {missing[:5]}{' ...' if len(missing) > 5 else ''}")
+        acc = MonitoringAccumulator(spec_id=self.spec_id)
+        for period in periods:
+            if period in stored:
+                acc.merge(self.load(period))
+        return acc
+
+    def window(self, end_period: str, days: int = 30) -> MonitoringAccumulator:
+        """Rolling window `days` ngày kết thúc tại end_period (YYYYMMDD)."""
+        end = pd.to_datetime(end_period, format="%Y%m%d")
+        dates = pd.date_range(end - pd.Timedelta(days=days - 1), end, freq="D")
+        return self.merge_periods([d.strftime("%Y%m%d") for d in dates])
+
+    def month(self, month: str) -> MonitoringAccumulator:
+        """Cả tháng (YYYYMM)."""
+        start, end = period_bounds(month)
+        return self.merge_periods([d.strftime("%Y%m%d") for d in pd.date_range(start, end, freq="D")])
+
+    def preceding(self, start, end, n_periods: int = 1) -> MonitoringAccumulator:
+        """
+        N kỳ liền trước khoảng ngày [start, end] (không gồm khoảng đó); một kỳ dài bằng khoảng:
+        trọn tháng -> cùng số tháng, ngược lại cùng số ngày. Dùng làm reference "kỳ trước" /
+        trailing window của current phủ [start, end].
+        """
+        start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+        if start.is_month_start and end.is_month_end:
+            n_months = (end.year - start.year) * 12 + end.month - start.month + 1
+            first = (start.to_period("M") - n_months * n_periods).start_time
+        else:
+            first = start - pd.Timedelta(days=((end - start).days + 1) * n_periods)
+        days = pd.date_range(first, start - pd.Timedelta(days=1), freq="D")
+        return self.merge_periods([d.strftime("%Y%m%d") for d in days])
+
+    def previous(self, period: str, n_periods: int = 1) -> MonitoringAccumulator:
+        """
+        N kỳ liền trước `period` (không gồm period): YYYYMM -> N tháng trước,
+        YYYYMMDD -> N ngày trước (preceding trên khoảng ngày của period).
+        """
+        return self.preceding(*period_bounds(str(period)), n_periods=n_periods)
@@ -0,0 +1,233 @@
+"""
+Backfill monitoring cho nhiều period.
+
+- Current data được chia theo period (từ timestamp_column) MỘT lần.
+- Reference được ghép (features + labels + score) và profile được tính / load
+  MỘT lần, dùng chung cho mọi period; reference được gửi tới mỗi worker một lần
+  (pool initializer).
+- Các period chạy song song trên process pool.
+- Period nào đã có manifest với cùng input hash (current data của period +
+  reference + config) và đủ các file report thì được bỏ qua.
+- Accumulators theo ngày của toàn bộ current được ghi MỘT lần trước khi chạy các period
+  (accumulators.write_current) -> drift so với kỳ trước / trailing của mỗi period không
+  phụ thuộc thứ tự hoàn thành của worker.
+
+Reference / current được đọc theo config (data_loader.load_monitoring_data, cùng nguồn với
+một lần chạy đơn lẻ); current chỉ đọc khoảng [period đầu, period cuối].
+
+Usage:
+    python -m src.monitoring.backfill --config data/dummy_data/monitoring_config.yaml \\
+        --start 20260101 --end 20260131 --freq D --workers 4
+"""
+import argparse
+import json
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from src.monitoring.data_loader import load_monitoring_data
+from src.monitoring.pipeline import GenericModelMonitor
+from src.monitoring.reference_profile import fingerprint_frames
+
+MANIFEST_NAME = "_manifest.json"
+PERIOD_FORMATS = {"D": "%Y%m%d", "M": "%Y%m"}
+
+
+def expand_periods(start: str, end: str, freq: str = "M") -> List[str]:
+    """Danh sách period từ start tới end (bao gồm), theo định dạng của PERIOD_FORMATS."""
+    if freq == "D":
+        return list(pd.date_range(pd.to_datetime(start), pd.to_datetime(end), freq="D").strftime(PERIOD_FORMATS["D"]))
+    return list(pd.period_range(pd.Period(start, freq="M"), pd.Period(end, freq="M"), freq="M").strftime(PERIOD_FORMATS["M"]))
+
+
+def period_keys(df: pd.DataFrame, timestamp_column: str, freq: str = "M") -> pd.Series:
+    """Period key cho từng dòng (timestamp dạng YYYYMMDD hoặc datetime)."""
+    ts = df[timestamp_column]
+    if not pd.api.types.is_datetime64_any_dtype(ts):
+        ts = pd.to_datetime(ts.astype(str), format="%Y%m%d", errors="coerce")
+    return ts.dt.strftime(PERIOD_FORMATS[freq])
+
+
+def partition_by_period(df: pd.DataFrame, timestamp_column: str, freq: str = "M") -> Dict[str, pd.DataFrame]:
+    """Chia DataFrame theo period trong một lần groupby."""
+    keys = period_keys(df, timestamp_column, freq)
+    return {period: df.iloc[idx] for period, idx in keys.groupby(keys).indices.items()}
+
+
+def _period_dir(monitor: GenericModelMonitor, period: str) -> Path:
+    return Path(monitor.base_path) / monitor.output_dir / period
+
+
+def read_manifest(monitor: GenericModelMonitor, period: str) -> Optional[Dict]:
+    path = _period_dir(monitor, period) / MANIFEST_NAME
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def is_up_to_date(monitor: GenericModelMonitor, period: str, input_hash: str) -> bool:
+    manifest = read_manifest(monitor, period)
+    if manifest is None or manifest.get("input_hash") != input_hash:
+        return False
+    period_dir = _period_dir(monitor, period)
+    return all((period_dir / name).exists() for name in manifest.get("reports", []))
+
+
+def write_manifest(monitor: GenericModelMonitor, period: str, input_hash: str) -> None:
+    period_dir = _period_dir(monitor, period)
+    # Report HTML, hoặc Parquet kết quả ở chế độ metrics_only
+    reports = sorted(
+        p.name for p in period_dir.glob(f"{monitor.model_name}_{period}_*") if p.suffix in (".html", ".parquet")
+    )
+    manifest = {
+        "period": period,
+        "input_hash": input_hash,
+        "reports": reports,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    with open(period_dir / MANIFEST_NAME, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+# ---- worker process: reference được gửi một lần qua initializer ----
+_WORKER_STATE: Dict = {}
+
+
+def _init_worker(monitor: GenericModelMonitor, reference: Dict[str, pd.DataFrame]):
+    _WORKER_STATE["monitor"] = monitor
+    _WORKER_STATE["reference"] = reference
+
+
+def _run_period(period: str, current: Dict[str, pd.DataFrame], run_kwargs: Dict):
+    monitor = _WORKER_STATE["monitor"]
+    try:
+        output = monitor.run_monitoring(period=period, **_WORKER_STATE["reference"], **current, **run_kwargs)
+        return "ok", output
+    except Exception:
+        return "error", traceback.format_exc()
+
+
+def run_backfill(
+    monitor: GenericModelMonitor,
+    periods: List[str],
+    ref_features: pd.DataFrame,
+    ref_labels: pd.DataFrame,
+    ref_score: pd.DataFrame,
+    cur_features: pd.DataFrame,
+    cur_labels: pd.DataFrame,
+    cur_score: pd.DataFrame,
+    freq: str = "M",
+    max_workers: int = 1,
+    force: bool = False,
+    **run_kwargs,
+) -> Dict[str, Optional[str]]:
+    """
+    Chạy run_monitoring cho nhiều period.
+
+    Args:
+        monitor: GenericModelMonitor đã khởi tạo
+        periods: danh sách period (định dạng theo freq: YYYYMMDD cho "D", YYYYMM cho "M")
+        ref_*: 3 DataFrames reference (dùng chung cho mọi period)
+        cur_*: 3 DataFrames current chứa nhiều period (chia theo timestamp_column)
+        freq: "D" (daily) hoặc "M" (monthly)
+        max_workers: số process chạy song song các period (1 = tuần tự)
+        force: chạy lại kể cả khi report đã up-to-date
+        run_kwargs: flags truyền thêm cho run_monitoring (data_quality, drift, ...)
+
+    Return:
+        dict period -> output path (hoặc None nếu bỏ qua / lỗi)
+    """
+    ts_col = monitor.timestamp_column
+    print(f"\n▶ Backfill {len(periods)} periods (freq={freq}, workers={max_workers})")
+
+    # Reference: ghép một lần; profile tính / load một lần, định danh bằng tên file (content hash)
+    ref_df = monitor.build_aligned_frame(ref_features, labels_df=ref_labels, score_df=ref_score)
+    reference_profile = monitor.get_reference_profile(ref_features, ref_labels, ref_score, ref_df=ref_df)
+    run_kwargs = {**run_kwargs, "reference_profile": reference_profile}
+    config_hash = fingerprint_frames(settings={"config": monitor.config, "run": run_kwargs})
+
+    # Current: chia theo period một lần
+    parts = {
+        name: partition_by_period(df, ts_col, freq)
+        for name, df in (("cur_features", cur_features), ("cur_labels", cur_labels), ("cur_score", cur_score))
+    }
+
+    results: Dict[str, Optional[str]] = {}
+    todo = []
+    for period in periods:
+        if period not in parts["cur_features"]:
+            print(f"  [{period}] no current data, skip")
+            results[period] = None
+            continue
+        current = {name: parts[name].get(period, df.iloc[0:0]) for name, df in
+                   (("cur_features", cur_features), ("cur_labels", cur_labels), ("cur_score", cur_score))}
+        input_hash = fingerprint_frames(*current.values(), settings={"config": config_hash})
+        if not force and is_up_to_date(monitor, period, input_hash):
+            print(f"  [{period}] up-to-date, skip")
+            results[period] = str(_period_dir(monitor, period))
+            continue
+        todo.append((period, current, input_hash))
+
+    if todo and monitor.write_accumulators and run_kwargs.get("use_reference_profile", True):
+        cur_df = monitor.build_aligned_frame(cur_features, labels_df=cur_labels, score_df=cur_score)
+        monitor.accumulate_current(reference_profile, cur_df)
+    run_kwargs = {**run_kwargs, "accumulate_current": False}
+
+    reference = {"ref_features": ref_features, "ref_labels": ref_labels, "ref_score": ref_score, "ref_df": ref_df}
+    if max_workers <= 1 or len(todo) <= 1:
+        _init_worker(monitor, reference)
+        outcomes = [(period, input_hash, _run_period(period, current, run_kwargs)) for period, current, input_hash in todo]
+    else:
+        # Period đã chạy song song -> các stage trong mỗi period chạy tuần tự
+        worker_kwargs = {**run_kwargs, "parallel": False}
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(monitor, reference)) as pool:
+            futures = [(period, input_hash, pool.submit(_run_period, period, current, worker_kwargs))
+                       for period, current, input_hash in todo]
+            outcomes = [(period, input_hash, future.result()) for period, input_hash, future in futures]
+
+    for period, input_hash, (status, payload) in outcomes:
+        if status == "ok":
+            write_manifest(monitor, period, input_hash)
+            results[period] = payload.html_path or str(_period_dir(monitor, period))
+        else:
+            print(f"  [{period}] FAILED:\n{payload}")
+            results[period] = None
+
+    n_failed = sum(1 for _, _, (status, _) in outcomes if status != "ok")
+    print(f"\n✅ Backfill done: {len(outcomes) - n_failed} ran, {n_failed} failed, "
+          f"{len(periods) - len(outcomes)} skipped")
+    return {period: results.get(period) for period in periods}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill monitoring reports for many periods.")
+    parser.add_argument("--config", required=True, help="monitoring_config.yaml")
+    parser.add_argument("--periods", nargs="*", help="danh sách period (YYYYMMDD hoặc YYYYMM)")
+    parser.add_argument("--start", help="period bắt đầu (khi không truyền --periods)")
+    parser.add_argument("--end", help="period kết thúc (khi không truyền --periods)")
+    parser.add_argument("--freq", choices=list(PERIOD_FORMATS), default="M")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--force", action="store_true", help="chạy lại kể cả period đã up-to-date")
+    args = parser.parse_args()
+
+    periods = args.periods or expand_periods(args.start, args.end, args.freq)
+    monitor = GenericModelMonitor(args.config)
+
+    # Cùng nguồn dữ liệu với run đơn lẻ: path trong config (baseline.reference_*, data.current_*)
+    ref = load_monitoring_data(monitor.config, "reference", base_path=monitor.base_path)
+    cur = load_monitoring_data(
+        monitor.config, "current", period=min(periods), period_end=max(periods), base_path=monitor.base_path
+    )
+    frames = {f"{side}_{kind}": df for side, dfs in (("ref", ref), ("cur", cur))
+              for kind, df in zip(("features", "labels", "score"), dfs)}
+
+    run_backfill(monitor, periods, freq=args.freq, max_workers=args.workers, force=args.force, **frames)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Scorecard breaks artifact.
+
+Breaks WOE của scorecard production (đúng breaks lúc train model) được đóng băng thành một
+artifact có version, thay vì học lại breaks từ reference ở mỗi lần chạy (chậm, và kết quả
+đổi theo mẫu reference). Khi config có `scorecard.breaks_artifact`, IVSummaryMetric và
+BasicWOEMetric chỉ gán bin theo breaks cố định (searchsorted / lookup, O(rows)) cho current
+và reference -> không có bước fitting nào.
+
+Format:
+- .json:
+    {
+      "format_version": 1,
+      "version": "20260127",            # version của scorecard (vd. baseline_id)
+      "created_at": "2026-01-27T08:00:00",
+      "breaks": {"AGE_AT_CUTOFF": ["24.0", "29.0", "inf"], "REGION": ["HN%,%MT", "HCM"]}
+    }
+- .parquet: bảng dài [feature, position, break]; format_version / version / created_at
+  nằm trong schema metadata.
+
+Breaks cùng format với breaks_list của scorecardpy / woe_engine (string, "%,%" nối nhóm
+categorical, "missing" nếu missing được gộp vào bin), nên có thể export trực tiếp từ bins
+lúc train (`breaks_from_bins`).
+
+Config:
+    scorecard:
+      breaks_artifact: "artifacts/dummy_data/scorecard_breaks_20260127.json"
+      breaks_artifact_version: "20260127"  # optional: báo lỗi nếu artifact khác version
+"""
+import hashlib
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Tăng khi thay đổi format file artifact
+BREAKS_FORMAT_VERSION = 1
+
+
+@dataclass(frozen=True)
+class ScorecardBreaks:
+    version: str
+    breaks: Dict[str, List[str]]
+    created_at: Optional[str] = field(default=None, compare=False)
+
+    @property
+    def features(self) -> List[str]:
+        return list(self.breaks)
+
+    @property
+    def breaks_list(self) -> Dict[str, List[str]]:
+        # Cùng interface với WOEBinning.breaks_list -> dùng được làm `reference` khi binning
+        return self.breaks
+
+    def fingerprint(self) -> str:
+        """Hash của version + breaks (đưa vào settings / nội dung của reference profile)."""
+        payload = json.dumps({"version": self.version, "breaks": self.breaks}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def breaks_from_bins(bins: Dict, version: str) -> ScorecardBreaks:
+    """Artifact từ bins WOE (woe_engine / scorecardpy), vd. bins lúc train scorecard."""
+    from .metrics.scorecard_binning import extract_breaks_from_bins
+
+    breaks = {f: [str(b) for b in v] for f, v in extract_breaks_from_bins(bins).items()}
+    return ScorecardBreaks(version=str(version), breaks=breaks, created_at=datetime.now().isoformat(timespec="seconds"))
+
+
+def _check_format(format_version, path) -> None:
+    if int(format_version) > BREAKS_FORMAT_VERSION:
+        raise ValueError(
+            f"Breaks artifact {path} has format_version {format_version}, "
+            f"this version supports up to {BREAKS_FORMAT_VERSION}"
+        )
+
+
+def _write_json(artifact: ScorecardBreaks, path: Path) -> None:
+    payload = {
+        "format_version": BREAKS_FORMAT_VERSION,
+        "version": artifact.version,
+        "created_at": artifact.created_at,
+        "breaks": artifact.breaks,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+
+
+def _read_json(path: Path) -> ScorecardBreaks:
+    with open(path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    _check_format(payload.get("format_version", 1), path)
+    breaks = {feat: [str(b) for b in values] for feat, values in payload["breaks"].items()}
+    return ScorecardBreaks(version=str(payload["version"]), breaks=breaks, created_at=payload.get("created_at"))
+
+
+def _write_parquet(artifact: ScorecardBreaks, path: Path) -> None:
+    rows = [(feat, k, b) for feat, values in artifact.breaks.items() for k, b in enumerate(values)]
+    table = pa.table({
+        "feature": pa.array([r[0] for r in rows], pa.string()),
+        "position": pa.array([r[1] for r in rows], pa.int32()),
+        "break": pa.array([r[2] for r in rows], pa.string()),
+    })
+    metadata = {
+        b"format_version": str(BREAKS_FORMAT_VERSION).encode(),
+        b"version": artifact.version.encode(),
+        b"created_at": (artifact.created_at or "").encode(),
+    }
+    pq.write_table(table.replace_schema_metadata(metadata), path)
+
+
+def _read_parquet(path: Path) -> ScorecardBreaks:
+    table = pq.read_table(path, columns=["feature", "position", "break"])
+    metadata = table.schema.metadata or {}
+    if b"version" not in metadata:
+        raise ValueError(f"Breaks artifact {path} has no 'version' in schema metadata")
+    _check_format(metadata.get(b"format_version", b"1").decode(), path)
+    rows = sorted(zip(*(table.column(c).to_pylist() for c in ("feature", "position", "break"))), key=lambda r: r[1])
+    breaks: Dict[str, List[str]] = {}
+    for feat in dict.fromkeys(table.column("feature").to_pylist()):
+        breaks[feat] = []
+    for feat, _, b in rows:
+        breaks[feat].append(b)
+    created_at = metadata.get(b"created_at", b"").decode() or None
+    return ScorecardBreaks(version=metadata[b"version"].decode(), breaks=breaks, created_at=created_at)
+
+
+def save_breaks_artifact(artifact: ScorecardBreaks, path) -> str:
+    """Ghi artifact (.json hoặc .parquet theo đuôi file)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Ghi ra file tạm rồi rename để không để lại artifact hỏng nếu bị ngắt giữa chừng
+    tmp = path.with_name(path.name + ".tmp")
+    if path.suffix.lower() == ".parquet":
+        _write_parquet(artifact, tmp)
+    else:
+        _write_json(artifact, tmp)
+    tmp.replace(path)
+    return str(path)
+
+
+@lru_cache(maxsize=8)
+def _load_cached(path: str, mtime_ns: int) -> ScorecardBreaks:
+    p = Path(path)
+    return _read_parquet(p) if p.suffix.lower() == ".parquet" else _read_json(p)
+
+
+def load_breaks_artifact(path, expected_version: Optional[str] = None) -> ScorecardBreaks:
+    """
+    Load artifact (cache trong process theo path + mtime).
+    Nếu có `expected_version` mà artifact khác version -> ValueError.
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Breaks artifact not found: {path}")
+    artifact = _load_cached(str(path), path.stat().st_mtime_ns)
+    if expected_version is not None and artifact.version != str(expected_version):
+        raise ValueError(
+            f"Breaks artifact {path} is version {artifact.version!r}, config expects {str(expected_version)!r}"
+        )
+    return artifact
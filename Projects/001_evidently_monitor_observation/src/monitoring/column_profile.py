@@ -0,0 +1,169 @@
+"""
+Column profiler cho data quality: một pass trên mỗi cột.
+
+Thay cho các metric Evidently riêng lẻ (DatasetMissingValueCount, DuplicatedRowCount,
+EmptyRowsCount, ConstantColumnsCount, DataSummaryPreset, DatasetCorrelations), mỗi metric
+quét lại toàn bộ frame cho cả current và reference. `profile_frame` đọc mỗi cột MỘT lần và
+tính cùng lúc:
+- missing (count / share theo cột, cột rỗng + số cột missing theo dòng -> empty rows)
+- số giá trị distinct: chính xác (nunique) khi frame <= exact_distinct_rows dòng,
+  ngược lại HyperLogLog (sai số ~ 1.04 / sqrt(2^precision), bộ nhớ cố định)
+- cột constant (<= 1 giá trị distinct, kiểm tra chính xác kể cả khi dùng HyperLogLog)
+- numeric: min / max / mean / std (ddof=1 như pandas) / quantiles
+Dòng trùng theo hash của cả dòng (pd.util.hash_pandas_object), correlation Pearson giữa các
+cột numeric. Metrics Evidently đọc chung một FrameProfile (metrics/DataProfileMetric.py).
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Frame lớn hơn -> distinct count bằng HyperLogLog
+EXACT_DISTINCT_ROWS = 1_000_000
+DEFAULT_QUANTILES = (0.25, 0.5, 0.75)
+PROFILE_COLUMNS = ["kind", "count", "missing", "missing_share", "n_unique", "unique_exact", "constant", "min", "max", "mean", "std"]
+
+
+class HyperLogLog:
+    """Distinct count xấp xỉ (HyperLogLog, hash 64-bit), cộng dồn được bằng merge."""
+
+    def __init__(self, precision: int = 14):
+        self.precision = int(precision)
+        self.registers = np.zeros(1 << self.precision, dtype=np.uint8)
+
+    def update(self, values) -> "HyperLogLog":
+        s = pd.Series(values)
+        s = s[s.notna()]
+        if not len(s):
+            return self
+        h = pd.util.hash_array(s.to_numpy()).astype(np.uint64)
+        p = self.precision
+        idx = (h >> np.uint64(64 - p)).astype(np.int64)
+        rest = h & np.uint64((1 << (64 - p)) - 1)
+        # rho = vị trí bit 1 đầu tiên của (64 - p) bit còn lại; frexp cho bit_length (chính xác đến 2^53)
+        bit_length = np.frexp(rest.astype(np.float64))[1]
+        rho = (64 - p - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rho)
+        return self
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.precision != self.precision:
+            raise ValueError(f"Cannot merge HyperLogLog with precision {other.precision} != {self.precision}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int((self.registers == 0).sum())
+        if estimate <= 2.5 * m and zeros:
+            # Small range: linear counting
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+@dataclass
+class FrameProfile:
+    """
+    Profile của một frame. columns: index = cột, PROFILE_COLUMNS + q<quantile> (numeric);
+    kind = "numeric" | "other". correlation: Pearson giữa các cột numeric (pairwise complete).
+    """
+    n_rows: int
+    n_missing: int
+    n_duplicated_rows: int
+    n_empty_rows: int
+    columns: pd.DataFrame
+    correlation: pd.DataFrame
+
+    @property
+    def n_columns(self) -> int:
+        return len(self.columns)
+
+    @property
+    def n_constant_columns(self) -> int:
+        return int(self.columns["constant"].sum())
+
+    @property
+    def n_empty_columns(self) -> int:
+        return int((self.columns["missing"] == self.n_rows).sum()) if self.n_rows else 0
+
+    @property
+    def missing_share(self) -> float:
+        cells = self.n_rows * self.n_columns
+        return self.n_missing / cells if cells else 0.0
+
+    def value(self, stat: str, column: Optional[str] = None) -> float:
+        """Giá trị của một stat: cấp frame (column=None) hoặc của một cột."""
+        if column is None:
+            return float(getattr(self, stat))
+        return float(self.columns.at[column, stat])
+
+
+def _is_constant(s: pd.Series, n_unique: int, exact: bool) -> bool:
+    if exact or n_unique > 2:
+        return n_unique <= 1
+    # HyperLogLog ước lượng ~1-2 giá trị -> kiểm tra chính xác với giá trị đầu tiên
+    values = s.dropna()
+    return bool(len(values) == 0 or (values == values.iloc[0]).all())
+
+
+def profile_frame(
+    df: pd.DataFrame,
+    numeric: Sequence[str] = (),
+    quantiles: Sequence[float] = DEFAULT_QUANTILES,
+    exact_distinct_rows: int = EXACT_DISTINCT_ROWS,
+    hll_precision: int = 14,
+) -> FrameProfile:
+    """
+    Profile mọi cột của `df`, mỗi cột một pass. Cột trong `numeric` (dtype số) có thêm
+    min / max / mean / std / quantiles.
+    """
+    n = len(df)
+    exact = n <= exact_distinct_rows
+    row_missing = np.zeros(n, dtype=np.int64)
+    q_names = [f"q{q:g}" for q in quantiles]
+    rows: Dict[str, Dict] = {}
+    numeric_cols: List[str] = []
+
+    for col in df.columns:
+        s = df[col]
+        missing = s.isna().to_numpy()
+        row_missing += missing
+        n_missing = int(missing.sum())
+        if exact:
+            n_unique = int(s.nunique(dropna=True))
+        else:
+            n_unique = HyperLogLog(hll_precision).update(s[~missing] if n_missing else s).count()
+        row = {
+            "kind": "other",
+            "count": n - n_missing,
+            "missing": n_missing,
+            "missing_share": n_missing / n if n else 0.0,
+            "n_unique": n_unique,
+            "unique_exact": exact,
+            "constant": _is_constant(s, n_unique, exact),
+        }
+        if col in numeric and pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            numeric_cols.append(col)
+            x = s.to_numpy(dtype=float, na_value=np.nan)[~missing]
+            row["kind"] = "numeric"
+            if len(x):
+                row.update(
+                    min=float(x.min()), max=float(x.max()), mean=float(x.mean()),
+                    std=float(x.std(ddof=1)) if len(x) > 1 else np.nan,
+                    **dict(zip(q_names, np.quantile(x, quantiles).tolist())),
+                )
+        rows[col] = row
+
+    columns = pd.DataFrame.from_dict(rows, orient="index").reindex(columns=PROFILE_COLUMNS + q_names)
+    row_hash = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return FrameProfile(
+        n_rows=n,
+        n_missing=int(columns["missing"].sum()) if len(columns) else 0,
+        n_duplicated_rows=int(n - len(pd.unique(row_hash))) if n else 0,
+        n_empty_rows=int((row_missing == df.shape[1]).sum()) if df.shape[1] else 0,
+        columns=columns,
+        correlation=df[numeric_cols].corr() if numeric_cols else pd.DataFrame(),
+    )
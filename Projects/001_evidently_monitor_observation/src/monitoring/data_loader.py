@@ -0,0 +1,272 @@
+"""
+Data loading theo config.
+
+Đọc features / labels / score cho reference hoặc current từ Parquet (pyarrow)
+với:
+- column projection: chỉ đọc id, timestamp, features_numeric, features_categorical,
+  target, prediction (tuỳ loại file)
+- predicate pushdown trên timestamp_column cho period được yêu cầu
+  (YYYYMMDD = một ngày, YYYYMM = cả tháng)
+- dtypes gọn: category cho categorical, float32 cho numeric features (data.float32)
+
+File .csv vẫn được hỗ trợ (cùng projection, lọc period sau khi đọc).
+iter_frame_batches / iter_score_batches đọc theo chunk cho các tính toán streaming.
+
+Config:
+    baseline:
+      reference_features / reference_dataset, reference_labels, reference_score
+    data:
+      current_features, current_labels, current_score
+      float32: true
+"""
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Nguồn path cho từng loại file; score fallback sang labels (file predictions chứa cả 2)
+_PATH_KEYS = {
+    "reference": {
+        "features": ("baseline", ["reference_features", "reference_dataset"]),
+        "labels": ("baseline", ["reference_labels"]),
+        "score": ("baseline", ["reference_score", "reference_labels"]),
+    },
+    "current": {
+        "features": ("data", ["current_features"]),
+        "labels": ("data", ["current_labels"]),
+        "score": ("data", ["current_score", "current_labels"]),
+    },
+}
+
+
+def _resolve_path(config: Dict, side: str, kind: str) -> str:
+    section, keys = _PATH_KEYS[side][kind]
+    values = config.get(section) or {}
+    for key in keys:
+        if values.get(key):
+            return values[key]
+    raise KeyError(f"No path for {side} {kind}: set one of {keys} in '{section}' section of config")
+
+
+def _resolve_full_path(config: Dict, side: str, kind: str, base_path: Optional[str]) -> Path:
+    path = Path(_resolve_path(config, side, kind))
+    if not path.is_absolute():
+        path = Path(base_path or config["base_path"]["path"]) / path
+    return path
+
+
+def _wanted_columns(config: Dict, kind: str) -> List[str]:
+    cols = config["columns"]
+    keys = [cols["id_column"], cols["timestamp_column"]]
+    if kind == "features":
+        return keys + list(cols["features_numeric"]) + list(cols["features_categorical"])
+    if kind == "labels":
+        return keys + [cols["target"]]
+    return keys + [cols["prediction"]]
+
+
+def period_bounds(period: str, period_end: Optional[str] = None) -> Tuple[pd.Timestamp, pd.Timestamp]:
+    """[start, end] (ngày) cho period YYYYMMDD hoặc YYYYMM; period_end mở rộng thành khoảng."""
+    def _bounds(p: str):
+        if len(p) == 6:
+            start = pd.to_datetime(p, format="%Y%m")
+            return start, start + pd.offsets.MonthEnd(0)
+        day = pd.to_datetime(p, format="%Y%m%d")
+        return day, day
+    start, end = _bounds(period)
+    if period_end is not None:
+        end = _bounds(period_end)[1]
+    return start, end
+
+
+def day_keys(values: pd.Series) -> pd.Series:
+    """YYYYMMDD của từng timestamp (int / string YYYYMMDD hoặc datetime); không parse được -> NaN."""
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        values = pd.to_datetime(values.astype(str), format="%Y%m%d", errors="coerce")
+    return values.dt.strftime("%Y%m%d")
+
+
+def _filter_values(field_type: pa.DataType, start: pd.Timestamp, end: pd.Timestamp):
+    """Giá trị filter khớp kiểu của timestamp column trong file (int YYYYMMDD, string hoặc date/timestamp)."""
+    if pa.types.is_integer(field_type):
+        return int(start.strftime("%Y%m%d")), int(end.strftime("%Y%m%d"))
+    if pa.types.is_string(field_type) or pa.types.is_large_string(field_type):
+        return start.strftime("%Y%m%d"), end.strftime("%Y%m%d")
+    if pa.types.is_date(field_type):
+        return start.date(), end.date()
+    return start, end + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+
+
+def _apply_dtypes(df: pd.DataFrame, config: Dict) -> pd.DataFrame:
+    cols = config["columns"]
+    for c in cols["features_categorical"]:
+        if c in df.columns:
+            df[c] = df[c].astype("category")
+    if (config.get("data") or {}).get("float32", True):
+        for c in cols["features_numeric"]:
+            if c in df.columns and pd.api.types.is_float_dtype(df[c]):
+                df[c] = df[c].astype("float32")
+    return df
+
+
+def _read_parquet(path: str, columns: List[str], timestamp_column: str, bounds) -> pd.DataFrame:
+    schema = pq.read_schema(path)
+    columns = [c for c in columns if c in schema.names]
+    filters = None
+    if bounds is not None and timestamp_column in schema.names:
+        lo, hi = _filter_values(schema.field(timestamp_column).type, *bounds)
+        filters = [(timestamp_column, ">=", lo), (timestamp_column, "<=", hi)]
+    return pd.read_parquet(path, engine="pyarrow", columns=columns, filters=filters)
+
+
+def _read_csv(path: str, columns: List[str], timestamp_column: str, bounds) -> pd.DataFrame:
+    header = pd.read_csv(path, nrows=0).columns
+    df = pd.read_csv(path, usecols=[c for c in columns if c in header])
+    if bounds is not None and timestamp_column in df.columns:
+        ts = pd.to_datetime(df[timestamp_column].astype(str), format="%Y%m%d", errors="coerce")
+        df = df[(ts >= bounds[0]) & (ts <= bounds[1])].reset_index(drop=True)
+    return df
+
+
+def load_frame(
+    config: Dict,
+    side: str,
+    kind: str,
+    period: Optional[str] = None,
+    period_end: Optional[str] = None,
+    base_path: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Đọc một frame (features / labels / score) cho reference hoặc current.
+
+    Args:
+        config: monitoring config đã load
+        side: "reference" hoặc "current"
+        kind: "features", "labels" hoặc "score"
+        period: YYYYMMDD hoặc YYYYMM; None = đọc toàn bộ
+        period_end: period kết thúc nếu muốn đọc một khoảng
+        base_path: gốc cho path tương đối (mặc định: base_path.path trong config)
+    """
+    path = _resolve_full_path(config, side, kind, base_path)
+    columns = _wanted_columns(config, kind)
+    timestamp_column = config["columns"]["timestamp_column"]
+    bounds = period_bounds(period, period_end) if period else None
+
+    if path.suffix.lower() == ".csv":
+        df = _read_csv(str(path), columns, timestamp_column, bounds)
+    else:
+        df = _read_parquet(str(path), columns, timestamp_column, bounds)
+    return _apply_dtypes(df, config)
+
+
+def _iter_parquet(path: str, columns: List[str], timestamp_column: str, bounds, batch_size: int):
+    dataset = ds.dataset(path, format="parquet")
+    columns = [c for c in columns if c in dataset.schema.names]
+    filter_expr = None
+    if bounds is not None and timestamp_column in dataset.schema.names:
+        lo, hi = _filter_values(dataset.schema.field(timestamp_column).type, *bounds)
+        filter_expr = (ds.field(timestamp_column) >= lo) & (ds.field(timestamp_column) <= hi)
+    for batch in dataset.to_batches(columns=columns, filter=filter_expr, batch_size=batch_size):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+def _iter_csv(path: str, columns: List[str], timestamp_column: str, bounds, batch_size: int):
+    header = pd.read_csv(path, nrows=0).columns
+    for chunk in pd.read_csv(path, usecols=[c for c in columns if c in header], chunksize=batch_size):
+        if bounds is not None and timestamp_column in chunk.columns:
+            ts = pd.to_datetime(chunk[timestamp_column].astype(str), format="%Y%m%d", errors="coerce")
+            chunk = chunk[(ts >= bounds[0]) & (ts <= bounds[1])].reset_index(drop=True)
+        if len(chunk):
+            yield chunk
+
+
+def iter_frame_batches(
+    config: Dict,
+    side: str,
+    kind: str,
+    columns: Optional[List[str]] = None,
+    period: Optional[str] = None,
+    period_end: Optional[str] = None,
+    base_path: Optional[str] = None,
+    batch_size: int = 500_000,
+):
+    """
+    Như load_frame nhưng đọc theo chunk (Parquet: theo record batches / row groups,
+    CSV: chunksize) để không phải giữ toàn bộ file trong bộ nhớ.
+    """
+    path = _resolve_full_path(config, side, kind, base_path)
+    columns = columns or _wanted_columns(config, kind)
+    timestamp_column = config["columns"]["timestamp_column"]
+    bounds = period_bounds(period, period_end) if period else None
+    reader = _iter_csv if path.suffix.lower() == ".csv" else _iter_parquet
+    return reader(str(path), columns, timestamp_column, bounds, batch_size)
+
+
+def _zip_batches(left, right):
+    """Ghép 2 luồng chunk theo vị trí dòng (kích thước chunk của 2 file có thể khác nhau)."""
+    left, right = iter(left), iter(right)
+    buf_left = buf_right = None
+    while True:
+        if buf_left is None or not len(buf_left):
+            buf_left = next(left, None)
+        if buf_right is None or not len(buf_right):
+            buf_right = next(right, None)
+        if buf_left is None or buf_right is None:
+            if buf_left is not None or buf_right is not None:
+                raise ValueError("labels and score files have different numbers of rows")
+            return
+        n = min(len(buf_left), len(buf_right))
+        yield buf_left.iloc[:n].reset_index(drop=True), buf_right.iloc[:n].reset_index(drop=True)
+        buf_left, buf_right = buf_left.iloc[n:], buf_right.iloc[n:]
+
+
+def iter_score_batches(
+    config: Dict,
+    side: str,
+    period: Optional[str] = None,
+    period_end: Optional[str] = None,
+    base_path: Optional[str] = None,
+    batch_size: int = 500_000,
+):
+    """
+    Chunk [id, timestamp, target, prediction] cho streaming KS / AUC.
+    Nếu labels và score là cùng một file thì đọc một lần; nếu khác file thì 2 file phải
+    cùng thứ tự dòng (kiểm tra id + timestamp từng chunk).
+    """
+    cols = config["columns"]
+    keys = [cols["id_column"], cols["timestamp_column"]]
+    target, prediction = cols["target"], cols["prediction"]
+    labels_path = _resolve_full_path(config, side, "labels", base_path)
+    score_path = _resolve_full_path(config, side, "score", base_path)
+    kwargs = dict(period=period, period_end=period_end, base_path=base_path, batch_size=batch_size)
+
+    if labels_path == score_path:
+        yield from iter_frame_batches(config, side, "labels", columns=keys + [target, prediction], **kwargs)
+        return
+
+    labels = iter_frame_batches(config, side, "labels", columns=keys + [target], **kwargs)
+    scores = iter_frame_batches(config, side, "score", columns=keys + [prediction], **kwargs)
+    for lab, sco in _zip_batches(labels, scores):
+        shared = [k for k in keys if k in lab.columns and k in sco.columns]
+        if not lab[shared].equals(sco[shared]):
+            raise ValueError(f"labels and score files are not row-aligned on {shared}")
+        lab[prediction] = sco[prediction].to_numpy()
+        yield lab
+
+
+def load_monitoring_data(
+    config: Dict,
+    side: str,
+    period: Optional[str] = None,
+    period_end: Optional[str] = None,
+    base_path: Optional[str] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Return (features, labels, score) cho reference hoặc current."""
+    return tuple(
+        load_frame(config, side, kind, period=period, period_end=period_end, base_path=base_path)
+        for kind in ("features", "labels", "score")
+    )
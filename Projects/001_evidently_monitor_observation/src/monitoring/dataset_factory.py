@@ -0,0 +1,227 @@
+"""
+Evidently Dataset factory.
+
+`_to_evidently_dataset` được gọi 2 lần / stage trên cùng một frame đã ghép.
+Factory này:
+- không copy frame: nếu không cần đổi gì thì dùng luôn frame gốc, nếu cần đổi
+  timestamp / bỏ cột thì tạo frame mới dùng chung cột với frame gốc (copy=False)
+- convert timestamp_column (YYYYMMDD -> datetime) MỘT lần cho mỗi frame
+- cache kiểu Evidently đã infer cho các cột không khai báo (theo frame, không theo flags):
+  stage sau trên cùng frame (flags khác) dựng DataDefinition đầy đủ, Evidently không
+  phải infer lại
+- đếm thời gian / bộ nhớ cho từng bước (`stats`, `summary()`)
+
+Cache theo identity của frame (id + weakref): entry tự bị xoá khi frame bị giải phóng.
+Lưu ý: bản thân Evidently (PandasDataset) vẫn copy data một lần khi tạo Dataset
+(`bytes_copied_by_evidently`); phần tránh được chỉ là df.copy() cũ của mỗi lần gọi và
+việc parse lại timestamp (`bytes_copy_avoided`, `bytes_reparse_avoided`), là số byte không
+phải cấp phát (tổng theo lần gọi), không phải mức giảm bộ nhớ đỉnh.
+"""
+import time
+import weakref
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from evidently import DataDefinition, Dataset
+
+# Field của DataDefinition mà Evidently infer cho cột không khai báo; đủ cả 6 field -> không infer
+_INFERRED_FIELDS = (
+    'numerical_columns', 'categorical_columns', 'text_columns',
+    'datetime_columns', 'unknown_columns', 'list_columns',
+)
+
+
+class EvidentlyDatasetFactory:
+
+    def __init__(
+        self,
+        id_column: str,
+        timestamp_column: Optional[str],
+        numerical_columns: List[str],
+        categorical_columns: List[str],
+        target_column: str,
+        predict_column: str,
+        timestamp_format: str = '%Y%m%d',
+    ):
+        self.id_column = id_column
+        self.timestamp_column = timestamp_column
+        self.numerical_columns = numerical_columns
+        self.categorical_columns = categorical_columns
+        self.target_column = target_column
+        self.predict_column = predict_column
+        self.timestamp_format = timestamp_format
+        self._reset_cache()
+
+    def _reset_cache(self):
+        self._timestamps: Dict[int, pd.Series] = {}
+        # frame -> cột -> field của DataDefinition (None = Evidently không xếp vào field nào)
+        self._column_types: Dict[int, Dict[str, Optional[str]]] = {}
+        self._finalizers: Dict[int, weakref.finalize] = {}
+        self.stats = {
+            'calls': 0,
+            'definition_hits': 0,
+            'timestamp_conversions': 0,
+            'timestamp_hits': 0,
+            'bytes_allocated': 0,              # bộ nhớ thật sự cấp phát (timestamp đã convert)
+            'bytes_copy_avoided': 0,           # df.copy() cũ của mỗi lần gọi
+            'bytes_reparse_avoided': 0,        # timestamp convert lại mỗi lần gọi (cache hit)
+            'bytes_copied_by_evidently': 0,    # copy của Dataset.from_pandas (không tránh được)
+            'seconds_timestamp': 0.0,
+            'seconds_definition': 0.0,
+            'seconds_dataset': 0.0,
+        }
+
+    # Cache chứa weakref / finalize -> không pickle được; worker process tự build lại
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for key in ('_timestamps', '_column_types', '_finalizers'):
+            state.pop(key)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset_cache()
+
+    def _track(self, df: pd.DataFrame) -> int:
+        """Đăng ký frame để xoá cache khi frame bị giải phóng."""
+        key = id(df)
+        if key not in self._finalizers:
+            self._finalizers[key] = weakref.finalize(df, self._evict, key)
+        return key
+
+    def _evict(self, key: int):
+        self._timestamps.pop(key, None)
+        self._column_types.pop(key, None)
+        self._finalizers.pop(key, None)
+
+    def _timestamp(self, df: pd.DataFrame, key: int) -> pd.Series:
+        if key in self._timestamps:
+            values = self._timestamps[key]
+            self.stats['timestamp_hits'] += 1
+            self.stats['bytes_reparse_avoided'] += int(values.memory_usage(index=False))
+            return values
+        start = time.perf_counter()
+        print('converting timestamp column to datetime: ', self.timestamp_column)
+        values = pd.to_datetime(df[self.timestamp_column], format=self.timestamp_format, errors='coerce')
+        self._timestamps[key] = values
+        self.stats['timestamp_conversions'] += 1
+        self.stats['bytes_allocated'] += int(values.memory_usage(index=False))
+        self.stats['seconds_timestamp'] += time.perf_counter() - start
+        return values
+
+    def prepare_frame(
+        self,
+        df: pd.DataFrame,
+        include_timestamp: bool = True,
+        exclude_columns: Tuple[str, ...] = (),
+    ) -> pd.DataFrame:
+        """
+        Frame đưa vào Evidently, không copy data:
+        - trả về chính `df` nếu không cần convert timestamp / bỏ cột
+        - ngược lại tạo frame mới dùng chung các cột của `df`
+        """
+        key = self._track(df)
+        columns = [c for c in df.columns if c not in exclude_columns]
+        convert = (
+            include_timestamp and self.timestamp_column in columns
+            and not pd.api.types.is_datetime64_any_dtype(df[self.timestamp_column])
+        )
+        if not convert and len(columns) == len(df.columns):
+            return df
+        data = {c: df[c] for c in columns}
+        if convert:
+            data[self.timestamp_column] = self._timestamp(df, key)
+        return pd.DataFrame(data, index=df.index, copy=False)
+
+    def _definition(self, df: pd.DataFrame, include_target: bool, include_prediction: bool, include_timestamp: bool) -> DataDefinition:
+        num_cols = [c for c in self.numerical_columns if c in df.columns]
+        cat_cols = [c for c in self.categorical_columns if c in df.columns]
+
+        # Thêm target/prediction vào numerical nếu có
+        if include_target and self.target_column in df.columns:
+            num_cols = num_cols + [self.target_column]
+        if include_prediction and self.predict_column in df.columns:
+            num_cols = num_cols + [self.predict_column]
+
+        timestamp_col = None
+        if include_timestamp and self.timestamp_column and self.timestamp_column in df.columns:
+            timestamp_col = self.timestamp_column
+
+        return DataDefinition(
+            id_column=self.id_column if self.id_column in df.columns else None,
+            timestamp=timestamp_col,
+            numerical_columns=num_cols,
+            categorical_columns=cat_cols,
+        )
+
+    @staticmethod
+    def _declared(definition: DataDefinition) -> set:
+        return {definition.id_column, definition.timestamp, *definition.numerical_columns, *definition.categorical_columns}
+
+    def _complete(
+        self, definition: DataDefinition, columns: List[str], known: Dict[str, Optional[str]],
+    ) -> Optional[DataDefinition]:
+        """
+        `definition` + kiểu đã infer (`known`) cho các cột không khai báo -> DataDefinition đầy đủ
+        (Evidently không infer lại). None nếu còn cột chưa có kiểu trong cache.
+        """
+        declared = self._declared(definition)
+        rest = [c for c in columns if c not in declared]
+        if any(c not in known for c in rest):
+            return None
+        fields = {name: [] for name in _INFERRED_FIELDS}
+        fields['numerical_columns'] = list(definition.numerical_columns)
+        fields['categorical_columns'] = list(definition.categorical_columns)
+        for c in rest:
+            if known[c] is not None:
+                fields[known[c]].append(c)
+        return DataDefinition(id_column=definition.id_column, timestamp=definition.timestamp, **fields)
+
+    def build(
+        self,
+        df: pd.DataFrame,
+        include_target: bool = False,
+        include_prediction: bool = False,
+        include_timestamp: bool = True,
+        exclude_columns: Tuple[str, ...] = (),
+    ) -> Dataset:
+        """Evidently Dataset cho `df` (xem `GenericModelMonitor._to_evidently_dataset`)."""
+        self.stats['calls'] += 1
+        # Cách cũ: df.copy() toàn bộ frame ở mỗi lần gọi
+        self.stats['bytes_copy_avoided'] += int(df.memory_usage(index=True, deep=False).sum())
+        exclude_columns = tuple(exclude_columns)
+        data = self.prepare_frame(df, include_timestamp=include_timestamp, exclude_columns=exclude_columns)
+        self.stats['bytes_copied_by_evidently'] += int(data.memory_usage(index=True, deep=False).sum())
+
+        known = self._column_types.setdefault(id(df), {})
+        partial = self._definition(data, include_target, include_prediction, include_timestamp)
+        definition = self._complete(partial, list(data.columns), known)
+        if definition is not None:
+            self.stats['definition_hits'] += 1
+
+        start = time.perf_counter()
+        dataset = Dataset.from_pandas(data, data_definition=partial if definition is None else definition)
+        elapsed = time.perf_counter() - start
+        if definition is not None:
+            self.stats['seconds_dataset'] += elapsed
+        else:
+            # Evidently infer các cột không khai báo -> nhớ kiểu theo frame cho các stage sau
+            self.stats['seconds_definition'] += elapsed
+            resolved = dataset.data_definition
+            if resolved.timestamp == partial.timestamp and resolved.id_column == partial.id_column:
+                field_of = {c: name for name in _INFERRED_FIELDS for c in (getattr(resolved, name) or [])}
+                declared = self._declared(partial)
+                known.update({c: field_of.get(c) for c in data.columns if c not in declared})
+        return dataset
+
+    def summary(self) -> str:
+        s = self.stats
+        return (
+            f"{s['calls']} datasets | definition cache hits: {s['definition_hits']} | "
+            f"timestamp conversions: {s['timestamp_conversions']} (hits: {s['timestamp_hits']}) | "
+            f"allocated: {s['bytes_allocated'] / 2**20:.1f} MB, not allocated: df.copy() "
+            f"{s['bytes_copy_avoided'] / 2**20:.1f} MB + timestamp re-parse {s['bytes_reparse_avoided'] / 2**20:.1f} MB, "
+            f"Evidently copy: {s['bytes_copied_by_evidently'] / 2**20:.1f} MB | "
+            f"time: timestamp {s['seconds_timestamp']:.2f}s, "
+            f"definition {s['seconds_definition']:.2f}s, dataset {s['seconds_dataset']:.2f}s"
+        )
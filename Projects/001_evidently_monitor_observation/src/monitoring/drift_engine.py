@@ -0,0 +1,754 @@
+"""
+Vectorized drift engine.
+
+Reference được bin MỘT lần (quantile edges), current được gán bin MỘT lần,
+sau đó PSI / KS / Wasserstein cho mọi nhóm (period) được tính cùng lúc từ
+ma trận đếm (group x bin) bằng NumPy.
+
+Khác với `get_one_column_drift` của Evidently (bin edges tính lại trên
+reference + current cho từng lần gọi), edges ở đây cố định theo reference,
+nên kết quả của các period có thể so sánh trực tiếp với nhau.
+
+Batch (fit_batch_bins / batch_drift): nhiều cột cùng lúc, numeric được stack thành
+một ma trận, counts của mọi cột nằm trong một mảng phẳng -> một lần bincount,
+PSI / KS / Wasserstein của mọi cột tính bằng reduceat theo đoạn.
+
+Cột numeric ít giá trị (<= DISCRETE_MAX_UNIQUE) được bin theo giá trị cho PSI (như Evidently)
+nhưng vẫn có lưới giá trị cho KS / Wasserstein (chính xác với giá trị có trong reference).
+Lưới KS / Wasserstein có thêm các bin đuôi ngoài [min, max] của reference (GRID_TAIL_STEPS x std):
+Wasserstein của phần current nằm ngoài khoảng reference không bị kẹp về min / max. Mỗi giá trị
+được đặt tại điểm giữa bin của nó -> sai số <= nửa độ rộng bin (trong khoảng reference: nửa
+khoảng quantile; ở đuôi: <= 0.125 std đến 3 std ngoài khoảng, xa hơn tăng dần theo
+GRID_TAIL_STEPS, giá trị xa hơn 32 std bị kẹp).
+
+Reference rất lớn (fit_sketch_bins / stream_fit_bins): edges theo quantile xấp xỉ của
+KLLSketch (quantile_sketch.py) dựng từ các chunk đọc stream, counts reference đếm chính xác
+theo các edges đó ở pass thứ hai; không cần sort (hay giữ trong bộ nhớ) toàn bộ reference.
+"""
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.stats import distributions
+
+from .quantile_sketch import DEFAULT_K, FrameSketch, KLLSketch, sketch_batches
+
+SUPPORTED_METHODS = ("psi", "ks", "wasserstein")
+DEFAULT_THRESHOLDS = {"psi": 0.1, "ks": 0.05, "wasserstein": 0.1}
+
+# Numeric columns có <= DISCRETE_MAX_UNIQUE giá trị được bin theo từng giá trị
+# (giống rule n_vals > 20 trong get_binned_data của Evidently)
+DISCRETE_MAX_UNIQUE = 20
+
+# Bin đuôi của lưới KS / Wasserstein ngoài [min, max] của reference (đơn vị: std của reference)
+# (bước 0.25 std đến 3 std, sau đó tăng gấp đôi)
+GRID_TAIL_STEPS = tuple(np.arange(1, 13) * 0.25) + (4.0, 6.0, 8.0, 12.0, 16.0, 24.0, 32.0)
+
+# Số dòng mỗi khối khi batch_counts gán bin (ma trận codes = BATCH_CHUNK_ROWS x số cột)
+BATCH_CHUNK_ROWS = 200_000
+
+
+@dataclass
+class ColumnBins:
+    """
+    Reference-side binning của một cột.
+
+    - psi_edges / psi_counts: bins dùng cho PSI (quantile, mặc định 10 bins)
+    - grid / grid_counts: lưới mịn hơn dùng cho KS và Wasserstein
+    Với cột discrete (categorical hoặc numeric ít giá trị), psi_edges là danh sách
+    giá trị đã sort, bin cuối cùng dành cho giá trị không có trong reference.
+    - points: vị trí các grid bins khi cột discrete numeric (giá trị + điểm giữa bin đuôi),
+      None = điểm giữa grid bins; categorical (không có thứ tự) không có lưới KS / Wasserstein
+    """
+    column: str
+    discrete: bool
+    psi_edges: np.ndarray
+    psi_counts: np.ndarray
+    grid: np.ndarray
+    grid_counts: np.ndarray
+    std: float
+    points: Optional[np.ndarray] = None
+
+    @property
+    def has_grid(self) -> bool:
+        """Có lưới numeric cho KS / Wasserstein (cột liên tục hoặc discrete numeric)."""
+        return not self.discrete or self.points is not None
+
+    @property
+    def grid_points(self) -> np.ndarray:
+        return (self.grid[:-1] + self.grid[1:]) / 2 if self.points is None else self.points
+
+    @property
+    def n_psi_bins(self) -> int:
+        return len(self.psi_counts)
+
+    @property
+    def n_grid_bins(self) -> int:
+        return len(self.grid_counts)
+
+    @property
+    def n_reference(self) -> int:
+        return int(self.psi_counts.sum())
+
+
+def _quantile_edges(values: np.ndarray, n_bins: int) -> np.ndarray:
+    """Full edges [min, q1, ..., max] theo quantile của reference, bỏ edges trùng."""
+    if len(values) == 0:
+        return np.array([0.0, 0.0])
+    edges = np.unique(np.quantile(values, np.linspace(0, 1, n_bins + 1)))
+    if len(edges) == 1:
+        edges = np.array([edges[0], edges[0]])
+    return edges
+
+
+def _tail_edges(std: float) -> np.ndarray:
+    if not np.isfinite(std) or std <= 0:
+        return np.empty(0)
+    return np.asarray(GRID_TAIL_STEPS) * std
+
+
+def _with_tails(grid: np.ndarray, std: float) -> np.ndarray:
+    """
+    Thêm bin đuôi ngoài [grid[0], grid[-1]]. Edge trên cũ dời lên nextafter(max) để giá trị
+    = max của reference vẫn nằm trong bin cuối của khoảng reference (gán bin theo side="right").
+    """
+    tails = _tail_edges(std)
+    if not len(tails):
+        return grid
+    lo, hi = grid[0], grid[-1]
+    return np.concatenate([lo - tails[::-1], grid[:-1], [np.nextafter(hi, np.inf)], hi + tails])
+
+
+def _value_grid(values: np.ndarray, std: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (grid, points) của cột discrete numeric: mỗi giá trị một bin (inner edges = điểm giữa hai
+    giá trị liền kề, points = chính các giá trị) + bin đuôi như _with_tails.
+    """
+    values = np.asarray(values, dtype=float)
+    if not len(values):
+        return np.array([0.0, 0.0]), np.array([0.0])
+    grid = np.concatenate([[values[0]], (values[:-1] + values[1:]) / 2, [values[-1]]])
+    grid = _with_tails(grid, std)
+    mids = (grid[:-1] + grid[1:]) / 2
+    n_tail = (len(grid) - len(values) - 1) // 2
+    points = np.concatenate([mids[:n_tail], values, mids[len(mids) - n_tail:]])
+    return grid, points
+
+
+def _value_grid_counts(bins_grid: np.ndarray, n_values: int, value_counts: np.ndarray) -> np.ndarray:
+    """Grid counts reference của cột discrete numeric: counts theo giá trị, bin đuôi = 0."""
+    n_tail = (len(bins_grid) - 1 - n_values) // 2
+    return np.concatenate([np.zeros(n_tail), value_counts[:n_values], np.zeros(n_tail)]).astype(np.int64)
+
+
+def _numeric_codes(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Gán bin theo inner edges; bin ngoài cùng mở về +-inf. NaN -> -1."""
+    codes = np.searchsorted(edges[1:-1], values, side="right")
+    codes[np.isnan(values)] = -1
+    return codes
+
+
+def _discrete_codes(values: pd.Series, categories: np.ndarray) -> np.ndarray:
+    """Gán bin theo giá trị; giá trị lạ -> bin cuối (len(categories)). NaN -> -1."""
+    codes = pd.Categorical(values, categories=categories).codes.astype(np.int64)
+    codes[(codes == -1) & values.notna().to_numpy()] = len(categories)
+    return codes
+
+
+def _to_float(values) -> np.ndarray:
+    return pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=float)
+
+
+def fit_column_bins(
+    values,
+    column: str,
+    n_bins: int = 10,
+    grid_size: int = 100,
+    discrete: Optional[bool] = None,
+    ordered: Optional[bool] = None,
+) -> ColumnBins:
+    """
+    Bin reference một lần cho một cột.
+
+    Args:
+        values: giá trị reference của cột
+        column: tên cột
+        n_bins: số bins cho PSI
+        grid_size: số bins của lưới mịn cho KS / Wasserstein
+        discrete: True cho categorical; None -> tự nhận (numeric <= 20 giá trị unique)
+        ordered: cột discrete có thứ tự số (lưới giá trị cho KS / Wasserstein);
+            None -> True khi discrete được tự nhận trên cột numeric
+    """
+    series = pd.Series(values)
+    numeric = pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+    if ordered is None:
+        ordered = discrete is None and numeric
+    if discrete is None:
+        discrete = (
+            not pd.api.types.is_numeric_dtype(series)
+            or series.nunique(dropna=True) <= DISCRETE_MAX_UNIQUE
+        )
+
+    if discrete:
+        categories = np.sort(series.dropna().unique())
+        codes = _discrete_codes(series, categories)
+        counts = np.bincount(codes[codes >= 0], minlength=len(categories) + 1)
+        if ordered and numeric:
+            return _ordered_bins(column, categories.astype(float), counts, float(np.nanstd(_to_float(series))))
+        return ColumnBins(
+            column=column,
+            discrete=True,
+            psi_edges=categories,
+            psi_counts=counts,
+            grid=categories,
+            grid_counts=counts,
+            std=np.nan,
+        )
+
+    arr = _to_float(series)
+    valid = arr[~np.isnan(arr)]
+    std = float(np.std(valid)) if len(valid) else np.nan
+    psi_edges = _quantile_edges(valid, n_bins)
+    grid = _with_tails(_quantile_edges(valid, grid_size), std)
+    psi_codes = _numeric_codes(valid, psi_edges)
+    grid_codes = _numeric_codes(valid, grid)
+    return ColumnBins(
+        column=column,
+        discrete=False,
+        psi_edges=psi_edges,
+        psi_counts=np.bincount(psi_codes, minlength=len(psi_edges) - 1),
+        grid=grid,
+        grid_counts=np.bincount(grid_codes, minlength=len(grid) - 1),
+        std=std,
+    )
+
+
+def _ordered_bins(column: str, values: np.ndarray, counts: np.ndarray, std: float) -> ColumnBins:
+    """Bins discrete numeric: PSI theo giá trị (bin cuối = giá trị lạ), KS / Wasserstein theo lưới giá trị."""
+    grid, points = _value_grid(values, std)
+    return ColumnBins(
+        column=column,
+        discrete=True,
+        psi_edges=values,
+        psi_counts=np.asarray(counts, dtype=np.int64),
+        grid=grid,
+        grid_counts=_value_grid_counts(grid, len(values), np.asarray(counts)),
+        std=std,
+        points=points,
+    )
+
+
+def assign_bins(bins: ColumnBins, values):
+    """Return (psi_codes, grid_codes) cho current; -1 cho missing."""
+    if bins.discrete:
+        codes = _discrete_codes(pd.Series(values), bins.psi_edges)
+        if not bins.has_grid:
+            return codes, codes
+        return codes, _numeric_codes(_to_float(values), bins.grid)
+    arr = _to_float(values)
+    return _numeric_codes(arr, bins.psi_edges), _numeric_codes(arr, bins.grid)
+
+
+def grouped_counts(codes: np.ndarray, group_codes: np.ndarray, n_groups: int, n_bins: int) -> np.ndarray:
+    """Ma trận đếm (group x bin) bằng một lần np.bincount. Bỏ qua code -1."""
+    mask = (codes >= 0) & (group_codes >= 0)
+    flat = group_codes[mask].astype(np.int64) * n_bins + codes[mask]
+    return np.bincount(flat, minlength=n_groups * n_bins).reshape(n_groups, n_bins)
+
+
+def _fill_zeroes(percents: np.ndarray) -> np.ndarray:
+    """Thay 0 bằng epsilon theo đúng rule của get_binned_data (feel_zeroes), theo từng hàng."""
+    percents = np.atleast_2d(percents).astype(float)
+    nonzero = np.where(percents > 0, percents, np.inf)
+    row_min = nonzero.min(axis=1, keepdims=True)
+    eps = np.where(row_min <= 0.0001, row_min / 10**6, 0.0001)
+    return np.where(percents == 0, eps, percents)
+
+
+def _to_percents(counts: np.ndarray) -> np.ndarray:
+    counts = np.atleast_2d(counts).astype(float)
+    totals = counts.sum(axis=1, keepdims=True)
+    return np.divide(counts, totals, out=np.zeros_like(counts), where=totals > 0)
+
+
+def psi_from_counts(ref_counts: np.ndarray, cur_counts: np.ndarray) -> np.ndarray:
+    """PSI cho từng hàng của cur_counts (group x bin) so với ref_counts (bin,)."""
+    ref_p = _fill_zeroes(_to_percents(ref_counts))
+    cur_p = _fill_zeroes(_to_percents(cur_counts))
+    return np.sum((ref_p - cur_p) * np.log(ref_p / cur_p), axis=1)
+
+
+def ks_from_counts(ref_counts: np.ndarray, cur_counts: np.ndarray) -> np.ndarray:
+    """KS statistic = max |F_ref - F_cur| tại các grid edges."""
+    ref_cdf = np.cumsum(_to_percents(ref_counts), axis=1)
+    cur_cdf = np.cumsum(_to_percents(cur_counts), axis=1)
+    return np.max(np.abs(ref_cdf - cur_cdf), axis=1)
+
+
+def ks_pvalue(statistic: np.ndarray, n_ref: int, n_cur: np.ndarray) -> np.ndarray:
+    """Two-sided asymptotic p-value (cùng công thức mode='asymp' của scipy.ks_2samp)."""
+    n_cur = np.asarray(n_cur, dtype=float)
+    en = np.where(n_cur > 0, n_ref * n_cur / np.maximum(n_ref + n_cur, 1), 1)
+    return distributions.kstwo.sf(statistic, np.maximum(np.round(en), 1))
+
+
+def wasserstein_from_counts(points: np.ndarray, ref_counts: np.ndarray, cur_counts: np.ndarray, std: float) -> np.ndarray:
+    """
+    Wasserstein-1 giữa 2 phân phối đã rời rạc hoá tại `points` của các grid bins
+    (ColumnBins.grid_points), chia cho std của reference (giống stattest 'wasserstein' của Evidently).
+    """
+    mids = np.asarray(points, dtype=float)
+    ref_cdf = np.cumsum(_to_percents(ref_counts), axis=1)
+    cur_cdf = np.cumsum(_to_percents(cur_counts), axis=1)
+    widths = np.diff(mids)
+    distance = np.sum(np.abs(ref_cdf - cur_cdf)[:, :-1] * widths, axis=1)
+    return distance / max(std, 0.001)
+
+
+def drift_from_counts(bins: ColumnBins, psi_counts: np.ndarray, grid_counts: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    Drift từ ma trận đếm (group x bin) đã có sẵn, vd. counts cộng dồn nhiều ngày
+    (xem accumulators.py). grid_counts chỉ cần cho cột numeric.
+
+    Return:
+        dict các mảng độ dài n_groups: n_rows, psi, ks, ks_pvalue, wasserstein
+        (ks / wasserstein = NaN với cột categorical); n_rows không gồm missing
+    """
+    psi_counts = np.atleast_2d(psi_counts)
+    stats = {
+        "n_rows": psi_counts.sum(axis=1),
+        "psi": psi_from_counts(bins.psi_counts, psi_counts),
+    }
+    if not bins.has_grid or grid_counts is None:
+        nan = np.full(len(psi_counts), np.nan)
+        stats.update(ks=nan, ks_pvalue=nan.copy(), wasserstein=nan.copy())
+        return stats
+
+    grid_counts = np.atleast_2d(grid_counts)
+    ks = ks_from_counts(bins.grid_counts, grid_counts)
+    stats["ks"] = ks
+    stats["ks_pvalue"] = ks_pvalue(ks, bins.n_reference, grid_counts.sum(axis=1))
+    stats["wasserstein"] = wasserstein_from_counts(bins.grid_points, bins.grid_counts, grid_counts, bins.std)
+    return stats
+
+
+def grouped_drift(bins: ColumnBins, values, group_codes: np.ndarray, n_groups: int) -> Dict[str, np.ndarray]:
+    """
+    Tính drift cho tất cả groups trong một pass.
+
+    Args:
+        bins: ColumnBins đã fit trên reference
+        values: giá trị current (toàn bộ, chưa slice)
+        group_codes: mã nhóm (0..n_groups-1) cho từng dòng current, -1 = bỏ qua
+        n_groups: số nhóm
+
+    Return:
+        dict các mảng độ dài n_groups: n_rows, psi, ks, ks_pvalue, wasserstein
+        (ks / wasserstein = NaN với cột categorical)
+    """
+    group_codes = np.asarray(group_codes)
+    psi_codes, grid_codes = assign_bins(bins, values)
+    psi_counts = grouped_counts(psi_codes, group_codes, n_groups, bins.n_psi_bins)
+    grid_counts = grouped_counts(grid_codes, group_codes, n_groups, bins.n_grid_bins) if bins.has_grid else None
+    stats = drift_from_counts(bins, psi_counts, grid_counts)
+    stats["n_rows"] = np.bincount(group_codes[group_codes >= 0], minlength=n_groups)
+    return stats
+
+
+def drift_scores(stats: Dict[str, np.ndarray], method: str) -> np.ndarray:
+    """Chọn drift score theo method (ks -> p-value, giống stattest 'ks' của Evidently)."""
+    return stats["ks_pvalue"] if method == "ks" else stats[method]
+
+
+def drift_detected(scores: np.ndarray, method: str, threshold: Optional[float] = None) -> np.ndarray:
+    threshold = DEFAULT_THRESHOLDS[method] if threshold is None else threshold
+    if method == "ks":
+        return scores <= threshold
+    return scores >= threshold
+
+
+# --- Batch: mọi cột trong một pass -------------------------------------------------
+# Bins của nhiều cột được xếp nối tiếp trong MỘT mảng phẳng (cột j chiếm đoạn
+# [starts[j], starts[j] + sizes[j])): một np.bincount đếm mọi cột (và mọi group), PSI / KS /
+# Wasserstein của mọi cột là các phép reduceat theo đoạn thay vì lặp từng cột.
+
+
+def _starts(sizes) -> np.ndarray:
+    sizes = np.asarray(sizes, dtype=np.int64)
+    return np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+
+
+def _segment_ids(sizes) -> np.ndarray:
+    return np.repeat(np.arange(len(sizes)), sizes)
+
+
+def _stack_numeric(df: pd.DataFrame, columns) -> np.ndarray:
+    """Ma trận (row x column) float của các cột numeric (NA -> NaN), column-major để slice theo cột."""
+    if not len(columns):
+        return np.empty((len(df), 0))
+    return np.asfortranarray(df[list(columns)].to_numpy(dtype=float, na_value=np.nan))
+
+
+def _stacked_codes(X: np.ndarray, edges) -> np.ndarray:
+    """Codes (row x column): searchsorted theo inner edges của từng cột, NaN -> -1."""
+    codes = np.empty(X.shape, dtype=np.int64)
+    for j, e in enumerate(edges):
+        codes[:, j] = np.searchsorted(e[1:-1], X[:, j], side="right")
+    codes[np.isnan(X)] = -1
+    return codes
+
+
+def _flat_bincount(codes: np.ndarray, sizes, group_codes: Optional[np.ndarray] = None, n_groups: int = 1) -> np.ndarray:
+    """Ma trận đếm (group x tổng số bin của mọi cột) bằng một lần np.bincount. Bỏ qua code -1."""
+    sizes = np.asarray(sizes, dtype=np.int64)
+    total = int(sizes.sum())
+    mask = codes >= 0
+    flat = codes + _starts(sizes)
+    if group_codes is not None:
+        group_codes = np.asarray(group_codes, dtype=np.int64)
+        flat = flat + group_codes[:, None] * total
+        mask &= (group_codes >= 0)[:, None]
+    return np.bincount(flat[mask], minlength=n_groups * total).reshape(n_groups, total)
+
+
+def _quantile_edges_stacked(X: np.ndarray, n_bins: int):
+    """_quantile_edges của mọi cột: MỘT lần np.nanquantile theo axis 0."""
+    q = np.nanquantile(X, np.linspace(0, 1, n_bins + 1), axis=0)
+    edges = []
+    for j in range(X.shape[1]):
+        e = np.unique(q[:, j])
+        edges.append(np.array([e[0], e[0]]) if len(e) == 1 else e)
+    return edges
+
+
+def _sorted_counts(S: np.ndarray, n_valid: np.ndarray, edges) -> list:
+    """
+    Counts theo bins của _numeric_codes, từ ma trận đã sort theo cột (NaN cuối): số giá trị
+    < inner edge thứ k = searchsorted(..., side="left") -> không cần gán bin từng dòng.
+    """
+    counts = []
+    for j, e in enumerate(edges):
+        n = int(n_valid[j])
+        below = np.searchsorted(S[:n, j], e[1:-1], side="left")
+        counts.append(np.diff(np.concatenate([[0], below, [n]])).astype(np.int64))
+    return counts
+
+
+def fit_batch_bins(
+    df: pd.DataFrame,
+    numeric,
+    categorical=(),
+    n_bins: int = 10,
+    grid_size: int = 100,
+) -> Dict[str, ColumnBins]:
+    """
+    fit_column_bins cho nhiều cột cùng lúc (cùng kết quả): cột numeric được stack thành
+    một ma trận, số giá trị unique / quantile edges / std / counts của reference tính theo
+    axis 0 cho mọi cột. Categorical (và numeric <= DISCRETE_MAX_UNIQUE giá trị) bin theo giá trị.
+    """
+    order = [*numeric, *categorical]
+    discrete = list(categorical) + [c for c in numeric if not pd.api.types.is_numeric_dtype(df[c])]
+    numeric = [c for c in numeric if pd.api.types.is_numeric_dtype(df[c])]
+    X = _stack_numeric(df, numeric)
+
+    # Số giá trị unique của từng cột từ ma trận đã sort (NaN nằm cuối)
+    S = np.sort(X, axis=0)
+    n_unique = ((np.diff(S, axis=0) != 0) & ~np.isnan(S[1:])).sum(axis=0) + (~np.isnan(S[:1])).sum(axis=0)
+    continuous = n_unique > DISCRETE_MAX_UNIQUE
+    ordered = [c for c, cont in zip(numeric, continuous) if not cont]
+    discrete += ordered
+
+    bins = {}
+    cols = [c for c, cont in zip(numeric, continuous) if cont]
+    if cols:
+        Xc = X[:, continuous]
+        std = np.nanstd(Xc, axis=0)
+        psi_edges = _quantile_edges_stacked(Xc, n_bins)
+        grids = [_with_tails(g, sd) for g, sd in zip(_quantile_edges_stacked(Xc, grid_size), std)]
+        Sc, n_valid = S[:, continuous], (~np.isnan(Xc)).sum(axis=0)
+        psi_split = _sorted_counts(Sc, n_valid, psi_edges)
+        grid_split = _sorted_counts(Sc, n_valid, grids)
+        for j, c in enumerate(cols):
+            bins[c] = ColumnBins(
+                column=c,
+                discrete=False,
+                psi_edges=psi_edges[j],
+                psi_counts=psi_split[j],
+                grid=grids[j],
+                grid_counts=grid_split[j],
+                std=float(std[j]),
+            )
+    for c in discrete:
+        bins[c] = fit_column_bins(df[c], c, discrete=True, ordered=c in ordered)
+    return {c: bins[c] for c in order}
+
+
+def _discrete_bins(column: str, counts: Dict, std: Optional[float] = None) -> ColumnBins:
+    """
+    Bins discrete (như fit_column_bins(discrete=True)) từ value counts chính xác;
+    std != None -> cột discrete numeric (lưới giá trị cho KS / Wasserstein).
+    """
+    categories = np.sort(np.array(list(counts), dtype=object))
+    psi_counts = np.append([counts[v] for v in categories], 0).astype(np.int64)
+    if len(categories) and all(isinstance(v, (int, float)) for v in categories):
+        categories = categories.astype(float)
+    if std is not None:
+        return _ordered_bins(column, categories.astype(float), psi_counts, std)
+    return ColumnBins(
+        column=column, discrete=True, psi_edges=categories, psi_counts=psi_counts,
+        grid=categories, grid_counts=psi_counts, std=np.nan,
+    )
+
+
+def _sketch_edges(sketch: KLLSketch, n_bins: int) -> np.ndarray:
+    edges = np.unique(sketch.quantiles(np.linspace(0, 1, n_bins + 1)))
+    if len(edges) == 1:
+        edges = np.array([edges[0], edges[0]])
+    return edges
+
+
+def fit_sketch_bins(
+    sketch: FrameSketch,
+    numeric,
+    categorical=(),
+    n_bins: int = 10,
+    grid_size: int = 100,
+) -> Dict[str, ColumnBins]:
+    """
+    Bins từ FrameSketch của reference. Cột discrete (categorical, numeric <= DISCRETE_MAX_UNIQUE
+    giá trị) có counts chính xác từ sketch; cột numeric liên tục có edges theo quantile xấp xỉ
+    và counts = 0 -> đếm bằng count_reference_bins (pass thứ hai trên reference).
+    """
+    bins = {}
+    for c in [*numeric, *categorical]:
+        if c in sketch.categorical:
+            bins[c] = _discrete_bins(c, sketch.categorical[c])
+            continue
+        sk = sketch.numeric.get(c)
+        if sk is None:
+            continue
+        if sk.distinct is not None and len(sk.distinct) <= DISCRETE_MAX_UNIQUE:
+            bins[c] = _discrete_bins(c, sk.distinct, std=sk.std)
+            continue
+        psi_edges, grid = _sketch_edges(sk, n_bins), _with_tails(_sketch_edges(sk, grid_size), sk.std)
+        bins[c] = ColumnBins(
+            column=c,
+            discrete=False,
+            psi_edges=psi_edges,
+            psi_counts=np.zeros(len(psi_edges) - 1, dtype=np.int64),
+            grid=grid,
+            grid_counts=np.zeros(len(grid) - 1, dtype=np.int64),
+            std=sk.std,
+        )
+    return bins
+
+
+def count_reference_bins(bins: Dict[str, ColumnBins], batches: Iterable[pd.DataFrame]) -> Dict[str, ColumnBins]:
+    """Counts reference (PSI + grid) của các cột numeric liên tục trong `bins`, một pass trên các chunk."""
+    numeric = [b for b in bins.values() if not b.discrete]
+    if not numeric:
+        return dict(bins)
+    psi_sizes = [b.n_psi_bins for b in numeric]
+    grid_sizes = [b.n_grid_bins for b in numeric]
+    psi_total = np.zeros(sum(psi_sizes), dtype=np.int64)
+    grid_total = np.zeros(sum(grid_sizes), dtype=np.int64)
+    for batch in batches:
+        psi_counts, grid_counts = batch_counts(numeric, batch)
+        psi_total += psi_counts[0]
+        grid_total += grid_counts[0]
+    psi_split = np.split(psi_total, np.cumsum(psi_sizes)[:-1])
+    grid_split = np.split(grid_total, np.cumsum(grid_sizes)[:-1])
+    counted = {b.column: replace(b, psi_counts=p, grid_counts=g) for b, p, g in zip(numeric, psi_split, grid_split)}
+    return {c: counted.get(c, b) for c, b in bins.items()}
+
+
+def stream_fit_bins(
+    batches: Callable[[], Iterable[pd.DataFrame]],
+    numeric,
+    categorical=(),
+    n_bins: int = 10,
+    grid_size: int = 100,
+    k: int = DEFAULT_K,
+) -> Tuple[Dict[str, ColumnBins], FrameSketch]:
+    """
+    Bins reference từ các chunk đọc stream, không giữ toàn bộ reference trong bộ nhớ:
+    pass 1 dựng FrameSketch (edges), pass 2 đếm counts theo edges đó.
+
+    Args:
+        batches: hàm trả về một iterator chunk mới mỗi lần gọi (vd. lambda: iter_frame_batches(...))
+
+    Return:
+        (bins theo thứ tự numeric + categorical, sketch dùng lại được, vd. init breaks WOE)
+    """
+    sketch = sketch_batches(batches(), list(numeric), list(categorical), k=k)
+    bins = fit_sketch_bins(sketch, numeric, categorical, n_bins=n_bins, grid_size=grid_size)
+    return count_reference_bins(bins, batches()), sketch
+
+
+def batch_counts(
+    bins,
+    df: pd.DataFrame,
+    group_codes: Optional[np.ndarray] = None,
+    n_groups: int = 1,
+    grid: bool = True,
+    chunk_rows: int = BATCH_CHUNK_ROWS,
+):
+    """
+    Counts của current cho danh sách ColumnBins `bins`, mọi cột (và mọi group) trong một pass.
+    Dòng được xử lý theo từng khối chunk_rows (bộ nhớ ma trận codes cố định theo số cột).
+
+    Args:
+        grid: False -> chỉ đếm PSI bins (grid_counts = None), vd. khi chỉ cần PSI theo group
+
+    Return:
+        (psi_counts, grid_counts): ma trận (group x tổng số PSI bins của mọi cột) và
+        (group x tổng số grid bins của các cột có lưới, ColumnBins.has_grid), theo thứ tự của `bins`
+    """
+    bins = list(bins)
+    numeric = [b for b in bins if b.has_grid]
+    # PSI codes của cột liên tục lấy từ cùng ma trận numeric (cột discrete numeric: theo giá trị)
+    continuous = [j for j, b in enumerate(numeric) if not b.discrete]
+    position = {numeric[j].column: i for i, j in enumerate(continuous)}
+    psi_sizes = [b.n_psi_bins for b in bins]
+    grid_sizes = [b.n_grid_bins for b in numeric]
+    psi_counts = np.zeros((n_groups, int(np.sum(psi_sizes, dtype=np.int64))), dtype=np.int64)
+    grid_counts = np.zeros((n_groups, int(np.sum(grid_sizes, dtype=np.int64))), dtype=np.int64) if grid else None
+
+    for start in range(0, len(df), chunk_rows):
+        part = df.iloc[start:start + chunk_rows]
+        groups = None if group_codes is None else np.asarray(group_codes)[start:start + chunk_rows]
+        X = _stack_numeric(part, [b.column for b in numeric])
+        num_codes = _stacked_codes(X[:, continuous], [numeric[j].psi_edges for j in continuous])
+        codes = np.empty((len(part), len(bins)), dtype=np.int64)
+        for j, b in enumerate(bins):
+            if b.discrete:
+                codes[:, j] = _discrete_codes(part[b.column], b.psi_edges)
+            else:
+                codes[:, j] = num_codes[:, position[b.column]]
+        psi_counts += _flat_bincount(codes, psi_sizes, groups, n_groups)
+        if grid:
+            grid_counts += _flat_bincount(_stacked_codes(X, [b.grid for b in numeric]), grid_sizes, groups, n_groups)
+    return psi_counts, grid_counts
+
+
+def _segment_percents(counts: np.ndarray, sizes) -> np.ndarray:
+    counts = np.atleast_2d(counts).astype(float)
+    totals = np.add.reduceat(counts, _starts(sizes), axis=1)[:, _segment_ids(sizes)]
+    return np.divide(counts, totals, out=np.zeros_like(counts), where=totals > 0)
+
+
+def _segment_fill_zeroes(percents: np.ndarray, sizes) -> np.ndarray:
+    """_fill_zeroes theo từng đoạn (cột) của mỗi hàng."""
+    row_min = np.minimum.reduceat(np.where(percents > 0, percents, np.inf), _starts(sizes), axis=1)
+    eps = np.where(row_min <= 0.0001, row_min / 10**6, 0.0001)
+    return np.where(percents == 0, eps[:, _segment_ids(sizes)], percents)
+
+
+def _segment_cdf(percents: np.ndarray, sizes) -> np.ndarray:
+    cs = np.cumsum(percents, axis=1)
+    base = np.concatenate([np.zeros((len(cs), 1)), cs], axis=1)[:, _starts(sizes)]
+    return cs - base[:, _segment_ids(sizes)]
+
+
+def reference_counts(bins) -> Tuple[np.ndarray, np.ndarray]:
+    """Counts baseline của `bins` theo layout phẳng của batch_counts: (psi_counts, grid_counts)."""
+    bins = list(bins)
+    psi = [b.psi_counts for b in bins]
+    grid = [b.grid_counts for b in bins if b.has_grid]
+    return (
+        np.concatenate(psi) if psi else np.zeros(0, dtype=np.int64),
+        np.concatenate(grid) if grid else np.zeros(0, dtype=np.int64),
+    )
+
+
+def batch_drift_from_counts(
+    bins,
+    psi_counts: np.ndarray,
+    grid_counts: Optional[np.ndarray],
+    with_pvalue: bool = True,
+    reference: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    drift_from_counts cho mọi cột cùng lúc, từ counts phẳng của batch_counts
+    (grid_counts = None -> chỉ PSI, ks / wasserstein = NaN).
+    with_pvalue=False bỏ qua ks_pvalue (NaN): kstwo.sf chiếm phần lớn thời gian khi nhiều cột
+    mà không cột nào dùng method ks.
+
+    Args:
+        reference: (psi_counts, grid_counts) phẳng của reference khác baseline (cùng layout
+            batch_counts, vd. counts đã lưu của kỳ trước); None = counts baseline của `bins`.
+            Bins / grid vẫn là của baseline, Wasserstein vẫn chuẩn hoá theo std baseline;
+            cột không có row nào phía reference -> NaN
+
+    Return:
+        dict các ma trận (group x column): n_rows, n_reference, psi, ks, ks_pvalue, wasserstein
+        (ks / wasserstein = NaN với cột categorical)
+    """
+    bins = list(bins)
+    psi_counts = np.atleast_2d(psi_counts)
+    n_groups = len(psi_counts)
+    keys = ("n_rows", "n_reference", "psi", "ks", "ks_pvalue", "wasserstein")
+    if not bins:
+        return {key: np.empty((n_groups, 0)) for key in keys}
+    ref_psi, ref_grid = reference if reference is not None else reference_counts(bins)
+    psi_sizes = np.array([b.n_psi_bins for b in bins], dtype=np.int64)
+    psi_starts = _starts(psi_sizes)
+
+    ref_p = _segment_fill_zeroes(_segment_percents(ref_psi, psi_sizes), psi_sizes)
+    cur_p = _segment_fill_zeroes(_segment_percents(psi_counts, psi_sizes), psi_sizes)
+    n_reference = np.add.reduceat(np.asarray(ref_psi, dtype=float), psi_starts)
+    stats = {
+        "n_rows": np.add.reduceat(psi_counts, psi_starts, axis=1),
+        "n_reference": np.broadcast_to(n_reference, (n_groups, len(bins))).copy(),
+        "psi": np.add.reduceat((ref_p - cur_p) * np.log(ref_p / cur_p), psi_starts, axis=1),
+    }
+    stats["psi"][:, n_reference == 0] = np.nan
+    for key in ("ks", "ks_pvalue", "wasserstein"):
+        stats[key] = np.full((n_groups, len(bins)), np.nan)
+
+    numeric = [j for j, b in enumerate(bins) if b.has_grid]
+    if not numeric or grid_counts is None:
+        return stats
+    nb = [bins[j] for j in numeric]
+    grid_sizes = np.array([b.n_grid_bins for b in nb], dtype=np.int64)
+    grid_starts = _starts(grid_sizes)
+    grid_counts = np.atleast_2d(grid_counts)
+    diff = np.abs(
+        _segment_cdf(_segment_percents(ref_grid, grid_sizes), grid_sizes)
+        - _segment_cdf(_segment_percents(grid_counts, grid_sizes), grid_sizes)
+    )
+    ks = np.maximum.reduceat(diff, grid_starts, axis=1)
+
+    # Wasserstein: |F_ref - F_cur| x khoảng cách giữa các grid_points (bin cuối của mỗi cột có weight 0)
+    widths = np.concatenate([np.append(np.diff(b.grid_points), 0.0) for b in nb])
+    std = np.maximum(np.array([b.std for b in nb]), 0.001)
+
+    n_ref_grid = np.add.reduceat(np.asarray(ref_grid, dtype=float), grid_starts)
+    empty = n_ref_grid == 0
+    stats["ks"][:, numeric] = np.where(empty, np.nan, ks)
+    if with_pvalue:
+        stats["ks_pvalue"][:, numeric] = np.where(
+            empty, np.nan, ks_pvalue(ks, np.maximum(n_ref_grid, 1), np.add.reduceat(grid_counts, grid_starts, axis=1))
+        )
+    stats["wasserstein"][:, numeric] = np.where(empty, np.nan, np.add.reduceat(diff * widths, grid_starts, axis=1) / std)
+    return stats
+
+
+def batch_drift(
+    bins,
+    df: pd.DataFrame,
+    group_codes: Optional[np.ndarray] = None,
+    n_groups: int = 1,
+    with_pvalue: bool = True,
+) -> Dict[str, np.ndarray]:
+    """
+    PSI / KS / Wasserstein của mọi cột trong `bins` (và mọi group) từ một pass trên `df`.
+    Cùng kết quả với grouped_drift từng cột; n_rows không gồm missing.
+
+    Return:
+        dict các ma trận (group x column) như batch_drift_from_counts
+    """
+    bins = list(bins)
+    psi_counts, grid_counts = batch_counts(bins, df, group_codes, n_groups)
+    return batch_drift_from_counts(bins, psi_counts, grid_counts, with_pvalue)
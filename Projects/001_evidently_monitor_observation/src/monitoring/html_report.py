@@ -0,0 +1,309 @@
+"""
+Render HTML của Evidently Snapshot trong memory.
+
+Mỗi report chỉ render một lần (`render_snapshot`: widgets -> JSON của dashboard); cùng kết
+quả đó được dùng cho file HTML của stage (`standalone_html`, giống ev.save_html) và cho file
+combined nhiều tab (`tabbed_html`). File combined chỉ nhúng MỘT bản JS bundle + font của
+Evidently cho mọi tab (thay vì mỗi tab một document HTML đầy đủ), dashboard của mỗi tab được
+vẽ khi mở tab lần đầu (plotly trong tab đang ẩn bị sai kích thước).
+
+RenderedReport chỉ chứa string -> pickle được, worker process trả thẳng về process cha,
+không cần ev.dumps() / Snapshot.loads(). `widget_bytes`: số bytes mỗi widget đóng góp vào
+dashboard (JSON của widget + additional graphs), theo metric -> xem widget nào làm report nặng.
+
+Chế độ dashboard (`output.report_mode: dashboard`, `write_dashboard`): thay vì nhúng mọi thứ
+vào HTML, mỗi report ghi ra một payload riêng (js/<report>.data.js) và trang HTML chỉ là
+khung nhỏ tham chiếu tới:
+- một asset bundle dùng chung cho cả reports_dir (JS của Evidently + font icon), ghi một lần
+  cho mỗi version của Evidently -> trình duyệt cache, không lặp lại ở mỗi report / period
+- payload của từng tab, chỉ tải khi mở tab lần đầu
+Payload là JSON bọc trong một lời gọi JS (nạp bằng <script src>, vì fetch() JSON bị chặn khi
+mở file trực tiếp từ file share qua file://). Nội dung là text thuần, không base64 / bundle
+lặp lại -> nén gzip tốt; `gzip=True` ghi thêm bản .gz (mtime cố định) cạnh mỗi file cho
+web server phục vụ file nén sẵn (vd. nginx gzip_static).
+"""
+import base64
+import gzip as gzip_lib
+import json
+import os
+import uuid
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+import evidently
+from evidently.legacy.model.dashboard import DashboardInfo
+from evidently.legacy.model.widget import AdditionalGraphInfo, BaseWidgetInfo
+from evidently.legacy.renderers.html_widgets import group_widget
+from evidently.legacy.utils import NumpyEncoder
+from evidently.legacy.utils.dashboard import STATIC_PATH, dashboard_info_to_json
+
+FORMAT_HTML_PATH = Path(__file__).with_name("format.html")
+
+
+@dataclass
+class RenderedReport:
+    """Dashboard đã serialize của một Snapshot; snapshot = None sau khi qua process khác."""
+    dashboard_id: str
+    dashboard_json: str
+    graphs_json: str
+    snapshot: Optional[Any] = None
+    payload_path: Optional[str] = None
+    widget_bytes: List[Tuple[str, str, str, int]] = field(default_factory=list)  # (metric, title, type, bytes)
+
+    def __getstate__(self):
+        # Snapshot của Evidently không pickle được; phía nhận chỉ cần phần đã render
+        return {**self.__dict__, "snapshot": None}
+
+    def data_script(self) -> str:
+        return (
+            f"<script>\n"
+            f"    var {self.dashboard_id} = {self.dashboard_json};\n"
+            f"    var additional_graphs_{self.dashboard_id} = {self.graphs_json};\n"
+            f"</script>"
+        )
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self.dashboard_json) + len(self.graphs_json)
+
+    def draw_call(self) -> str:
+        return (
+            f"window.drawDashboard({self.dashboard_id}, "
+            f"new Map(Object.entries(additional_graphs_{self.dashboard_id})), \"root_{self.dashboard_id}\");"
+        )
+
+
+def _graph_item(graph):
+    item = graph.params if isinstance(graph, AdditionalGraphInfo) else graph
+    return item.dict() if isinstance(item, BaseWidgetInfo) else item
+
+
+def _widget_metric(ev, info: BaseWidgetInfo) -> str:
+    for metric_id in info.linked_metrics or []:
+        metric = ev._metrics.get(metric_id)
+        if metric is not None:
+            return metric.display_name
+    return info.title or info.type
+
+
+def widget_sizes(ev) -> List[Tuple[str, str, str, int]]:
+    """(metric, title, type, bytes) của mỗi widget top-level + tests widgets của `ev`."""
+    sizes = []
+    for tests, widgets in ((False, ev._widgets), (True, ev._tests_widgets)):
+        for info in widgets:
+            body = info.dict()
+            body.pop("additionalGraphs", None)
+            graphs = {str(graph.id): _graph_item(graph) for graph in info.get_additional_graphs()}
+            size = len(json.dumps(body, cls=NumpyEncoder)) + (len(json.dumps(graphs, cls=NumpyEncoder)) if graphs else 0)
+            metric = "Tests" if tests else _widget_metric(ev, info)
+            sizes.append((metric, info.title or "", info.type, size))
+    return sizes
+
+
+def render_widgets(widgets: List[BaseWidgetInfo], tests_widgets: Optional[List[BaseWidgetInfo]] = None, **kwargs) -> RenderedReport:
+    """Widgets (+ tests widgets) -> JSON của dashboard (như Snapshot.get_html_str, không qua template)."""
+    widgets = [group_widget(title="", widgets=widgets)] + list(tests_widgets or [])
+    graphs = {}
+    for info in widgets:
+        for graph in info.get_additional_graphs():
+            graphs[str(graph.id)] = _graph_item(graph)
+    return RenderedReport(
+        dashboard_id="metric_" + uuid.uuid4().hex,
+        dashboard_json=dashboard_info_to_json(DashboardInfo(name="Report", widgets=widgets)),
+        graphs_json=json.dumps(graphs, cls=NumpyEncoder),
+        **kwargs,
+    )
+
+
+def render_snapshot(ev) -> RenderedReport:
+    """Widgets + tests widgets của Snapshot `ev`, kèm bytes theo widget."""
+    return render_widgets(ev._widgets, ev._tests_widgets, snapshot=ev, widget_bytes=widget_sizes(ev))
+
+
+@lru_cache(maxsize=1)
+def _evidently_js() -> str:
+    with open(os.path.join(STATIC_PATH, "index.js"), encoding="utf-8") as f:
+        return f.read()
+
+
+@lru_cache(maxsize=1)
+def _evidently_css() -> str:
+    with open(os.path.join(STATIC_PATH, "material-ui-icons.woff2"), "rb") as f:
+        font = base64.b64encode(f.read()).decode()
+    return f"""
+    @font-face {{
+      font-family: 'Material Icons';
+      font-style: normal;
+      font-weight: 400;
+      src: url(data:font/ttf;base64,{font}) format('woff2');
+    }}
+    .center-align {{ text-align: center; }}
+    .material-icons {{
+      font-family: 'Material Icons';
+      font-weight: normal;
+      font-style: normal;
+      font-size: 24px;
+      line-height: 1;
+      letter-spacing: normal;
+      text-transform: none;
+      display: inline-block;
+      white-space: nowrap;
+      word-wrap: normal;
+      direction: ltr;
+      text-rendering: optimizeLegibility;
+      -webkit-font-smoothing: antialiased;
+    }}
+"""
+
+
+def _evidently_style() -> str:
+    return f"<style>{_evidently_css()}</style>"
+
+
+def standalone_html(report: RenderedReport) -> str:
+    """Một document HTML cho một report (cùng nội dung với ev.save_html)."""
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    {_evidently_style()}
+    {report.data_script()}
+</head>
+<body>
+<div id="root_{report.dashboard_id}"></div>
+<script>var global = globalThis</script>
+<script>{_evidently_js()}</script>
+<script>{report.draw_call()}</script>
+</body>
+</html>
+"""
+
+
+def _tabs_page(titles: List[str], panes: List[str], head: str, script: str, format_html_path) -> str:
+    """Khung format.html: thanh tab + nội dung các tab (tab1 active) + script."""
+    buttons = [
+        f'<button class="tablinks{" active" if k == 1 else ""}" onclick="openTab(event, \'tab{k}\')">{title}</button>'
+        for k, title in enumerate(titles, start=1)
+    ]
+    panes = [
+        f'<div id="tab{k}" class="tabcontent{" active" if k == 1 else ""}">\n{pane}\n</div>'
+        for k, pane in enumerate(panes, start=1)
+    ]
+    content = "\n".join([head, '<div class="tab">', *buttons, '</div>', *panes, script])
+    with open(format_html_path, "r", encoding="utf-8") as f:
+        return f.read().replace("{add_html_content}", content)
+
+
+def tabbed_html(tabs: List[Tuple[str, RenderedReport]], format_html_path=FORMAT_HTML_PATH) -> str:
+    """
+    Một document nhiều tab (title, report) theo khung format.html: style + JS bundle của
+    Evidently nhúng một lần, tab đầu vẽ ngay, tab khác vẽ khi mở lần đầu (openTab -> drawTab).
+    """
+    panes = [f'{report.data_script()}\n<div id="root_{report.dashboard_id}"></div>' for _, report in tabs]
+    draws = [f'"tab{k}": function () {{ {report.draw_call()} }}' for k, (_, report) in enumerate(tabs, start=1)]
+    script = "\n".join([
+        "<script>var global = globalThis</script>",
+        f"<script>{_evidently_js()}</script>",
+        "<script>",
+        "var evidentlyTabs = {" + ", ".join(draws) + "};",
+        "function drawTab(tabName) {",
+        "    var draw = evidentlyTabs[tabName];",
+        "    if (draw) { delete evidentlyTabs[tabName]; draw(); }",
+        "}",
+        "drawTab('tab1');",
+        "</script>",
+    ])
+    return _tabs_page([title for title, _ in tabs], panes, _evidently_style(), script, format_html_path)
+
+
+def _write_text(path, text: str, gzip: bool = False) -> str:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = text.encode("utf-8")
+    outputs = [(path, data)]
+    if gzip:
+        # mtime=0 -> cùng nội dung thì cùng bytes (không đổi ETag / không sync lại file share)
+        outputs.append((path.with_name(path.name + ".gz"), gzip_lib.compress(data, mtime=0)))
+    for target, payload in outputs:
+        # Ghi ra file tạm rồi rename để không để lại file hỏng nếu bị ngắt giữa chừng
+        tmp = target.with_name(target.name + ".tmp")
+        tmp.write_bytes(payload)
+        tmp.replace(target)
+    return str(path)
+
+
+def _relative_src(path, html_path) -> str:
+    return Path(os.path.relpath(path, Path(html_path).parent)).as_posix()
+
+
+def ensure_assets(assets_dir, gzip: bool = False) -> str:
+    """
+    Asset bundle dùng chung: JS của Evidently + font icon (chèn bằng JS, vì font load từ
+    thư mục khác bị chặn trên file:// ở một số trình duyệt). Ghi một lần cho mỗi version.
+    """
+    path = Path(assets_dir) / f"evidently-{evidently.__version__}.js"
+    if not path.exists() or (gzip and not path.with_name(path.name + ".gz").exists()):
+        font_loader = (
+            "(function () { var style = document.createElement('style'); "
+            f"style.textContent = {json.dumps(_evidently_css())}; document.head.appendChild(style); }})();"
+        )
+        _write_text(path, "\n".join(["var global = globalThis;", font_loader, _evidently_js()]), gzip=gzip)
+    return str(path)
+
+
+def write_payload(report: RenderedReport, html_path, gzip: bool = False) -> str:
+    """Payload của report: <html dir>/js/<html name>.data.js; gán report.payload_path."""
+    html_path = Path(html_path)
+    path = html_path.parent / "js" / f"{html_path.stem}.data.js"
+    text = f"evidentlyDashboard(document.currentScript, {report.dashboard_json}, {report.graphs_json});\n"
+    report.payload_path = _write_text(path, text, gzip=gzip)
+    return report.payload_path
+
+
+def write_dashboard(
+    html_path,
+    tabs: List[Tuple[str, RenderedReport]],
+    assets_dir,
+    gzip: bool = False,
+    format_html_path=FORMAT_HTML_PATH,
+) -> str:
+    """
+    Trang dashboard (title, report) -> chỉ có khung + tham chiếu tới asset bundle và payload
+    của từng tab (payload chưa có thì ghi, vd. khi report chưa qua write_payload).
+    """
+    assets = ensure_assets(assets_dir, gzip=gzip)
+    payloads = {}
+    for k, (_, report) in enumerate(tabs, start=1):
+        if report.payload_path is None:
+            write_payload(report, html_path, gzip=gzip)
+        payloads[f"tab{k}"] = _relative_src(report.payload_path, html_path)
+    panes = [f'<div id="root_tab{k}"></div>' for k in range(1, len(tabs) + 1)]
+    script = "\n".join([
+        f'<script src="{_relative_src(assets, html_path)}"></script>',
+        "<script>",
+        "window.evidentlyDashboard = function (script, dashboard, graphs) {",
+        "    window.drawDashboard(dashboard, new Map(Object.entries(graphs)), script.dataset.root);",
+        "};",
+        f"var evidentlyPayloads = {json.dumps(payloads)};",
+        "function drawTab(tabName) {",
+        "    var src = evidentlyPayloads[tabName];",
+        "    if (!src) return;",
+        "    delete evidentlyPayloads[tabName];",
+        "    var script = document.createElement('script');",
+        "    script.src = src;",
+        "    script.dataset.root = 'root_' + tabName;",
+        "    document.body.appendChild(script);",
+        "}",
+        "drawTab('tab1');",
+        "</script>",
+    ])
+    html = _tabs_page([title for title, _ in tabs], panes, "", script, format_html_path)
+    return _write_text(html_path, html, gzip=gzip)
+
+
+def write_html(path, html: str) -> str:
+    """Ghi HTML ra file tạm rồi rename (không để lại file hỏng nếu bị ngắt giữa chừng)."""
+    return _write_text(path, html)
@@ -1,4 +1,3 @@
-from sklearn.metrics import roc_auc_score
 import scorecardpy as sc
 from evidently import Dataset
 
@@ -10,16 +9,29 @@ from evidently.core.metric_types import BoundTest
 from evidently.tests import Reference, eq
 from typing import List, Optional
 
+from .confidence import set_interval_test
+from .discrimination import get_discrimination, profile_discrimination
+from ..reference_profile import report_reference_profile
+from .plot_budget import widgets_enabled
+
 DROP_COLS = ["CUSTOMER_CODE", "DATE_PARTITION", "DISBURSE_DATE_WID"]
 
 class AUCMetric(SingleValueMetric):
     true_column: str
     pred_column: str
+    reference_profile: Optional[str] = None  # path tới reference profile (None = metadata reference_profile của Report)
+    # Confidence interval mode: "bootstrap" / "delong" -> test chỉ FAIL khi CI không chứa reference
+    ci_method: Optional[str] = None
+    ci_level: float = 0.95
+    n_resamples: int = 1000
 
-    def _default_tests(self) -> List[BoundTest]:
+    def _default_tests(self, context: Optional[Context] = None) -> List[BoundTest]:
         return [eq(0.5).bind_single(self.get_fingerprint())]
 
-    def _default_tests_with_reference(self) -> List[BoundTest]:
+    def _default_tests_with_reference(self, context: Optional[Context] = None) -> List[BoundTest]:
+        # CI mode: test được gắn trong calculate (set_interval_test)
+        if self.ci_method is not None:
+            return []
         return [eq(Reference(relative=0.05)).bind_single(self.get_fingerprint())]
 
 # implementation
@@ -28,15 +40,20 @@ class AUCMetricImplementation(SingleValueCalculation[AUCMetric]):
         current_data: Dataset, 
         reference_data: Optional[Dataset]
         ) -> SingleValue:
-        y_true = current_data.column(self.metric.true_column).data
-        y_pred = current_data.column(self.metric.pred_column).data
-        auc = roc_auc_score(y_true, y_pred)
-        result = self.result(value=auc)
+        # Kernel dùng chung với Gini / KS (sort một lần, memoize trong context)
+        cur = get_discrimination(context, current_data, self.metric.true_column, self.metric.pred_column)
+        result = self.result(value=cur.auc)
+        if not widgets_enabled(context):
+            result.widget = []
+        reference_profile = report_reference_profile(context, self.metric.reference_profile)
+        if reference_data is not None and reference_profile:
+            ref_auc = profile_discrimination(reference_profile).auc
+            set_interval_test(self, context, current_data, result, ref_auc, "auc")
+            return result, self.result(value=ref_auc)
         if reference_data is not None:
-            result_ref = self.result(
-                value=roc_auc_score(reference_data.column(self.metric.true_column).data,
-                                    reference_data.column(self.metric.pred_column).data)
-                                    )
+            ref = get_discrimination(context, reference_data, self.metric.true_column, self.metric.pred_column)
+            set_interval_test(self, context, current_data, result, ref.auc, "auc")
+            result_ref = self.result(value=ref.auc)
             return result, result_ref
         else:
             return result
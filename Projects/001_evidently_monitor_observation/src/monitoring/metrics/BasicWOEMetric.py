@@ -1,6 +1,3 @@
-import scorecardpy as sc
-
-
 from evidently import Dataset
 from evidently.core.report import Context
 from evidently.core.metric_types import SingleValue
@@ -9,74 +6,24 @@ from evidently.core.metric_types import SingleValueCalculation
 import plotly.graph_objects as go
 from evidently.legacy.renderers.html_widgets import plotly_figure
 
-from typing import List, Optional, Dict
+from typing import List, Optional
 import pandas as pd
 
-# Thêm logic LABEL theo rule như cell ở đầu
-def add_label_col(df: pd.DataFrame, target_col: str):
-    # Gọi trực tiếp logic phân loại LABEL good/bad như ở cell đầu file
-    df = df.copy()
-    df.columns = df.columns.str.strip()
-    if target_col not in df.columns:
-        raise KeyError(f"Target column '{target_col}' not found. Available columns: {list(df.columns)[:30]}")
-    # Lấy lại logic mapping
-    df['LABEL'] = ['good' if x == 1 else 'bad' for x in df[target_col]]
-    return df
+from ..reference_profile import report_reference_profile
+from .plot_budget import PlotBudget, budget_of, widgets_enabled
+from .scorecard_binning import get_scorecard_binning
+
 
 class BasicWOEMetric(SingleValueMetric):
-    target_column: str           # y: 0/1 (bad=1)
+    target_column: str           # y: 0/1 (bad = 0, xem scorecard_binning)
     features: List[str]          # list feature columns
     top_n: int = 50              # show top N features (by order), for readability
+    reference_profile: Optional[str] = None  # path tới reference profile (None = metadata của Report)
+    breaks_artifact: Optional[str] = None  # path tới breaks artifact của scorecard (không fit breaks)
+    breaks_artifact_version: Optional[str] = None  # version artifact mong đợi (None = không kiểm tra)
+    plot_budget: Optional[PlotBudget] = None  # size budget khi vẽ: số feature <= max_features
 
 class BasicWOEMetricImplementation(SingleValueCalculation[BasicWOEMetric]):
-    def _preprocess_df(self, df: pd.DataFrame, target: str, features: List[str]) -> tuple:
-        # Strip all column names and drop unwanted columns
-        df = df.copy()
-        df.columns = df.columns.str.strip()
-        df = df.drop(columns=["CUSTOMER_CODE", "DATE_PARTITION", "DISBURSE_DATE_WID"], errors="ignore")
-
-        # Ensure target exists
-        if target not in df.columns:
-            raise KeyError(f"Target column '{target}' not found after column cleanup. Available columns: {list(df.columns)[:30]}")
-
-        # Only keep valid features and target
-        selected_features = [c for c in features if c in df.columns and c != target]
-        df = add_label_col(df, target)
-        df = df[selected_features + ["LABEL"]]
-
-        return df, selected_features
-
-    def _calc_woe(self, df, features, target, breaks_list=None):
-        """
-        Tính WOE bins cho dataframe.
-        Nếu breaks_list được cung cấp, sẽ sử dụng breaks đó thay vì tự động tính.
-        """
-        # Process DataFrame before calculation
-        df_proc, used_features = self._preprocess_df(df, target, features)
-        work = df_proc
-        
-        if breaks_list is not None:
-            # Áp dụng breaks đã có (từ reference) cho current
-            bins = sc.woebin(work, y='LABEL', x=used_features, breaks_list=breaks_list)
-        else:
-            # Tự động tính bins
-            bins = sc.woebin(work, y='LABEL', x=used_features)
-        return bins, used_features
-
-    def _extract_breaks_from_bins(self, bins: Dict) -> Dict:
-        """
-        Trích xuất breaks từ bins dict để tái sử dụng cho dataset khác.
-        """
-        breaks_list = {}
-        for feat, bin_df in bins.items():
-            if bin_df is not None and len(bin_df) > 0 and 'breaks' in bin_df.columns:
-                # Lấy breaks từ bin_df, bỏ qua 'missing' và 'special'
-                breaks = bin_df['breaks'].dropna().tolist()
-                breaks = [b for b in breaks if b not in ['missing', 'special', 'Missing', 'Special']]
-                if breaks:
-                    breaks_list[feat] = breaks
-        return breaks_list
-
     def calculate(
         self,
         context: Context,
@@ -86,26 +33,23 @@ class BasicWOEMetricImplementation(SingleValueCalculation[BasicWOEMetric]):
         features = [c.strip() for c in self.metric.features]
         target_col = self.metric.target_column
 
-        # ---- reference_data (tính bins trước để lấy breaks) ----
-        bins_ref = None
-        show_feats_ref = None
-        breaks_list = None
-        
-        if reference_data is not None:
-            df_ref = reference_data.as_dataframe()
-            bins_ref, use_feats_ref = self._calc_woe(df_ref, features, target_col)
-            show_feats_ref = use_feats_ref[:self.metric.top_n]
-            # Trích xuất breaks từ reference để áp dụng cho current
-            breaks_list = self._extract_breaks_from_bins(bins_ref)
-
-        # ---- current_data (dùng cùng breaks với reference nếu có) ----
-        df_cur = current_data.as_dataframe()
-        bins_cur, use_feats_cur = self._calc_woe(df_cur, features, target_col, breaks_list=breaks_list)
-        show_feats_cur = use_feats_cur[:self.metric.top_n]
+        # Bins dùng chung với IVSummaryMetric (reference từ profile nếu có,
+        # current dùng cùng breaks với reference hoặc breaks artifact của scorecard)
+        binning_cur, binning_ref = get_scorecard_binning(
+            context, current_data, reference_data, target_col, features,
+            reference_profile=report_reference_profile(context, self.metric.reference_profile),
+            breaks_artifact=self.metric.breaks_artifact,
+            breaks_version=self.metric.breaks_artifact_version,
+        )
+        bins_ref = binning_ref.bins if binning_ref is not None else None
+        bins_cur = binning_cur.bins
+        # Số feature vẽ: top_n nhưng không quá budget (mỗi feature một figure 2 subplot)
+        show_feats_cur = binning_cur.features[:min(self.metric.top_n, budget_of(self.metric).max_features)]
 
         widgets = []
         from plotly.subplots import make_subplots
-        top_feats = show_feats_cur[:]
+        # Metrics-only: không dựng figure nào (value của metric không phụ thuộc widgets)
+        top_feats = show_feats_cur[:] if widgets_enabled(context) else []
 
         for f in top_feats:
             bin_cur = bins_cur.get(f)
@@ -0,0 +1,355 @@
+"""
+Data quality bằng column_profile.profile_frame (một pass mỗi cột), thay cho
+DatasetMissingValueCount / DuplicatedRowCount / EmptyRowsCount / ConstantColumnsCount /
+DataSummaryPreset / DatasetCorrelations.
+
+Mọi metric trong cùng report đọc chung một FrameProfile cho current và một cho reference
+(memoize trong Context) -> mỗi frame chỉ được quét một lần dù có hàng trăm metric:
+- DatasetProfileValue: row_count / column_count / số cột theo kiểu (numerical / categorical /
+  datetime / text, lấy từ data definition) / duplicated_rows / empty_rows / empty_columns /
+  constant_columns
+- DatasetMissingValues: count / share ô missing của cả frame
+- ColumnProfileValue cho từng cột: missing / missing_share / n_unique
+  (+ min / max / mean / std / quantiles cho numeric)
+
+Default tests (khác Evidently ở missing: khi có reference chỉ test share, vì count missing
+tăng giảm theo số dòng của kỳ):
+- không reference: row_count / column_count gt(0); duplicated_rows / empty_rows /
+  empty_columns / constant_columns / missing (count, cả frame và từng cột) eq(0)
+- có reference: row_count / duplicated_rows / empty_rows eq(Reference(relative=0.1));
+  column_count eq(Reference()); empty_columns / constant_columns lte(Reference());
+  missing share (cả frame và từng cột) eq(Reference(relative=0.1)); min / max / mean / std /
+  quantiles eq(Reference(relative=0.1)) như StatisticsMetric của DataSummaryPreset
+- số cột theo kiểu và n_unique không có test
+
+Không thay thế (so với DataSummaryPreset + DatasetCorrelations): DuplicatedColumnsCount,
+AlmostConstantColumnsCount, value counts của cột categorical (CategoryCount) và correlation
+Spearman / Kendall / Cramér's V (chỉ có Pearson giữa các cột numeric). Cần các metric này thì
+thêm metric Evidently tương ứng vào report.
+
+DataProfilePreset render counter + bảng profile theo cột (current / reference) + heatmap
+correlation numeric.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import plotly.graph_objects as go
+
+from evidently import Dataset
+from evidently.core.container import MetricContainer, MetricOrContainer
+from evidently.core.metric_types import (
+    BoundTest,
+    ColumnMetric,
+    CountCalculation,
+    CountMetric,
+    CountValue,
+    MetricId,
+    SingleValue,
+    SingleValueCalculation,
+    SingleValueMetric,
+)
+from evidently.core.report import Context
+from evidently.core.tests import Reference
+from evidently.legacy.model.widget import BaseWidgetInfo
+from evidently.legacy.renderers.html_widgets import CounterData, counter, plotly_figure, table_data
+from evidently.legacy.tests.base_test import TestStatus
+from evidently.tests import eq, gt, lte
+
+from ..column_profile import DEFAULT_QUANTILES, FrameProfile, profile_frame
+from .plot_budget import PlotBudget, budget_of, widgets_enabled
+
+# stat của DatasetProfileValue -> thuộc tính của FrameProfile
+DATASET_STATS = {
+    "row_count": "n_rows",
+    "column_count": "n_columns",
+    "duplicated_rows": "n_duplicated_rows",
+    "empty_rows": "n_empty_rows",
+    "empty_columns": "n_empty_columns",
+    "constant_columns": "n_constant_columns",
+}
+# stat số cột theo kiểu -> getter của DataDefinition (không cần quét data)
+COLUMN_TYPE_STATS = {
+    "numerical_columns": "get_numerical_columns",
+    "categorical_columns": "get_categorical_columns",
+    "datetime_columns": "get_datetime_columns",
+    "text_columns": "get_text_columns",
+}
+COLUMN_STATS = ["missing", "missing_share", "n_unique"]
+NUMERIC_STATS = ["min", "max", "mean", "std", *[f"q{q:g}" for q in DEFAULT_QUANTILES]]
+
+
+def get_data_profile(context: Context, dataset: Dataset) -> FrameProfile:
+    """FrameProfile của `dataset`, memoize trong `context` (một pass cho mọi metric của report)."""
+    cache = getattr(context, "_data_profile_cache", None)
+    if cache is None:
+        cache = {}
+        context._data_profile_cache = cache
+    hit = cache.get(id(dataset))
+    if hit is None or hit[0] is not dataset:
+        hit = (dataset, profile_frame(
+            dataset.as_dataframe(),
+            numeric=dataset.data_definition.get_numerical_columns(),
+        ))
+        cache[id(dataset)] = hit
+    return hit[1]
+
+
+def _profiles(context: Context, current_data: Dataset, reference_data: Optional[Dataset]):
+    current = get_data_profile(context, current_data)
+    reference = get_data_profile(context, reference_data) if reference_data is not None else None
+    return current, reference
+
+
+class DatasetProfileValue(SingleValueMetric):
+    """Một stat cấp dataset của FrameProfile (xem DATASET_STATS) hoặc số cột theo kiểu (COLUMN_TYPE_STATS)."""
+
+    stat: str
+    """row_count | column_count | numerical_columns | categorical_columns | datetime_columns |
+    text_columns | duplicated_rows | empty_rows | empty_columns | constant_columns."""
+
+    def _default_tests(self, context: Context) -> List[BoundTest]:
+        if self.stat in COLUMN_TYPE_STATS:
+            return []
+        test = gt(0) if self.stat in ("row_count", "column_count") else eq(0)
+        return [test.bind_single(self.get_fingerprint())]
+
+    def _default_tests_with_reference(self, context: Context) -> List[BoundTest]:
+        if self.stat in COLUMN_TYPE_STATS:
+            return []
+        if self.stat in ("empty_columns", "constant_columns"):
+            test = lte(Reference())
+        elif self.stat == "column_count":
+            test = eq(Reference())
+        else:
+            test = eq(Reference(relative=0.1))
+        return [test.bind_single(self.get_fingerprint())]
+
+
+class DatasetProfileValueCalculation(SingleValueCalculation[DatasetProfileValue]):
+    def calculate(
+        self,
+        context: Context,
+        current_data: Dataset,
+        reference_data: Optional[Dataset],
+    ) -> Tuple[SingleValue, Optional[SingleValue]]:
+        stat = self.metric.stat
+        if stat in COLUMN_TYPE_STATS:
+            getter = COLUMN_TYPE_STATS[stat]
+            result = self.result(len(getattr(current_data.data_definition, getter)()))
+            if not widgets_enabled(context):
+                result.widget = []
+            if reference_data is None:
+                return result, None
+            return result, self.result(len(getattr(reference_data.data_definition, getter)()))
+        if stat not in DATASET_STATS:
+            raise ValueError(
+                f"Unsupported dataset stat '{stat}'. Use one of {list(DATASET_STATS) + list(COLUMN_TYPE_STATS)}"
+            )
+        current, reference = _profiles(context, current_data, reference_data)
+        result = self.result(current.value(DATASET_STATS[stat]))
+        if not widgets_enabled(context):
+            result.widget = []
+        return result, None if reference is None else self.result(reference.value(DATASET_STATS[stat]))
+
+    def display_name(self) -> str:
+        return f"Dataset {self.metric.stat.replace('_', ' ')}"
+
+
+class DatasetMissingValues(CountMetric):
+    """Số / tỉ lệ ô missing của cả frame (share = missing / (rows x columns))."""
+
+    def _default_tests(self, context: Context) -> List[BoundTest]:
+        return [eq(0).bind_count(self.get_fingerprint(), is_count=True)]
+
+    def _default_tests_with_reference(self, context: Context) -> List[BoundTest]:
+        # So share với reference (count phụ thuộc số dòng của kỳ)
+        return [eq(Reference(relative=0.1)).bind_count(self.get_fingerprint(), is_count=False)]
+
+
+class DatasetMissingValuesCalculation(CountCalculation[DatasetMissingValues]):
+    def calculate(
+        self,
+        context: Context,
+        current_data: Dataset,
+        reference_data: Optional[Dataset],
+    ) -> Tuple[CountValue, Optional[CountValue]]:
+        current, reference = _profiles(context, current_data, reference_data)
+        result = self.result(current.n_missing, current.missing_share)
+        if not widgets_enabled(context):
+            result.widget = []
+        return result, None if reference is None else self.result(reference.n_missing, reference.missing_share)
+
+    def display_name(self) -> str:
+        return "Count of missing values"
+
+    def share_display_name(self) -> str:
+        return "Share of missing values"
+
+
+class ColumnProfileValue(ColumnMetric, SingleValueMetric):
+    """Một stat của cột trong FrameProfile (COLUMN_STATS, cột numeric có thêm NUMERIC_STATS)."""
+
+    stat: str
+    """missing | missing_share | n_unique | min | max | mean | std | q0.25 | q0.5 | q0.75."""
+
+    def _default_tests(self, context: Context) -> List[BoundTest]:
+        if self.stat == "missing":
+            return [eq(0).bind_single(self.get_fingerprint())]
+        return []
+
+    def _default_tests_with_reference(self, context: Context) -> List[BoundTest]:
+        # Missing: chỉ test share với reference (count phụ thuộc số dòng của kỳ)
+        if self.stat in ("missing", "n_unique"):
+            return []
+        return [eq(Reference(relative=0.1)).bind_single(self.get_fingerprint())]
+
+
+class ColumnProfileValueCalculation(SingleValueCalculation[ColumnProfileValue]):
+    def calculate(
+        self,
+        context: Context,
+        current_data: Dataset,
+        reference_data: Optional[Dataset],
+    ) -> Tuple[SingleValue, Optional[SingleValue]]:
+        column, stat = self.metric.column, self.metric.stat
+        current, reference = _profiles(context, current_data, reference_data)
+        if column not in current.columns.index:
+            raise ValueError(f"Column '{column}' not found in current dataset.")
+        if stat not in current.columns.columns:
+            raise ValueError(f"Unsupported column stat '{stat}'. Use one of {COLUMN_STATS + NUMERIC_STATS}")
+        result = self.result(current.value(stat, column))
+        if not widgets_enabled(context):
+            result.widget = []
+        ref_result = None
+        if reference is not None and column in reference.columns.index:
+            ref_result = self.result(reference.value(stat, column))
+        return result, ref_result
+
+    def display_name(self) -> str:
+        return f"{self.metric.stat} of {self.metric.column}"
+
+
+def _format(value) -> str:
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return "-"
+    return f"{value:.4g}" if isinstance(value, float) else str(value)
+
+
+def _pair(current, reference) -> str:
+    return _format(current) if reference is None else f"{_format(current)} / {_format(reference)}"
+
+
+class DataProfilePreset(MetricContainer):
+    """
+    Thay DataSummaryPreset (+ các metric data quality cấp dataset): metrics từ FrameProfile,
+    render counter + bảng profile theo cột + heatmap correlation (thay cho widget của từng cột).
+    """
+
+    columns: Optional[List[str]] = None
+    """Cột cần profile (None = mọi cột numeric + categorical của data definition)."""
+    plot_budget: Optional[PlotBudget] = None
+
+    def __init__(
+        self,
+        columns: Optional[List[str]] = None,
+        plot_budget: Optional[PlotBudget] = None,
+        include_tests: bool = True,
+    ):
+        self.columns = columns
+        self.plot_budget = plot_budget
+        super().__init__(include_tests=include_tests)
+
+    def _columns(self, context: Context) -> List[str]:
+        if self.columns is not None:
+            return list(self.columns)
+        definition = context.data_definition
+        return [*definition.get_numerical_columns(), *definition.get_categorical_columns()]
+
+    def generate_metrics(self, context: Context) -> Sequence[MetricOrContainer]:
+        metrics: List[MetricOrContainer] = [
+            DatasetProfileValue(stat=stat, tests=self._get_tests(None))
+            for stat in [*DATASET_STATS, *COLUMN_TYPE_STATS]
+        ]
+        metrics.append(DatasetMissingValues(tests=self._get_tests(None), share_tests=self._get_tests(None)))
+        numeric = set(context.data_definition.get_numerical_columns())
+        for column in self._columns(context):
+            stats = COLUMN_STATS + (NUMERIC_STATS if column in numeric else [])
+            metrics.extend(ColumnProfileValue(column=column, stat=stat, tests=self._get_tests(None)) for stat in stats)
+        return metrics
+
+    def render(
+        self,
+        context: Context,
+        child_widgets: Optional[List[Tuple[Optional[MetricId], List[BaseWidgetInfo]]]] = None,
+    ) -> List[BaseWidgetInfo]:
+        if not widgets_enabled(context):
+            return []
+        current, reference = _profiles(context, *context._input_data)
+
+        def dataset_pair(attr: str) -> str:
+            return _pair(getattr(current, attr), None if reference is None else getattr(reference, attr))
+
+        widgets = [counter(
+            title="",
+            counters=[
+                CounterData(dataset_pair("n_rows"), "Rows (current / reference)"),
+                CounterData(dataset_pair("n_columns"), "Columns"),
+                CounterData(dataset_pair("missing_share"), "Share of missing values"),
+                CounterData(dataset_pair("n_duplicated_rows"), "Duplicated rows"),
+                CounterData(dataset_pair("n_empty_rows"), "Empty rows"),
+                CounterData(dataset_pair("n_empty_columns"), "Empty columns"),
+                CounterData(dataset_pair("n_constant_columns"), "Constant columns"),
+            ],
+        )]
+
+        # Số test FAIL theo cột
+        failed: Dict[str, int] = {}
+        for metric in self.metrics(context):
+            if isinstance(metric, ColumnProfileValue):
+                result = context.get_metric_result(metric)
+                failed[metric.column] = failed.get(metric.column, 0) + sum(t.status == TestStatus.FAIL for t in result.tests)
+
+        stats = COLUMN_STATS + NUMERIC_STATS
+        rows = []
+        for column in self._columns(context):
+            if column not in current.columns.index:
+                continue
+            cur = current.columns.loc[column]
+            ref = reference.columns.loc[column] if reference is not None and column in reference.columns.index else None
+            rows.append([
+                column,
+                cur["kind"],
+                *[_pair(
+                    None if cur.get(s) is None else float(cur.get(s)),
+                    None if ref is None or ref.get(s) is None else float(ref.get(s)),
+                ) for s in stats],
+                str(failed.get(column, 0)),
+            ])
+        widgets.append(table_data(
+            title="Column profile (current / reference)",
+            column_names=["Column", "Kind", *stats, "Failed tests"],
+            data=rows,
+        ))
+
+        # Correlation numeric của current, tối đa max_features cột
+        corr = current.correlation
+        if len(corr):
+            shown = corr.columns[:budget_of(self).max_features]
+            z = corr.loc[shown, shown].to_numpy()
+            digits = budget_of(self).plot_digits
+            fig = go.Figure(go.Heatmap(
+                z=z if digits is None else np.round(z, digits),
+                x=list(shown),
+                y=list(shown),
+                colorscale="RdBu_r",
+                zmin=-1,
+                zmax=1,
+                colorbar=dict(title="Pearson"),
+                hovertemplate="%{y} x %{x}<br>corr=%{z:.3f}<extra></extra>",
+            ))
+            fig.update_layout(height=max(300, 18 * len(shown) + 120))
+            widgets.append(plotly_figure(
+                title=f"Correlation of numeric columns, current ({len(shown)}/{len(corr)})",
+                figure=fig,
+            ))
+        return widgets
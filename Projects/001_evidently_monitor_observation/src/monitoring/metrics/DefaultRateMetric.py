@@ -7,11 +7,25 @@ from evidently.core.metric_types import BoundTest
 from evidently.tests import Reference, eq
 from typing import List, Optional
 
+import numpy as np
+
+from ..reference_profile import load_reference_profile, report_reference_profile
+from .discrimination import valid_pairs
+from .plot_budget import widgets_enabled
+
+
+def _default_rate(dataset: Dataset, true_column: str, pred_column: str) -> float:
+    df = dataset.as_dataframe()
+    # Frame không có score (vd. chỉ ghép features + labels) -> chỉ bỏ dòng thiếu label
+    y_pred = df[pred_column] if pred_column in df.columns else np.zeros(len(df))
+    y_true, _ = valid_pairs(df[true_column], y_pred)
+    return float((y_true == 1).sum() / len(y_true)) if len(y_true) else np.nan
 
 
 class DefaultRateMetric(SingleValueMetric):
     true_column: str
     pred_column: str
+    reference_profile: Optional[str] = None  # path tới reference profile (None = metadata reference_profile của Report)
 
     def _default_tests(self) -> List[BoundTest]:
         return [eq(0.0).bind_single(self.get_fingerprint())]
@@ -24,13 +38,17 @@ class DefaultRateMetricImplementation(SingleValueCalculation[DefaultRateMetric])
         current_data: Dataset,
         reference_data: Optional[Dataset]
         ) -> SingleValue:
-        y_true = current_data.column(self.metric.true_column).data
-        # default_rate = (y_true == 1).sum() / len(y_true)
-        default_rate = (y_true == 1).sum() / len(y_true)
+        # Chỉ tính trên dòng có cả label và score (cùng mask với AUC / KS và reference profile)
+        default_rate = _default_rate(current_data, self.metric.true_column, self.metric.pred_column)
         result = self.result(value=default_rate)
+        if not widgets_enabled(context):
+            result.widget = []
+        reference_profile = report_reference_profile(context, self.metric.reference_profile)
+        if reference_data is not None and reference_profile:
+            profile = load_reference_profile(reference_profile)
+            return result, self.result(value=profile.performance["default_rate"])
         if reference_data is not None:
-            ref_y_true = reference_data.column(self.metric.true_column).data
-            ref_default_rate = (ref_y_true == 1).sum() / len(ref_y_true)
+            ref_default_rate = _default_rate(reference_data, self.metric.true_column, self.metric.pred_column)
             result_ref = self.result(value=ref_default_rate)
             return result, result_ref
         else:
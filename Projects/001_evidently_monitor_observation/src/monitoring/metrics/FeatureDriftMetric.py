@@ -0,0 +1,504 @@
+"""
+Feature drift cho mọi cột bằng drift_engine (batch), thay cho DataDriftPreset.
+
+FeatureDriftPreset sinh metrics cùng dạng với DataDriftPreset:
+- DriftedFeaturesCount: count / share số cột drift, test share < drift_share
+- FeatureDrift cho từng cột: value = drift score, test "drift" theo method / threshold
+
+Mọi metric trong cùng report đọc chung một bảng drift (memoize trong Context): reference
+được bin MỘT lần cho mọi cột (hoặc lấy drift_bins từ reference profile), current được
+gán bin + đếm MỘT lần (ma trận numeric stack + categorical theo dictionary), PSI / KS /
+Wasserstein của mọi cột tính cùng lúc -> không còn overhead stattest theo từng cột.
+
+Method hỗ trợ: drift_engine.SUPPORTED_METHODS (ks -> score là p-value như stattest 'ks').
+Cột numeric ít giá trị (<= DISCRETE_MAX_UNIQUE) vẫn dùng method được cấu hình (KS /
+Wasserstein trên grid các giá trị của reference). Chỉ cột categorical (không có thứ tự, không
+tính được KS / Wasserstein) chuyển sang PSI với psi_threshold, có log khi chuyển.
+
+Reference profile: metric đọc path từ metadata "reference_profile" của Report (xem
+reference_profile.report_reference_profile) -> path không nằm trong metric_id / metric_name.
+
+FeatureDriftHeatmap: ma trận PSI (feature x timestamp) của current so với toàn bộ reference,
+một lần gán bin + một lần bincount theo (timestamp, bin) cho mọi cột, vẽ thành một heatmap.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from evidently import Dataset
+from evidently.core.container import MetricContainer, MetricOrContainer
+from evidently.core.metric_types import (
+    BoundTest,
+    ColumnMetric,
+    CountCalculation,
+    CountMetric,
+    CountValue,
+    MetricId,
+    MetricTestResult,
+    SingleValue,
+    SingleValueCalculation,
+    SingleValueMetric,
+)
+from evidently.core.report import Context
+from evidently.legacy.core import ColumnType
+from evidently.legacy.model.widget import BaseWidgetInfo
+from evidently.legacy.renderers.html_widgets import CounterData, counter, plotly_figure, table_data
+from evidently.legacy.tests.base_test import TestStatus
+from evidently.tests import lt
+
+from ..drift_engine import (
+    DEFAULT_THRESHOLDS,
+    ColumnBins,
+    batch_counts,
+    batch_drift,
+    batch_drift_from_counts,
+    fit_batch_bins,
+    ks_pvalue,
+)
+from ..reference_profile import load_reference_profile, report_reference_profile
+from .plot_budget import PlotBudget, budget_of, decimate_indices, widgets_enabled
+
+STAT_COLUMNS = ["n_rows", "psi", "ks", "wasserstein"]
+
+
+def reference_bins(reference_df: pd.DataFrame, numeric, categorical, reference_profile: Optional[str] = None) -> List[ColumnBins]:
+    """ColumnBins theo thứ tự [*numeric, *categorical]: lấy từ reference profile nếu có, cột còn lại fit một lần."""
+    profile = load_reference_profile(reference_profile) if reference_profile else None
+    known = profile.drift_bins if profile is not None else {}
+    bins = {c: known[c] for c in [*numeric, *categorical] if c in known}
+    bins.update(fit_batch_bins(
+        reference_df,
+        [c for c in numeric if c not in bins],
+        [c for c in categorical if c not in bins],
+    ))
+    return [bins[c] for c in [*numeric, *categorical]]
+
+
+def _batch_table(current_df: pd.DataFrame, reference_df: pd.DataFrame, numeric, categorical, reference_profile):
+    bins = reference_bins(reference_df, numeric, categorical, reference_profile)
+    # p-value KS (kstwo.sf) tính riêng cho cột dùng method ks, xem column_drift
+    stats = batch_drift(bins, current_df, with_pvalue=False)
+    table = pd.DataFrame({k: stats[k][0] for k in STAT_COLUMNS}, index=[b.column for b in bins])
+    table["discrete"] = [b.discrete for b in bins]
+    table["has_grid"] = [b.has_grid for b in bins]
+    table["n_reference"] = [b.n_reference for b in bins]
+    return table
+
+
+def get_feature_drift(
+    context: Context,
+    current_data: Dataset,
+    reference_data: Dataset,
+    columns: Sequence[str],
+    reference_profile: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Bảng drift (index = cột): n_rows, psi, ks, wasserstein, discrete, has_grid, n_reference.
+    Memoize trong `context`: lần gọi đầu tính cho mọi cột numeric / categorical của data
+    definition (một pass), các cột chưa có (vd. không khai báo) được tính thêm một lần.
+    """
+    cache = getattr(context, "_feature_drift_cache", None)
+    if cache is None:
+        cache = {}
+        context._feature_drift_cache = cache
+    key = (id(current_data), id(reference_data), reference_profile)
+    hit = cache.get(key)
+    if hit is None or hit[0] is not current_data or hit[1] is not reference_data:
+        definition = current_data.data_definition
+        hit = (current_data, reference_data, _batch_table(
+            current_data.as_dataframe(),
+            reference_data.as_dataframe(),
+            definition.get_numerical_columns(),
+            definition.get_categorical_columns(),
+            reference_profile,
+        ))
+        cache[key] = hit
+
+    missing = [c for c in columns if c not in hit[2].index]
+    if missing:
+        categorical = set(current_data.data_definition.get_categorical_columns())
+        extra = _batch_table(
+            current_data.as_dataframe(),
+            reference_data.as_dataframe(),
+            [c for c in missing if c not in categorical],
+            [c for c in missing if c in categorical],
+            reference_profile,
+        )
+        hit = (hit[0], hit[1], pd.concat([hit[2], extra]))
+        cache[key] = hit
+    return hit[2]
+
+
+def column_drift(row: pd.Series, method: str, threshold: Optional[float], psi_threshold: Optional[float] = None) -> Tuple[float, str, float, bool]:
+    """
+    (score, method, threshold, drift_detected) của một cột trong bảng get_feature_drift.
+    Cột không có grid (categorical) với method ks / wasserstein -> PSI với psi_threshold (có log).
+    """
+    if method != "psi" and not row["has_grid"]:
+        print(f"    ⚠ {row.name}: {method} không áp dụng cho cột categorical -> psi")
+        method, threshold = "psi", psi_threshold
+    threshold = DEFAULT_THRESHOLDS[method] if threshold is None else threshold
+    if method == "ks":
+        score = float(ks_pvalue(row["ks"], row["n_reference"], row["n_rows"]))
+        return score, method, threshold, bool(score <= threshold)
+    score = float(row[method])
+    return score, method, threshold, bool(score >= threshold)
+
+
+def _column_method(column_type: ColumnType, num_method: str, cat_method: str, num_threshold, cat_threshold):
+    if column_type == ColumnType.Categorical:
+        return cat_method, cat_threshold
+    return num_method, num_threshold
+
+
+class FeatureDrift(ColumnMetric, SingleValueMetric):
+    """Drift score của một cột, đọc từ bảng drift batch của report (xem get_feature_drift)."""
+
+    method: str = "psi"
+    """Drift method: psi | ks | wasserstein."""
+    threshold: Optional[float] = None
+    """Drift threshold (None = DEFAULT_THRESHOLDS của method)."""
+    psi_threshold: Optional[float] = None
+    """Threshold PSI khi cột categorical không tính được ks / wasserstein."""
+    reference_profile: Optional[str] = None
+    """Path tới reference profile đã cache (dùng lại drift_bins; None = metadata của Report)."""
+
+
+class FeatureDriftCalculation(SingleValueCalculation[FeatureDrift]):
+    def calculate(
+        self,
+        context: Context,
+        current_data: Dataset,
+        reference_data: Optional[Dataset],
+    ) -> SingleValue:
+        column = self.metric.column
+        if reference_data is None:
+            raise ValueError("Reference data is required for Feature Drift")
+        reference_profile = report_reference_profile(context, self.metric.reference_profile)
+        table = get_feature_drift(context, current_data, reference_data, [column], reference_profile)
+        score, method, threshold, detected = column_drift(
+            table.loc[column], self.metric.method, self.metric.threshold, self.metric.psi_threshold
+        )
+        if self.metric.threshold is None and method == self.metric.method:
+            self.resolve_parameter("threshold", threshold)
+
+        result = self.result(score)
+        if not widgets_enabled(context):
+            result.widget = []
+        if self.metric.tests is None and context.configuration.include_tests:
+            result.set_tests([
+                MetricTestResult(
+                    id="drift",
+                    name=f"Value Drift for column {column}",
+                    description=f"Drift score is {score:0.2f}. "
+                    f"The drift detection method is {method}. "
+                    f"The drift threshold is {threshold:0.2f}.",
+                    status=TestStatus.FAIL if detected else TestStatus.SUCCESS,
+                    metric_config=self.to_metric_config(),
+                    test_config={},
+                )
+            ])
+        return result
+
+    def display_name(self) -> str:
+        return f"Value drift for {self.metric.column}"
+
+
+class DriftedFeaturesCount(CountMetric):
+    """Số / tỉ lệ cột drift (cùng method / threshold theo loại cột như FeatureDrift)."""
+
+    columns: List[str]
+    num_method: str = "psi"
+    cat_method: str = "psi"
+    num_threshold: Optional[float] = None
+    cat_threshold: Optional[float] = None
+    psi_threshold: Optional[float] = None
+    drift_share: float = 0.5
+    """Dataset drift khi share cột drift >= drift_share."""
+    reference_profile: Optional[str] = None
+
+    def _default_tests_with_reference(self, context: Context) -> List[BoundTest]:
+        return [lt(self.drift_share).bind_count(self.get_fingerprint(), is_count=False)]
+
+
+class DriftedFeaturesCountCalculation(CountCalculation[DriftedFeaturesCount]):
+    def calculate(
+        self,
+        context: Context,
+        current_data: Dataset,
+        reference_data: Optional[Dataset],
+    ) -> CountValue:
+        if reference_data is None:
+            raise ValueError("Reference data is required for Feature Drift")
+        columns = self.metric.columns
+        reference_profile = report_reference_profile(context, self.metric.reference_profile)
+        table = get_feature_drift(context, current_data, reference_data, columns, reference_profile)
+        definition = current_data.data_definition
+        n_drifted = 0
+        for column in columns:
+            method, threshold = _column_method(
+                definition.get_column_type(column),
+                self.metric.num_method, self.metric.cat_method,
+                self.metric.num_threshold, self.metric.cat_threshold,
+            )
+            n_drifted += column_drift(table.loc[column], method, threshold, self.metric.psi_threshold)[3]
+        result = self.result(n_drifted, n_drifted / len(columns) if columns else 0.0)
+        if not widgets_enabled(context):
+            result.widget = []
+        return result
+
+    def display_name(self) -> str:
+        return "Count of Drifted Columns"
+
+    def share_display_name(self) -> str:
+        return "Share of Drifted Columns"
+
+
+class FeatureDriftPreset(MetricContainer):
+    """
+    Thay DataDriftPreset: DriftedFeaturesCount + FeatureDrift cho từng cột, tính bằng
+    drift_engine batch. Render một counter + biểu đồ score theo feature + bảng (thay cho
+    widget của từng cột).
+    """
+
+    columns: Optional[List[str]] = None
+    """Cột cần tính (None = mọi cột numeric + categorical của data definition)."""
+    num_method: str = "psi"
+    cat_method: str = "psi"
+    num_threshold: Optional[float] = None
+    cat_threshold: Optional[float] = None
+    psi_threshold: Optional[float] = None
+    drift_share: float = 0.5
+    reference_profile: Optional[str] = None
+    plot_budget: Optional[PlotBudget] = None
+
+    def __init__(
+        self,
+        columns: Optional[List[str]] = None,
+        num_method: str = "psi",
+        cat_method: str = "psi",
+        num_threshold: Optional[float] = None,
+        cat_threshold: Optional[float] = None,
+        psi_threshold: Optional[float] = None,
+        drift_share: float = 0.5,
+        reference_profile: Optional[str] = None,
+        plot_budget: Optional[PlotBudget] = None,
+        include_tests: bool = True,
+    ):
+        self.columns = columns
+        self.num_method = num_method
+        self.cat_method = cat_method
+        self.num_threshold = num_threshold
+        self.cat_threshold = cat_threshold
+        self.psi_threshold = psi_threshold
+        self.drift_share = drift_share
+        self.reference_profile = reference_profile
+        self.plot_budget = plot_budget
+        super().__init__(include_tests=include_tests)
+
+    def _columns(self, context: Context) -> List[str]:
+        if self.columns is not None:
+            return list(self.columns)
+        definition = context.data_definition
+        return [*definition.get_numerical_columns(), *definition.get_categorical_columns()]
+
+    def generate_metrics(self, context: Context) -> Sequence[MetricOrContainer]:
+        columns = self._columns(context)
+        metrics: List[MetricOrContainer] = [
+            DriftedFeaturesCount(
+                columns=columns,
+                num_method=self.num_method,
+                cat_method=self.cat_method,
+                num_threshold=self.num_threshold,
+                cat_threshold=self.cat_threshold,
+                psi_threshold=self.psi_threshold,
+                drift_share=self.drift_share,
+                reference_profile=self.reference_profile,
+                share_tests=self._get_tests(None),
+            )
+        ]
+        for column in columns:
+            method, threshold = _column_method(
+                context.data_definition.get_column_type(column),
+                self.num_method, self.cat_method, self.num_threshold, self.cat_threshold,
+            )
+            metrics.append(FeatureDrift(
+                column=column,
+                method=method,
+                threshold=threshold,
+                psi_threshold=self.psi_threshold,
+                reference_profile=self.reference_profile,
+                tests=self._get_tests(None),
+            ))
+        return metrics
+
+    def render(
+        self,
+        context: Context,
+        child_widgets: Optional[List[Tuple[Optional[MetricId], List[BaseWidgetInfo]]]] = None,
+    ) -> List[BaseWidgetInfo]:
+        if not widgets_enabled(context):
+            return []
+        rows = []
+        share = None
+        for metric in self.metrics(context):
+            result = context.get_metric_result(metric)
+            if isinstance(metric, DriftedFeaturesCount):
+                share = result.share.value
+                continue
+            failed = any(t.status == TestStatus.FAIL for t in result.tests)
+            threshold = metric.threshold if metric.threshold is not None else DEFAULT_THRESHOLDS[metric.method]
+            rows.append((metric.column, metric.method, float(result.value), threshold, failed))
+
+        n_drifted = sum(r[4] for r in rows)
+        detected = share is not None and share >= self.drift_share
+        widgets = [counter(
+            title="",
+            counters=[
+                CounterData("Columns", str(len(rows))),
+                CounterData("Drifted columns", str(n_drifted)),
+                CounterData("Share of drifted columns", f"{share:.3f}" if share is not None else "-"),
+                CounterData(
+                    f"Dataset drift {'detected' if detected else 'not detected'}",
+                    f"drift share threshold {self.drift_share}",
+                ),
+            ],
+        )]
+        # Drift trước, trong cùng nhóm theo score giảm dần (ks: p-value tăng dần)
+        rows.sort(key=lambda r: (not r[4], r[2] if r[1] == "ks" else -r[2]))
+        shown = rows[:budget_of(self).max_features]
+        if shown:
+            fig = go.Figure(go.Bar(
+                x=[r[0] for r in shown],
+                y=[r[2] for r in shown],
+                marker_color=["red" if r[4] else "steelblue" for r in shown],
+                customdata=[[r[1], r[3]] for r in shown],
+                hovertemplate="%{x}<br>score=%{y:.4f}<br>method=%{customdata[0]}, threshold=%{customdata[1]}<extra></extra>",
+            ))
+            fig.update_layout(xaxis_title="Feature", yaxis_title="Drift score", height=400)
+            widgets.append(plotly_figure(title=f"Drift score by feature ({len(shown)}/{len(rows)})", figure=fig))
+        widgets.append(table_data(
+            title="Feature drift",
+            column_names=["Column", "Method", "Score", "Threshold", "Drift"],
+            data=[[c, m, f"{s:.4f}", f"{t:g}", "detected" if d else "not detected"] for c, m, s, t, d in rows],
+        ))
+        return widgets
+
+
+class FeatureDriftHeatmap(SingleValueMetric):
+    """PSI theo (feature x timestamp) so với toàn bộ reference; value = share các ô drift."""
+
+    timestamp_column: str
+    columns: Optional[List[str]] = None
+    """Cột cần tính (None = mọi cột numeric + categorical của data definition)."""
+    threshold: Optional[float] = None
+    """PSI threshold của một ô (None = DEFAULT_THRESHOLDS["psi"])."""
+    min_rows: int = 10
+    """Timestamp có ít hơn min_rows dòng bị bỏ qua (như MyValueDrift)."""
+    reference_profile: Optional[str] = None
+    """Path tới reference profile đã cache (dùng lại drift_bins; None = metadata của Report)."""
+    plot_budget: Optional[PlotBudget] = None
+    """Size budget khi vẽ: số feature <= max_features, số timestamp <= max_plot_points."""
+
+
+class FeatureDriftHeatmapCalculation(SingleValueCalculation[FeatureDriftHeatmap]):
+    def calculate(
+        self,
+        context: Context,
+        current_data: Dataset,
+        reference_data: Optional[Dataset],
+    ) -> SingleValue:
+        if reference_data is None:
+            raise ValueError("Reference data is required for Feature Drift Heatmap")
+        timestamp_col = self.metric.timestamp_column
+        current_df = current_data.as_dataframe()
+        if timestamp_col not in current_df.columns:
+            raise ValueError(f"Timestamp column '{timestamp_col}' not found in current dataset.")
+
+        definition = current_data.data_definition
+        categorical = set(definition.get_categorical_columns())
+        columns = self.metric.columns
+        if columns is None:
+            columns = [*definition.get_numerical_columns(), *definition.get_categorical_columns()]
+        numeric = [c for c in columns if c not in categorical]
+        bins = reference_bins(
+            reference_data.as_dataframe(),
+            numeric,
+            [c for c in columns if c in categorical],
+            report_reference_profile(context, self.metric.reference_profile),
+        )
+
+        timestamp_values = current_df[timestamp_col]
+        if not np.issubdtype(timestamp_values.dtype, np.datetime64):
+            try:
+                timestamp_values = pd.to_datetime(timestamp_values)
+            except Exception:
+                pass
+        group_codes, timestamps = pd.factorize(timestamp_values, sort=True)
+
+        # Một pass: counts (timestamp x bin của mọi cột) -> PSI (timestamp x feature)
+        psi_counts, _ = batch_counts(bins, current_df, group_codes, len(timestamps), grid=False)
+        psi = batch_drift_from_counts(bins, psi_counts, None, with_pvalue=False)["psi"]
+        n_rows = np.bincount(group_codes[group_codes >= 0], minlength=len(timestamps))
+        keep = n_rows >= self.metric.min_rows
+        matrix = pd.DataFrame(psi[keep].T, index=[b.column for b in bins], columns=np.asarray(timestamps)[keep])
+        print(f"    PSI matrix: {matrix.shape[0]} features x {matrix.shape[1]} timestamps")
+
+        threshold = DEFAULT_THRESHOLDS["psi"] if self.metric.threshold is None else self.metric.threshold
+        if self.metric.threshold is None:
+            self.resolve_parameter("threshold", threshold)
+        drifted = matrix.to_numpy() >= threshold
+        share = float(drifted.mean()) if matrix.size else np.nan
+
+        result = self.result(share)
+        result.widget = self._render(matrix, drifted, threshold) if widgets_enabled(context) else []
+        return result
+
+    def _render(self, matrix: pd.DataFrame, drifted: np.ndarray, threshold: float) -> List[BaseWidgetInfo]:
+        if not matrix.size:
+            return [counter(title="", counters=[CounterData("No valid timestamp periods found", "Feature drift heatmap")])]
+        budget = budget_of(self.metric)
+        worst = np.unravel_index(np.argmax(matrix.to_numpy()), matrix.shape)
+        widgets = [counter(
+            title="",
+            counters=[
+                CounterData(
+                    f"{int(drifted.sum())}/{drifted.size} (feature x timestamp) cells with PSI >= {threshold:g}",
+                    "Drifted cells",
+                ),
+                CounterData(
+                    f"{matrix.index[worst[0]]} @ {matrix.columns[worst[1]]}: {matrix.iat[worst]:.3f}",
+                    "Max PSI",
+                ),
+            ],
+        )]
+
+        # Feature drift nhất trước (theo max PSI), timestamp decimate theo max PSI của từng cột
+        rows = matrix.max(axis=1).sort_values(ascending=False).index[:budget.max_features]
+        shown = matrix.loc[rows]
+        cols = decimate_indices(shown.max(axis=0).to_numpy(), budget.max_plot_points)
+        shown = shown.iloc[:, cols]
+        z = shown.to_numpy() if budget.plot_digits is None else np.round(shown.to_numpy(), budget.plot_digits)
+        fig = go.Figure(go.Heatmap(
+            z=z,
+            x=list(shown.columns),
+            y=list(shown.index),
+            colorscale="Reds",
+            zmin=0,
+            colorbar=dict(title="PSI"),
+            hovertemplate="%{y}<br>%{x}<br>PSI=%{z:.4f}<extra></extra>",
+        ))
+        fig.update_layout(
+            xaxis_title="Timestamp",
+            height=max(300, 18 * len(shown) + 120),
+        )
+        widgets.append(plotly_figure(
+            title=f"PSI by feature x timestamp (top {len(shown)}/{len(matrix)} features, threshold {threshold:g})",
+            figure=fig,
+        ))
+        return widgets
+
+    def display_name(self) -> str:
+        return f"Feature drift heatmap by {self.metric.timestamp_column}"
@@ -1,4 +1,3 @@
-from sklearn.metrics import roc_auc_score
 from evidently import Dataset
 from evidently.core.report import Context
 from evidently.core.metric_types import SingleValue
@@ -8,15 +7,28 @@ from evidently.core.metric_types import BoundTest
 from evidently.tests import Reference, eq
 from typing import List, Optional
 
+from .confidence import set_interval_test
+from .discrimination import get_discrimination, profile_discrimination
+from ..reference_profile import report_reference_profile
+from .plot_budget import widgets_enabled
+
 
 class GiniMetric(SingleValueMetric):
     true_column: str
     pred_column: str
+    reference_profile: Optional[str] = None  # path tới reference profile (None = metadata reference_profile của Report)
+    # Confidence interval mode: "bootstrap" / "delong" -> test chỉ FAIL khi CI không chứa reference
+    ci_method: Optional[str] = None
+    ci_level: float = 0.95
+    n_resamples: int = 1000
 
-    def _default_tests(self) -> List[BoundTest]:
+    def _default_tests(self, context: Optional[Context] = None) -> List[BoundTest]:
         return [eq(0.0).bind_single(self.get_fingerprint())]
 
-    def _default_tests_with_reference(self) -> List[BoundTest]:
+    def _default_tests_with_reference(self, context: Optional[Context] = None) -> List[BoundTest]:
+        # CI mode: test được gắn trong calculate (set_interval_test)
+        if self.ci_method is not None:
+            return []
         return [eq(Reference(relative=0.05)).bind_single(self.get_fingerprint())]
 
 # implementation
@@ -25,16 +37,20 @@ class GiniMetricImplementation(SingleValueCalculation[GiniMetric]):
         current_data: Dataset, 
         reference_data: Optional[Dataset]
         ) -> SingleValue:
-        y_true = current_data.column(self.metric.true_column).data
-        y_pred = current_data.column(self.metric.pred_column).data
-        auc = roc_auc_score(y_true, y_pred)
-        gini = 2 * auc - 1
-        result = self.result(value=gini)
+        # Gini = 2*AUC - 1 từ cùng kernel với AUCMetric -> luôn nhất quán với AUC
+        cur = get_discrimination(context, current_data, self.metric.true_column, self.metric.pred_column)
+        result = self.result(value=cur.gini)
+        if not widgets_enabled(context):
+            result.widget = []
+        reference_profile = report_reference_profile(context, self.metric.reference_profile)
+        if reference_data is not None and reference_profile:
+            ref_gini = profile_discrimination(reference_profile).gini
+            set_interval_test(self, context, current_data, result, ref_gini, "gini")
+            return result, self.result(value=ref_gini)
         if reference_data is not None:
-            ref_auc = roc_auc_score(reference_data.column(self.metric.true_column).data,
-                                   reference_data.column(self.metric.pred_column).data)
-            ref_gini = 2 * ref_auc - 1
-            result_ref = self.result(value=ref_gini)
+            ref = get_discrimination(context, reference_data, self.metric.true_column, self.metric.pred_column)
+            set_interval_test(self, context, current_data, result, ref.gini, "gini")
+            result_ref = self.result(value=ref.gini)
             return result, result_ref
         else:
             return result
@@ -1,5 +1,4 @@
 from sklearn.metrics import roc_auc_score
-import scorecardpy as sc
 
 
 from evidently import Dataset
@@ -15,35 +14,26 @@ import plotly.graph_objects as go
 
 from typing import List, Optional
 
+from ..reference_profile import report_reference_profile
+from .plot_budget import PlotBudget, budget_of, widgets_enabled
+from .scorecard_binning import get_scorecard_binning
+
+
+def get_feature_iv(context: Context) -> Optional[pd.DataFrame]:
+    """[feature, iv_ref, iv_current] do IVSummaryMetric tính trong report của `context` (None nếu chưa chạy)."""
+    return getattr(context, "_feature_iv", None)
+
+
 class IVSummaryMetric(SingleValueMetric):
     target_column: str
     numeric_features: List[str]
     categorical_features: List[str]
     top_n: int = 30
     add_reference_plot: bool = True  
-
-
-def _prepare_data_for_iv(df: pd.DataFrame, num_cols: List[str], cat_cols: List[str]) -> pd.DataFrame:
-    """
-    Chuẩn bị dữ liệu cho tính IV:
-    - Điền NA cho numerical bằng median
-    - Tạo cột _isna flag cho numerical columns có NA
-    """
-    df = df.copy()
-    df.columns = df.columns.str.strip()
-    
-    for col in num_cols:
-        if col in df.columns:
-            if df[col].isna().any():
-                df[f"{col}_isna"] = df[col].isna().astype(int)
-            median_val = df[col].median()
-            df[col] = df[col].fillna(median_val)
-    
-    for col in cat_cols:
-        if col in df.columns:
-            df[col] = df[col].fillna("MISSING").astype(str)
-    
-    return df
+    reference_profile: Optional[str] = None  # path tới reference profile (None = metadata của Report)
+    breaks_artifact: Optional[str] = None  # path tới breaks artifact của scorecard (không fit breaks)
+    breaks_artifact_version: Optional[str] = None  # version artifact mong đợi (None = không kiểm tra)
+    plot_budget: Optional[PlotBudget] = None  # size budget khi vẽ: số feature <= max_features
 
 
 class IVSummaryMetricImplementation(SingleValueCalculation[IVSummaryMetric]):
@@ -58,29 +48,20 @@ class IVSummaryMetricImplementation(SingleValueCalculation[IVSummaryMetric]):
         cat = self.metric.categorical_features
         add_reference_plot = self.metric.add_reference_plot  # Lấy từ Metric class
 
-        cur = current_data.as_dataframe().drop(
-            columns=["CUSTOMER_CODE", "DATE_PARTITION", "DISBURSE_DATE_WID"], 
-            errors="ignore")
-
-        # Chuẩn bị dữ liệu current
-        cur_prep = _prepare_data_for_iv(cur, num, cat)
-
-        # Chuẩn bị dữ liệu reference nếu cần
-        ref_prep = None
-        if reference_data is not None and add_reference_plot:
-            ref = reference_data.as_dataframe().drop(
-                columns=["CUSTOMER_CODE", "DATE_PARTITION", "DISBURSE_DATE_WID"], 
-                errors="ignore")
-            ref_prep = _prepare_data_for_iv(ref, num, cat)
-
-        # Lấy danh sách features để tính IV
-        feats = [c for c in (num + [f"{c}_isna" for c in num] + cat) if c in cur_prep.columns and c != tgt]
-
-        # Tính IV current
-        iv_cur = sc.iv(cur_prep, y=tgt, x=feats)
-        if "iv" not in iv_cur.columns and "info_value" in iv_cur.columns:
-            iv_cur = iv_cur.rename(columns={"info_value": "iv"})
-        iv_cur = iv_cur.rename(columns={"variable": "feature"})[["feature", "iv"]].sort_values("iv", ascending=False).reset_index(drop=True)
+        # IV = total_iv của bins dùng chung với BasicWOEMetric (missing là bin riêng,
+        # current dùng breaks của reference)
+        binning_cur, binning_ref = get_scorecard_binning(
+            context, current_data, reference_data, tgt, num + cat,
+            reference_profile=report_reference_profile(context, self.metric.reference_profile),
+            breaks_artifact=self.metric.breaks_artifact,
+            breaks_version=self.metric.breaks_artifact_version,
+        )
+        iv_cur = binning_cur.iv
+        # IV theo feature giữ trong context -> pipeline lấy lại sau report.run, không bin lại
+        feature_iv = iv_cur.rename(columns={"iv": "iv_current"})
+        if binning_ref is not None:
+            feature_iv = binning_ref.iv.rename(columns={"iv": "iv_ref"}).merge(feature_iv, on="feature", how="outer")
+        context._feature_iv = feature_iv
 
         mean_iv_cur = float(iv_cur["iv"].mean()) if len(iv_cur) else np.nan
         pct_iv_low_cur = float((iv_cur["iv"] < 0.02).mean()) if len(iv_cur) else np.nan
@@ -89,70 +70,73 @@ class IVSummaryMetricImplementation(SingleValueCalculation[IVSummaryMetric]):
         pct_iv_low_ref = np.nan
         iv_ref = None
 
-        # Tính IV reference nếu cần
-        if reference_data is not None and add_reference_plot and ref_prep is not None:
-            feats_ref = [c for c in feats if c in ref_prep.columns]
-            iv_ref = sc.iv(ref_prep, y=tgt, x=feats_ref)
-            if "iv" not in iv_ref.columns and "info_value" in iv_ref.columns:
-                iv_ref = iv_ref.rename(columns={"info_value": "iv"})
-            iv_ref = iv_ref.rename(columns={"variable": "feature"})[["feature", "iv"]].sort_values("iv", ascending=False).reset_index(drop=True)
+        if add_reference_plot and binning_ref is not None:
+            iv_ref = binning_ref.iv
             mean_iv_ref = float(iv_ref["iv"].mean()) if len(iv_ref) else np.nan
             pct_iv_low_ref = float((iv_ref["iv"] < 0.02).mean()) if len(iv_ref) else np.nan
 
-        # Visualization
-        fig = go.Figure()
+        widgets = []
+        if widgets_enabled(context):
+            # Visualization: top feature theo IV current (top_n, không quá budget);
+            # mean_iv / pct_iv_low vẫn tính trên toàn bộ features
+            n_plot = min(self.metric.top_n, budget_of(self.metric).max_features)
+            iv_cur_plot = iv_cur.head(n_plot)
+            fig = go.Figure()
         
-        # Vẽ reference nếu có (full data, không lấy top)
-        if add_reference_plot and reference_data is not None and iv_ref is not None and len(iv_ref):
+            # Vẽ reference nếu có (cùng các feature với current)
+            if add_reference_plot and reference_data is not None and iv_ref is not None and len(iv_ref):
+                iv_ref_plot = iv_ref.set_index("feature")["iv"].reindex(iv_cur_plot["feature"])
+                fig.add_trace(go.Bar(
+                    x=iv_ref_plot.index,
+                    y=iv_ref_plot.values,
+                    name="Reference IV",
+                    marker_color="orange",
+                    opacity=0.5,
+                ))
+
+            # Luôn vẽ current
             fig.add_trace(go.Bar(
-                x=iv_ref["feature"],
-                y=iv_ref["iv"],
-                name="Reference IV",
-                marker_color="orange",
-                opacity=0.5,
+                x=iv_cur_plot["feature"],
+                y=iv_cur_plot["iv"],
+                name="Current IV",
+                marker_color="blue",
+                opacity=0.7 if (add_reference_plot and reference_data is not None and iv_ref is not None) else 1.0,
             ))
 
-        # Luôn vẽ current (full data, không lấy top)
-        fig.add_trace(go.Bar(
-            x=iv_cur["feature"],
-            y=iv_cur["iv"],
-            name="Current IV",
-            marker_color="blue",
-            opacity=0.7 if (add_reference_plot and reference_data is not None and iv_ref is not None) else 1.0,
-        ))
-
-        # Title với thông tin thống kê
-        if add_reference_plot and reference_data is not None and iv_ref is not None:
-            mega_title = (
-                f'IV Summary<br>'
-                f'Current: mean_iv={mean_iv_cur:.4f} | pct_iv_low={pct_iv_low_cur:.2%} '
-                f'<br>Reference: mean_iv={mean_iv_ref:.4f} | pct_iv_low={pct_iv_low_ref:.2%}'
-            )
-        else:
-            mega_title = (
-                f'IV Summary<br>'
-                f'mean_iv={mean_iv_cur:.4f} | pct_iv_low={pct_iv_low_cur:.2%}'
+            # Title với thông tin thống kê
+            shown = f" (top {len(iv_cur_plot)}/{len(iv_cur)} features)" if len(iv_cur_plot) < len(iv_cur) else ""
+            if add_reference_plot and reference_data is not None and iv_ref is not None:
+                mega_title = (
+                    f'IV Summary{shown}<br>'
+                    f'Current: mean_iv={mean_iv_cur:.4f} | pct_iv_low={pct_iv_low_cur:.2%} '
+                    f'<br>Reference: mean_iv={mean_iv_ref:.4f} | pct_iv_low={pct_iv_low_ref:.2%}'
+                )
+            else:
+                mega_title = (
+                    f'IV Summary{shown}<br>'
+                    f'mean_iv={mean_iv_cur:.4f} | pct_iv_low={pct_iv_low_cur:.2%}'
+                )
+
+            fig.update_layout(
+                title=mega_title,
+                xaxis_title="Feature",
+                yaxis_title="IV",
+                height=420,
+                margin=dict(l=40, r=20, t=60, b=130),
+                barmode="group" if (add_reference_plot and reference_data is not None and iv_ref is not None) else "relative",
+                legend_title="Data",
             )
 
-        fig.update_layout(
-            title=mega_title,
-            xaxis_title="Feature",
-            yaxis_title="IV",
-            height=420,
-            margin=dict(l=40, r=20, t=60, b=130),
-            barmode="group" if (add_reference_plot and reference_data is not None and iv_ref is not None) else "relative",
-            legend_title="Data",
-        )
-
-        # Ghi chú ref/cur nổi bật trên chart nếu có cả 2
-        if add_reference_plot and reference_data is not None and iv_ref is not None:
-            fig.add_annotation(
-                xref="paper", yref="paper", x=0, y=1.1, showarrow=False,
-                text="<b>Current = blue, Reference = orange</b>", font=dict(size=13, color="black")
-            )
+            # Ghi chú ref/cur nổi bật trên chart nếu có cả 2
+            if add_reference_plot and reference_data is not None and iv_ref is not None:
+                fig.add_annotation(
+                    xref="paper", yref="paper", x=0, y=1.1, showarrow=False,
+                    text="<b>Current = blue, Reference = orange</b>", font=dict(size=13, color="black")
+                )
+            widgets.append(plotly_figure(title="IV Summary (Current/Reference)", figure=fig))
 
         result = self.result(value=mean_iv_cur)
-        result.widget = [plotly_figure(title="IV Summary (Current/Reference)", figure=fig)]
+        result.widget = widgets
         
         # Return với reference result nếu có
         if reference_data is not None and iv_ref is not None:
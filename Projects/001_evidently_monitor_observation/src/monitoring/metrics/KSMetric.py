@@ -12,70 +12,48 @@ from evidently.legacy.renderers.html_widgets import plotly_figure
 
 import numpy as np
 
+from ..reference_profile import report_reference_profile
+from .confidence import set_interval_test
+from .discrimination import get_discrimination, profile_discrimination
+from .plot_budget import PlotBudget, budget_of, decimate_curve, widgets_enabled
+
 
 class KSMetric(SingleValueMetric):
     true_column: str   # y_true (bad=1 good=0)
     pred_column: str   # y_pred (PD/proba)
-
-    def _default_tests(self) -> List[BoundTest]:
+    reference_profile: Optional[str] = None  # path tới reference profile, scores đã sort sẵn (None = metadata của Report)
+    # Confidence interval mode: "bootstrap" / "delong" (KS luôn dùng bootstrap)
+    # -> test chỉ FAIL khi CI không chứa reference
+    ci_method: Optional[str] = None
+    ci_level: float = 0.95
+    n_resamples: int = 1000
+    plot_budget: Optional[PlotBudget] = None  # size budget khi vẽ (None = mặc định của PlotBudget)
+
+    def _default_tests(self, context: Optional[Context] = None) -> List[BoundTest]:
         # ví dụ: KS không nên = 0
         return [eq(0.0).bind_single(self.get_fingerprint())]
 
-    def _default_tests_with_reference(self) -> List[BoundTest]:
+    def _default_tests_with_reference(self, context: Optional[Context] = None) -> List[BoundTest]:
+        # CI mode: test được gắn trong calculate (set_interval_test)
+        if self.ci_method is not None:
+            return []
         # ví dụ: KS current không lệch quá 5% so với reference
         return [eq(Reference(relative=0.05)).bind_single(self.get_fingerprint())]
 
 
-def _downsample_for_plot_percent(x: np.ndarray, y: np.ndarray, max_points: int = 2000) -> Tuple[np.ndarray, np.ndarray]:
+def _curve_for_plot_percent(cum_bad: np.ndarray, cum_good: np.ndarray, budget: PlotBudget) -> Tuple[np.ndarray, ...]:
     """
-    Downsample arrays for plotting to reduce HTML size.
-    X được quy đổi thành % population (0..100).
+    Decimate curves for plotting to reduce HTML size (size budget của report).
+    X được quy đổi thành % population (0..100); index giữ lại theo cum_bad - cum_good
+    nên điểm KS (khoảng cách lớn nhất) luôn có trên plot.
     KS value is still calculated from FULL data - this only affects visualization.
     """
-    n = len(x)
-    x_percent = x / max(1, n-1) * 100
-    if n <= max_points:
-        return x_percent, y
-    indices = np.linspace(0, n - 1, max_points, dtype=int)
-    return x_percent[indices], y[indices]
-
-
-def _ks_series(y_true: np.ndarray, 
-                y_pred: np.ndarray
-            ) -> Tuple[float, int, np.ndarray, np.ndarray, np.ndarray]:
-    """
-    Return:
-      ks_value, ks_index, p_sorted, cum_bad, cum_good
-    Convention: bad=1, good=0; sort by y_pred desc (risk high first)
-    
-    NOTE: KS value is calculated from FULL data for accuracy.
-    """
-    y_true = np.asarray(y_true).astype(int)
-    y_pred = np.asarray(y_pred).astype(float)
-
-    order = np.argsort(-y_pred)
-    y_sorted = y_true[order]
-    p_sorted = y_pred[order]
-
-    total_bad = (y_sorted == 1).sum()
-    total_good = (y_sorted == 0).sum()
-
-    if total_bad == 0 or total_good == 0:
-        return np.nan, 0, p_sorted, np.zeros_like(p_sorted, dtype=float), np.zeros_like(p_sorted, dtype=float)
-
-    cum_bad = np.cumsum(y_sorted == 1) / total_bad
-    cum_good = np.cumsum(y_sorted == 0) / total_good
-
-    ks_arr = np.abs(cum_bad - cum_good)
-    ks_index = int(np.argmax(ks_arr))
-    ks_value = float(ks_arr[ks_index])
-    return ks_value, ks_index, p_sorted, cum_bad, cum_good
+    n = len(cum_bad)
+    x_percent = np.arange(n) / max(1, n-1) * 100
+    return decimate_curve(x_percent, cum_bad, cum_good, budget=budget, key=np.asarray(cum_bad) - np.asarray(cum_good))
 
 
 class KSMetricImplementation(SingleValueCalculation[KSMetric]):
-    # Max points for visualization (reduces HTML from ~60MB to ~1MB)
-    MAX_PLOT_POINTS = 2000
-
     def calculate(
         self,
         context: Context,
@@ -83,18 +61,47 @@ class KSMetricImplementation(SingleValueCalculation[KSMetric]):
         reference_data: Optional[Dataset],
     ) -> SingleValue:
         # ---- current ----
-        y_true = np.array(current_data.column(self.metric.true_column).data)
-        y_pred = np.array(current_data.column(self.metric.pred_column).data)
+        # KS value calculated from FULL data (accurate!), kernel dùng chung với AUC / Gini
+        cur = get_discrimination(context, current_data, self.metric.true_column, self.metric.pred_column)
+
+        # Reference data processing
+        ref = None
+        result_ref = None
+        if reference_data is not None:
+            reference_profile = report_reference_profile(context, self.metric.reference_profile)
+            if reference_profile:
+                # Reference scores đã sort sẵn trong profile -> chỉ cần cumsum
+                ref = profile_discrimination(reference_profile)
+            else:
+                # KS value from FULL reference data (accurate!)
+                ref = get_discrimination(context, reference_data, self.metric.true_column, self.metric.pred_column)
+            result_ref = self.result(value=ref.ks)
+
+        # Tạo result và gắn widget (metrics-only: không dựng figure)
+        result = self.result(value=cur.ks)
+        if widgets_enabled(context):
+            result.widget = [plotly_figure(title=self.display_name(), figure=self._figure(cur, ref))]
+        else:
+            result.widget = []
+        if result_ref is not None:
+            set_interval_test(self, context, current_data, result, ref.ks, "ks")
 
-        # KS value calculated from FULL data (accurate!)
-        ks_value, ks_index, p_sorted, cum_bad, cum_good = _ks_series(y_true, y_pred)
+        # Return đúng format: tuple nếu có reference, single nếu không
+        if reference_data is not None:
+            return result, result_ref
+        else:
+            return result
+
+    def _figure(self, cur, ref) -> go.Figure:
+        """KS curve của current (+ reference nếu có), decimate theo size budget."""
+        ks_value, ks_index, p_sorted, cum_bad, cum_good = cur.ks, cur.ks_index, cur.scores_sorted, cur.cum_bad, cur.cum_good
 
         # ---- plotly figure (KS curve) ----
         fig = go.Figure()
+        budget = budget_of(self.metric)
         x_full = np.arange(len(cum_bad))
         # Chuyển sang phần trăm population
-        x_percent, cum_bad_ds = _downsample_for_plot_percent(x_full, cum_bad, self.MAX_PLOT_POINTS)
-        _, cum_good_ds = _downsample_for_plot_percent(x_full, cum_good, self.MAX_PLOT_POINTS)
+        x_percent, cum_bad_ds, cum_good_ds = _curve_for_plot_percent(cum_bad, cum_good, budget)
 
         # CDF curves - Current data (downsampled for plot)
         fig.add_trace(go.Scatter(
@@ -130,28 +137,16 @@ class KSMetricImplementation(SingleValueCalculation[KSMetric]):
                 arrowhead=2
             )
 
-        # Reference data processing
-        result_ref = None
-        if reference_data is not None:
-            ref_y_true = np.array(reference_data.column(self.metric.true_column).data)
-            ref_y_pred = np.array(reference_data.column(self.metric.pred_column).data)
-            
-            # KS value from FULL reference data (accurate!)
-            ref_ks, _, _, ref_cum_bad, ref_cum_good = _ks_series(ref_y_true, ref_y_pred)
-            
-            result_ref = self.result(value=ref_ks)
-
+        if ref is not None:
             # Downsample reference for plotting
-            ref_x_full = np.arange(len(ref_cum_bad))
-            ref_x_percent, ref_cum_bad_ds = _downsample_for_plot_percent(ref_x_full, ref_cum_bad, self.MAX_PLOT_POINTS)
-            _, ref_cum_good_ds = _downsample_for_plot_percent(ref_x_full, ref_cum_good, self.MAX_PLOT_POINTS)
+            ref_x_percent, ref_cum_bad_ds, ref_cum_good_ds = _curve_for_plot_percent(ref.cum_bad, ref.cum_good, budget)
 
             # Overlay reference curves (downsampled)
             fig.add_trace(go.Scatter(
                 x=ref_x_percent,
                 y=ref_cum_bad_ds,
                 mode="lines",
-                name=f"REF Cum Bad (KS={ref_ks:.3f})",
+                name=f"REF Cum Bad (KS={ref.ks:.3f})",
                 line=dict(dash="dot", color="lightblue")
             ))
             fig.add_trace(go.Scatter(
@@ -169,16 +164,7 @@ class KSMetricImplementation(SingleValueCalculation[KSMetric]):
             legend_title="",
             template="plotly_white"
         )
-
-        # Tạo result và gắn widget
-        result = self.result(value=ks_value)
-        result.widget = [plotly_figure(title=self.display_name(), figure=fig)]
-
-        # Return đúng format: tuple nếu có reference, single nếu không
-        if reference_data is not None:
-            return result, result_ref
-        else:
-            return result
+        return fig
 
     def display_name(self) -> str:
         return f"KS metric for {self.metric.true_column} vs {self.metric.pred_column}"
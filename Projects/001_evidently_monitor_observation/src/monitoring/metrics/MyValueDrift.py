@@ -5,7 +5,6 @@ from evidently.legacy.metric_results import ScatterField
 from evidently.core.metric_types import MetricTestResult
 import pandas as pd
 import numpy as np
-from evidently import Dataset
 from evidently.legacy.renderers.html_widgets import table_data
 from evidently.legacy.renderers.html_widgets import widget_tabs
 from evidently.legacy.calculations.data_drift import ColumnDataDriftMetrics
@@ -19,6 +18,7 @@ from evidently.core.metric_types import SingleValueMetric
 from evidently.core.metric_types import SingleValueCalculation
 from evidently.legacy.options.data_drift import DataDriftOptions
 from evidently.legacy.calculations.data_drift import get_one_column_drift
+from evidently.legacy.calculations.stattests import get_stattest
 from evidently.legacy.options import ColorOptions
 from evidently.legacy.options.base import Options
 from evidently.legacy.metric_results import DatasetColumns
@@ -29,9 +29,24 @@ from evidently.legacy.renderers.html_widgets import counter
 from evidently.legacy.core import ColumnType
 from evidently.legacy.renderers.html_widgets import plotly_figure
 
+from ..drift_engine import (
+    SUPPORTED_METHODS,
+    fit_column_bins,
+    grouped_drift,
+    drift_scores,
+    drift_detected,
+)
+from ..reference_profile import load_reference_profile, report_reference_profile
+from .plot_budget import (
+    PlotBudget,
+    budget_distributions,
+    budget_of,
+    decimate_frame,
+    decimate_indices,
+    widgets_enabled,
+)
+
 from typing import Optional
-import numpy as np
-import pandas as pd
 DROP_COLS = ["CUSTOMER_CODE", "DATE_PARTITION", "DISBURSE_DATE_WID"]
 
 
@@ -44,11 +59,15 @@ class MyValueDrift(ColumnMetric, SingleValueMetric):
     """Drift threshold (uses method default if None)."""
     timestamp_column: Optional[str] = None
     """Tên cột timestamp để phân tích drift theo thời gian."""
+    reference_profile: Optional[str] = None
+    """Path tới reference profile đã cache (dùng lại bins của reference; None = metadata của Report)."""
+    plot_budget: Optional[PlotBudget] = None
+    """Size budget khi vẽ (số điểm theo thời gian, số bin / category của histogram)."""
 
 class MyValueDriftCalculation(SingleValueCalculation[MyValueDrift]):
     def calculate(
         self,
-        context: "Context",
+        context: Context,
         current_data: Dataset,
         reference_data: Optional[Dataset],
     ) -> SingleValue:
@@ -93,7 +112,7 @@ class MyValueDriftCalculation(SingleValueCalculation[MyValueDrift]):
             if self.metric.threshold is None:
                 self.resolve_parameter("threshold", drift.stattest_threshold)
             result = self.result(drift.drift_score)
-            result.widget = self._render(drift, Options(), ColorOptions())
+            result.widget = self._render(drift, Options(), ColorOptions()) if widgets_enabled(context) else []
             return result
 
         # --- Drift theo từng nhóm timestamp ---
@@ -106,59 +125,27 @@ class MyValueDriftCalculation(SingleValueCalculation[MyValueDrift]):
             raise ValueError(f"Timestamp column '{timestamp_col}' not found in current dataset.")
 
         # Ép kiểu datetime cho current
-        if not np.issubdtype(current_df[timestamp_col].dtype, np.datetime64):
+        timestamp_values = current_df[timestamp_col]
+        if not np.issubdtype(timestamp_values.dtype, np.datetime64):
             try:
-                current_df[timestamp_col] = pd.to_datetime(current_df[timestamp_col])
+                timestamp_values = pd.to_datetime(timestamp_values)
             except Exception:
                 pass
 
-        # Lấy các timestamp unique từ current (sắp xếp tăng dần)
-        timestamps = np.sort(current_df[timestamp_col].dropna().unique())
+        # Mã hoá timestamp một lần: group_codes[i] = vị trí của timestamp dòng i (NaT -> -1)
+        group_codes, timestamps = pd.factorize(timestamp_values, sort=True)
         print(f"    Found {len(timestamps)} unique timestamps in current data")
 
-        # Phân tích drift: current[mỗi timestamp] vs reference (toàn bộ)
-        drift_scores = []
-        drift_detecteds = []
-        group_results = []
-        
-        for ts in timestamps:
-            # Lấy slice của current tại timestamp này
-            cur_slice = current_df[current_df[timestamp_col] == ts]
-
-            # Nếu nhóm có quá ít sample thì bỏ qua
-            if len(cur_slice) < 10:
-                continue
-
-            # So sánh với TOÀN BỘ reference (không phải cùng timestamp)
-            drift = get_one_column_drift(
-                current_data=cur_slice,
-                reference_data=reference_df,  # Toàn bộ reference
-                column_name=column,
-                options=DataDriftOptions(
-                    all_features_stattest=self.metric.method,
-                    all_features_threshold=self.metric.threshold,
-                ),
-                dataset_columns=DatasetColumns(
-                    utility_columns=DatasetUtilityColumns(),
-                    num_feature_names=[column] if column_type == ColumnType.Numerical else [],
-                    cat_feature_names=[column] if column_type == ColumnType.Categorical else [],
-                    text_feature_names=[column] if column_type == ColumnType.Text else [],
-                    datetime_feature_names=[column] if column_type == ColumnType.Datetime else [],
-                    target_names=None,
-                ),
-                column_type=column_type,
-                agg_data=True,
+        method = (self.metric.method or self._auto_method(reference_df, column, column_type) or "").lower()
+        if method in SUPPORTED_METHODS:
+            df_res = self._grouped_drift(
+                reference_df, current_df, column, column_type, group_codes, timestamps, method,
+                report_reference_profile(context, self.metric.reference_profile),
+            )
+        else:
+            df_res = self._per_slice_drift(
+                reference_df, current_df, column, column_type, group_codes, timestamps
             )
-            drift_scores.append((ts, drift.drift_score))
-            drift_detecteds.append((ts, drift.drift_detected))
-            group_results.append((ts, drift))
-
-        # Tổng kết theo từng thời điểm
-        df_res = pd.DataFrame({
-            "timestamp": [ts for ts, _ in drift_scores],
-            "drift_score": [score for _, score in drift_scores],
-            "drift_detected": [det for _, det in drift_detecteds],
-        })
         print(f"    Drift results: {len(df_res)} time periods analyzed")
 
         # Tổng hợp: % drift_detected, score trung bình
@@ -174,12 +161,17 @@ class MyValueDriftCalculation(SingleValueCalculation[MyValueDrift]):
         
         # Threshold và method
         threshold = self.metric.threshold if self.metric.threshold else 0.1
-        method_name = self.metric.method if self.metric.method else "PSI"
+        method_name = method or "auto"
         
         # Xác định drift status tổng thể (dựa trên avg_score và threshold)
         overall_drift_detected = avg_score > threshold if not np.isnan(avg_score) else False
         drift_status = "detected" if overall_drift_detected else "not detected"
         
+        # Metrics-only: không dựng counter / figure theo thời gian
+        if not widgets_enabled(context):
+            result_obj.widget = []
+            return result_obj
+
         # Vẽ widgets
         widgets = []
         import plotly.graph_objects as go
@@ -205,16 +197,17 @@ class MyValueDriftCalculation(SingleValueCalculation[MyValueDrift]):
             )
         )
         
-        # 2. Chart - Drift over time
+        # 2. Chart - Drift over time (decimate theo budget, điểm drift vẫn vẽ đủ)
         if not df_res.empty:
             fig = go.Figure()
+            df_plot = df_res.iloc[decimate_indices(df_res["drift_score"].to_numpy(), budget_of(self.metric).max_plot_points)]
             
             # Drift Score line
             fig.add_trace(go.Scatter(
-                x=df_res["timestamp"],
-                y=df_res["drift_score"],
+                x=df_plot["timestamp"],
+                y=df_plot["drift_score"],
                 mode="lines+markers",
-                name="Drift Score (PSI)",
+                name=f"Drift Score ({method_name.upper()})",
                 line=dict(color="blue", width=2),
                 marker=dict(size=8)
             ))
@@ -242,7 +235,7 @@ class MyValueDriftCalculation(SingleValueCalculation[MyValueDrift]):
             fig.update_layout(
                 title=f"Score Drift over Time: '{column}'",
                 xaxis_title="Timestamp",
-                yaxis_title="Drift Score (PSI)",
+                yaxis_title=f"Drift Score ({method_name.upper()})",
                 height=400,
                 showlegend=True,
                 legend=dict(yanchor="top", y=0.99, xanchor="left", x=0.01),
@@ -264,6 +257,79 @@ class MyValueDriftCalculation(SingleValueCalculation[MyValueDrift]):
         result_obj.widget = widgets
         return result_obj
 
+    @staticmethod
+    def _auto_method(reference_df, column, column_type) -> Optional[str]:
+        """
+        Stattest Evidently tự chọn khi method=None (như nhánh không timestamp). Lựa chọn phụ thuộc
+        số dòng reference và số giá trị distinct của reference + current; khi đã chọn psi / ks /
+        wasserstein chỉ từ reference thì mọi timestamp đều ra cùng stattest -> dùng grouped engine.
+        None = lựa chọn còn phụ thuộc từng nhóm timestamp -> get_one_column_drift cho từng nhóm.
+        """
+        reference = reference_df[column]
+        name = get_stattest(reference, reference.iloc[:0], column_type, None).name
+        return name if name in SUPPORTED_METHODS else None
+
+    def _grouped_drift(self, reference_df, current_df, column, column_type, group_codes, timestamps, method, reference_profile=None):
+        """
+        Bin reference một lần, gán bin cho toàn bộ current một lần, rồi tính drift
+        cho mọi timestamp từ ma trận đếm (timestamp x bin).
+        """
+        profile = load_reference_profile(reference_profile) if reference_profile else None
+        if profile is not None and column in profile.drift_bins:
+            bins = profile.drift_bins[column]
+        else:
+            bins = fit_column_bins(
+                reference_df[column],
+                column,
+                discrete=True if column_type == ColumnType.Categorical else None,
+            )
+        stats = grouped_drift(bins, current_df[column], group_codes, len(timestamps))
+        scores = drift_scores(stats, method)
+        detected = drift_detected(scores, method, self.metric.threshold)
+
+        # Nếu nhóm có quá ít sample thì bỏ qua
+        keep = stats["n_rows"] >= 10
+        return pd.DataFrame({
+            "timestamp": np.asarray(timestamps)[keep],
+            "drift_score": scores[keep],
+            "drift_detected": detected[keep],
+        })
+
+    def _per_slice_drift(self, reference_df, current_df, column, column_type, group_codes, timestamps):
+        """Fallback cho các stattest mà drift_engine chưa hỗ trợ: gọi get_one_column_drift cho từng timestamp."""
+        order = np.argsort(group_codes, kind="stable")
+        bounds = np.searchsorted(group_codes[order], np.arange(len(timestamps) + 1))
+        rows = []
+        for i, ts in enumerate(timestamps):
+            cur_slice = current_df.iloc[order[bounds[i]:bounds[i + 1]]]
+
+            # Nếu nhóm có quá ít sample thì bỏ qua
+            if len(cur_slice) < 10:
+                continue
+
+            # So sánh với TOÀN BỘ reference (không phải cùng timestamp)
+            drift = get_one_column_drift(
+                current_data=cur_slice,
+                reference_data=reference_df,  # Toàn bộ reference
+                column_name=column,
+                options=DataDriftOptions(
+                    all_features_stattest=self.metric.method,
+                    all_features_threshold=self.metric.threshold,
+                ),
+                dataset_columns=DatasetColumns(
+                    utility_columns=DatasetUtilityColumns(),
+                    num_feature_names=[column] if column_type == ColumnType.Numerical else [],
+                    cat_feature_names=[column] if column_type == ColumnType.Categorical else [],
+                    text_feature_names=[column] if column_type == ColumnType.Text else [],
+                    datetime_feature_names=[column] if column_type == ColumnType.Datetime else [],
+                    target_names=None,
+                ),
+                column_type=column_type,
+                agg_data=True,
+            )
+            rows.append((ts, drift.drift_score, drift.drift_detected))
+        return pd.DataFrame(rows, columns=["timestamp", "drift_score", "drift_detected"])
+
     def display_name(self) -> str:
         if self.metric.timestamp_column:
             return f"Value drift for {self.metric.column} by {self.metric.timestamp_column}"
@@ -278,14 +344,17 @@ class MyValueDriftCalculation(SingleValueCalculation[MyValueDrift]):
             drift = "not detected"
 
         drift_score = round(result.drift_score, 3)
+        budget = budget_of(self.metric)
         tabs = []
         if result.scatter is not None:
             if options.render_options.raw_data:
                 if not isinstance(result.scatter, ScatterField):
                     raise ValueError("Result have incompatible type")
+                raw = result.scatter.scatter
+                raw = raw.iloc[decimate_indices(raw[result.column_name].to_numpy(), budget.max_plot_points)]
                 scatter_fig = plot_scatter_for_data_drift(
-                    curr_y=result.scatter.scatter[result.column_name].tolist(),
-                    curr_x=result.scatter.scatter[result.scatter.x_name].tolist(),
+                    curr_y=raw[result.column_name].tolist(),
+                    curr_x=raw[result.scatter.x_name].tolist(),
                     y0=result.scatter.plot_shape["y0"],
                     y1=result.scatter.plot_shape["y1"],
                     y_name=result.column_name,
@@ -294,7 +363,7 @@ class MyValueDriftCalculation(SingleValueCalculation[MyValueDrift]):
                 )
             else:
                 scatter_fig = plot_agg_line_data(
-                    curr_data=result.scatter.scatter,
+                    curr_data={name: decimate_frame(df, budget, key="mean") for name, df in result.scatter.scatter.items()},
                     ref_data=None,
                     line=(result.scatter.plot_shape["y0"] + result.scatter.plot_shape["y1"]) / 2,
                     std=(result.scatter.plot_shape["y0"] - result.scatter.plot_shape["y1"]) / 2,
@@ -308,9 +377,13 @@ class MyValueDriftCalculation(SingleValueCalculation[MyValueDrift]):
             tabs.append(TabData("DATA DRIFT", plotly_figure(title="", figure=scatter_fig)))
 
         if result.current.distribution is not None and result.reference.distribution is not None:
+            # Gộp bin / category theo budget (drift score đã tính trên distribution đầy đủ)
+            distr_cur, distr_ref = budget_distributions(
+                result.current.distribution, result.reference.distribution, budget
+            )
             distr_fig = plot_distr_with_perc_button(
-                hist_curr=HistogramData.from_distribution(result.current.distribution),
-                hist_ref=HistogramData.from_distribution(result.reference.distribution),
+                hist_curr=HistogramData.from_distribution(distr_cur),
+                hist_ref=HistogramData.from_distribution(distr_ref),
                 xaxis_name="",
                 yaxis_name="Count",
                 yaxis_name_perc="Percent",
@@ -406,11 +479,13 @@ class MyValueDrift_2(ColumnMetric, SingleValueMetric):
     """Drift threshold (uses method default if None)."""
     timestamp_column: Optional[str] = None
     """Timestamp column (uses method default if None)."""
+    plot_budget: Optional[PlotBudget] = None
+    """Size budget khi vẽ (số điểm scatter, số bin / category của histogram)."""
 
 
 
 class MyValueDriftCalculation_2(SingleValueCalculation[MyValueDrift_2]):
-    def calculate(self, context: "Context", 
+    def calculate(self, context: Context, 
     current_data: Dataset, 
     reference_data: Optional[Dataset],
     timestamp_column: Optional[str] = None
@@ -446,7 +521,7 @@ class MyValueDriftCalculation_2(SingleValueCalculation[MyValueDrift_2]):
         if self.metric.threshold is None:
             self.resolve_parameter("threshold", drift.stattest_threshold)
         result = self.result(drift.drift_score)
-        result.widget = self._render(drift, Options(), ColorOptions())
+        result.widget = self._render(drift, Options(), ColorOptions()) if widgets_enabled(context) else []
         if self.metric.tests is None and context.configuration.include_tests:
             # todo: move to _default_tests
             result.set_tests(
@@ -480,14 +555,17 @@ class MyValueDriftCalculation_2(SingleValueCalculation[MyValueDrift_2]):
             drift = "not detected"
 
         drift_score = round(result.drift_score, 3)
+        budget = budget_of(self.metric)
         tabs = []
         if result.scatter is not None:
             if options.render_options.raw_data:
                 if not isinstance(result.scatter, ScatterField):
                     raise ValueError("Result have incompatible type")
+                raw = result.scatter.scatter
+                raw = raw.iloc[decimate_indices(raw[result.column_name].to_numpy(), budget.max_plot_points)]
                 scatter_fig = plot_scatter_for_data_drift(
-                    curr_y=result.scatter.scatter[result.column_name].tolist(),
-                    curr_x=result.scatter.scatter[result.scatter.x_name].tolist(),
+                    curr_y=raw[result.column_name].tolist(),
+                    curr_x=raw[result.scatter.x_name].tolist(),
                     y0=result.scatter.plot_shape["y0"],
                     y1=result.scatter.plot_shape["y1"],
                     y_name=result.column_name,
@@ -496,7 +574,7 @@ class MyValueDriftCalculation_2(SingleValueCalculation[MyValueDrift_2]):
                 )
             else:
                 scatter_fig = plot_agg_line_data(
-                    curr_data=result.scatter.scatter,
+                    curr_data={name: decimate_frame(df, budget, key="mean") for name, df in result.scatter.scatter.items()},
                     ref_data=None,
                     line=(result.scatter.plot_shape["y0"] + result.scatter.plot_shape["y1"]) / 2,
                     std=(result.scatter.plot_shape["y0"] - result.scatter.plot_shape["y1"]) / 2,
@@ -510,9 +588,13 @@ class MyValueDriftCalculation_2(SingleValueCalculation[MyValueDrift_2]):
             tabs.append(TabData("DATA DRIFT", plotly_figure(title="", figure=scatter_fig)))
 
         if result.current.distribution is not None and result.reference.distribution is not None:
+            # Gộp bin / category theo budget (drift score đã tính trên distribution đầy đủ)
+            distr_cur, distr_ref = budget_distributions(
+                result.current.distribution, result.reference.distribution, budget
+            )
             distr_fig = plot_distr_with_perc_button(
-                hist_curr=HistogramData.from_distribution(result.current.distribution),
-                hist_ref=HistogramData.from_distribution(result.reference.distribution),
+                hist_curr=HistogramData.from_distribution(distr_cur),
+                hist_ref=HistogramData.from_distribution(distr_ref),
                 xaxis_name="",
                 yaxis_name="Count",
                 yaxis_name_perc="Percent",
@@ -2,10 +2,12 @@ from .AUCMetric import AUCMetric
 from .GiniMetric import GiniMetric
 from .DefaultRateMetric import DefaultRateMetric
 from .KSMetric import KSMetric
-from .IVSummaryMetric import IVSummaryMetric
+from .IVSummaryMetric import IVSummaryMetric, get_feature_iv
 from .BasicWOEMetric import BasicWOEMetric
 from .MyValueDrift import (MyValueDrift, 
                         MyValueDriftCalculation, 
                         MyValueDrift_2, 
                         MyValueDriftCalculation_2
-                        )
\ No newline at end of file
+                        )
+from .FeatureDriftMetric import FeatureDrift, DriftedFeaturesCount, FeatureDriftPreset, FeatureDriftHeatmap
+from .DataProfileMetric import DatasetProfileValue, DatasetMissingValues, ColumnProfileValue, DataProfilePreset
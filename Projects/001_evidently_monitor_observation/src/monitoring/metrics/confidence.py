@@ -0,0 +1,215 @@
+"""
+Confidence intervals cho AUC / Gini / KS.
+
+- bootstrap: score được gom vào bins (giá trị distinct nếu ít, ngược lại quantile bins),
+  đếm bad / good theo bin; mỗi resample là MỘT vector trọng số multinomial trên bins
+  (bootstrap phân tầng theo class, giữ nguyên n_bad / n_good). Toàn bộ resamples của một
+  chunk được sinh bằng một lần gọi `Generator.multinomial(size=...)` và tính AUC / KS bằng
+  cumsum theo trục bins -> không có vòng lặp Python theo từng resample. Các chunk chạy
+  song song trên thread pool (NumPy nhả GIL trong phần tính toán).
+  AUC / Gini: percentile CI. KS là max của |cum_bad - cum_good| nên bootstrap KS bị lệch
+  lên trên ở mẫu nhỏ -> dùng basic bootstrap CI [2*ks - q_hi, 2*ks - q_lo] để bù độ lệch.
+  Sai số do gom bins giống ScoreHistogram (xem discrimination.StreamingDiscrimination).
+- delong: khoảng tin cậy chuẩn cho AUC (và Gini = 2*AUC - 1) theo phương sai DeLong.
+  KS không có công thức DeLong -> luôn dùng bootstrap.
+
+Kết quả memoize trong Evidently Context giống discrimination kernel.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+from scipy.stats import norm
+
+from evidently import Dataset
+from evidently.core.metric_types import MetricTestResult
+from evidently.core.report import Context
+from evidently.legacy.tests.base_test import TestStatus
+
+from .discrimination import get_discrimination
+
+CI_METHODS = ("bootstrap", "delong")
+
+
+@dataclass
+class ConfidenceInterval:
+    value: float
+    lower: float
+    upper: float
+    level: float
+    method: str
+
+    def contains(self, x: float) -> bool:
+        return bool(self.lower <= x <= self.upper)
+
+
+def _class_bin_counts(y_true: np.ndarray, y_pred: np.ndarray, max_bins: int):
+    """Counts bad / good theo bins score (thứ tự score tăng dần)."""
+    values, codes = np.unique(y_pred, return_inverse=True)
+    if len(values) > max_bins:
+        edges = np.unique(np.quantile(y_pred, np.linspace(0, 1, max_bins + 1)))
+        codes = np.searchsorted(edges[1:-1], y_pred, side="right")
+        n_bins = len(edges) - 1
+    else:
+        n_bins = len(values)
+    is_bad = y_true == 1
+    return (
+        np.bincount(codes[is_bad], minlength=n_bins),
+        np.bincount(codes[~is_bad], minlength=n_bins),
+    )
+
+
+def _auc_ks_from_counts(bad: np.ndarray, good: np.ndarray):
+    """AUC, KS cho từng hàng của ma trận counts (resample x bin, bin theo score tăng dần)."""
+    bad = bad[:, ::-1].astype(float)
+    good = good[:, ::-1].astype(float)
+    n_bad = bad.sum(axis=1, keepdims=True)
+    n_good = good.sum(axis=1, keepdims=True)
+    cum_bad = np.cumsum(bad, axis=1)
+    cum_good = np.cumsum(good, axis=1)
+    # good trong bin k bị xếp sau mọi bad ở bin cao hơn, hoà với bad cùng bin
+    auc = np.sum(good * (cum_bad - 0.5 * bad), axis=1) / (n_bad[:, 0] * n_good[:, 0])
+    ks = np.max(np.abs(cum_bad / n_bad - cum_good / n_good), axis=1)
+    return auc, ks
+
+
+def _bootstrap_chunk(seed, bad, good, size):
+    rng = np.random.default_rng(seed)
+    n_bad, n_good = int(bad.sum()), int(good.sum())
+    w_bad = rng.multinomial(n_bad, bad / n_bad, size=size)
+    w_good = rng.multinomial(n_good, good / n_good, size=size)
+    return _auc_ks_from_counts(w_bad, w_good)
+
+
+def bootstrap_intervals(
+    y_true,
+    y_pred,
+    n_resamples: int = 1000,
+    level: float = 0.95,
+    max_bins: int = 2000,
+    seed: int = 0,
+    n_jobs: Optional[int] = None,
+    chunk_size: int = 250,
+) -> Dict[str, ConfidenceInterval]:
+    """Bootstrap CI cho auc, gini (percentile) và ks (basic); value = giá trị tính trên bins gốc."""
+    y_true = np.asarray(y_true).astype(int)
+    y_pred = np.asarray(y_pred).astype(float)
+    bad, good = _class_bin_counts(y_true, y_pred, max_bins)
+    if bad.sum() == 0 or good.sum() == 0:
+        nan = ConfidenceInterval(np.nan, np.nan, np.nan, level, "bootstrap")
+        return {"auc": nan, "gini": nan, "ks": nan}
+
+    sizes = [min(chunk_size, n_resamples - start) for start in range(0, n_resamples, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    n_jobs = n_jobs or min(len(sizes), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        parts = list(pool.map(lambda args: _bootstrap_chunk(args[0], bad, good, args[1]), zip(seeds, sizes)))
+    auc = np.concatenate([p[0] for p in parts])
+    ks = np.concatenate([p[1] for p in parts])
+
+    point_auc, point_ks = _auc_ks_from_counts(bad[None, :], good[None, :])
+    q = [(1 - level) / 2 * 100, (1 + level) / 2 * 100]
+    auc_lo, auc_hi = np.percentile(auc, q)
+    ks_q_lo, ks_q_hi = np.percentile(ks, q)
+    ks_lo, ks_hi = max(2 * point_ks[0] - ks_q_hi, 0.0), min(2 * point_ks[0] - ks_q_lo, 1.0)
+    return {
+        "auc": ConfidenceInterval(float(point_auc[0]), float(auc_lo), float(auc_hi), level, "bootstrap"),
+        "gini": ConfidenceInterval(float(2 * point_auc[0] - 1), float(2 * auc_lo - 1), float(2 * auc_hi - 1), level, "bootstrap"),
+        "ks": ConfidenceInterval(float(point_ks[0]), float(ks_lo), float(ks_hi), level, "bootstrap"),
+    }
+
+
+def delong_intervals(y_true, y_pred, level: float = 0.95) -> Dict[str, ConfidenceInterval]:
+    """CI cho auc, gini theo phương sai DeLong (placement values, ties tính 0.5)."""
+    y_true = np.asarray(y_true).astype(int)
+    y_pred = np.asarray(y_pred).astype(float)
+    pos = y_pred[y_true == 1]
+    neg = y_pred[y_true == 0]
+    m, n = len(pos), len(neg)
+    if m < 2 or n < 2:
+        nan = ConfidenceInterval(np.nan, np.nan, np.nan, level, "delong")
+        return {"auc": nan, "gini": nan}
+
+    neg_sorted, pos_sorted = np.sort(neg), np.sort(pos)
+    below = np.searchsorted(neg_sorted, pos, side="left")
+    tied = np.searchsorted(neg_sorted, pos, side="right") - below
+    v10 = (below + 0.5 * tied) / n
+    above = m - np.searchsorted(pos_sorted, neg, side="right")
+    tied = m - np.searchsorted(pos_sorted, neg, side="left") - above
+    v01 = (above + 0.5 * tied) / m
+
+    auc = float(v10.mean())
+    se = float(np.sqrt(v10.var(ddof=1) / m + v01.var(ddof=1) / n))
+    z = norm.ppf((1 + level) / 2)
+    lo, hi = max(auc - z * se, 0.0), min(auc + z * se, 1.0)
+    lo, hi = float(lo), float(hi)
+    return {
+        "auc": ConfidenceInterval(auc, lo, hi, level, "delong"),
+        "gini": ConfidenceInterval(2 * auc - 1, 2 * lo - 1, 2 * hi - 1, level, "delong"),
+    }
+
+
+def get_confidence_interval(
+    context: Context,
+    dataset: Dataset,
+    true_column: str,
+    pred_column: str,
+    metric_name: str,
+    method: str = "bootstrap",
+    level: float = 0.95,
+    n_resamples: int = 1000,
+) -> ConfidenceInterval:
+    """
+    CI của metric_name ("auc", "gini", "ks") cho `dataset`, memoize trong `context`
+    để AUC / Gini / KS dùng chung một lần bootstrap.
+    """
+    if method not in CI_METHODS:
+        raise ValueError(f"ci_method must be one of {CI_METHODS}, got {method!r}")
+    if metric_name == "ks":
+        method = "bootstrap"
+    cache = getattr(context, "_confidence_cache", None)
+    if cache is None:
+        cache = {}
+        context._confidence_cache = cache
+    key = (id(dataset), true_column, pred_column, method, level, n_resamples)
+    hit = cache.get(key)
+    if hit is None or hit[0] is not dataset:
+        # Dùng lại mảng đã sort của kernel (không đọc lại cột từ dataset)
+        disc = get_discrimination(context, dataset, true_column, pred_column)
+        if method == "delong":
+            intervals = delong_intervals(disc.labels_sorted, disc.scores_sorted, level=level)
+        else:
+            intervals = bootstrap_intervals(disc.labels_sorted, disc.scores_sorted, n_resamples=n_resamples, level=level)
+        hit = (dataset, intervals)
+        cache[key] = hit
+    return hit[1][metric_name]
+
+
+def interval_test(calculation, interval: ConfidenceInterval, reference_value: float) -> MetricTestResult:
+    """Test chỉ FAIL khi khoảng tin cậy của current KHÔNG chứa giá trị reference."""
+    return MetricTestResult(
+        id="confidence_interval",
+        name=f"{calculation.display_name().strip()}: reference within {interval.level:.0%} CI",
+        description=f"Current value is {interval.value:0.4f}, {interval.level:.0%} {interval.method} "
+                    f"CI [{interval.lower:0.4f}, {interval.upper:0.4f}]. Reference value is {reference_value:0.4f}.",
+        status=TestStatus.SUCCESS if interval.contains(reference_value) else TestStatus.FAIL,
+        metric_config=calculation.to_metric_config(),
+        test_config={"method": interval.method, "level": interval.level},
+    )
+
+
+def set_interval_test(calculation, context: Context, current_data: Dataset, result, reference_value: float, metric_name: str):
+    """
+    Gắn test CI vào result nếu metric bật ci_method (và report chạy với include_tests,
+    metric không có tests tự khai báo). Dùng chung cho AUCMetric / GiniMetric / KSMetric.
+    """
+    metric = calculation.metric
+    if metric.ci_method is None or metric.tests is not None or not context.configuration.include_tests:
+        return
+    interval = get_confidence_interval(
+        context, current_data, metric.true_column, metric.pred_column, metric_name,
+        method=metric.ci_method, level=metric.ci_level, n_resamples=metric.n_resamples,
+    )
+    result.set_tests([interval_test(calculation, interval, reference_value)])
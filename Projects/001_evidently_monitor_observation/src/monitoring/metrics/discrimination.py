@@ -0,0 +1,304 @@
+"""
+Discrimination kernel dùng chung cho AUC / Gini / KS.
+
+Mỗi dataset chỉ sort y_pred MỘT lần (giảm dần, risk cao trước); từ cùng một dãy
+cumulative counts suy ra:
+- ROC curve (tại các ngưỡng score khác nhau, xử lý ties giống sklearn) -> AUC, Gini = 2*AUC - 1
+- KS curve (cum_bad / cum_good theo từng dòng) -> KS
+- bảng lift / gains theo nhóm population
+
+Kết quả được memoize trong Evidently Context của report, nên AUCMetric, GiniMetric
+và KSMetric chạy trong cùng report đọc chung một kết quả.
+
+Streaming mode (ScoreHistogram / stream_discrimination): cho bảng score lớn hơn RAM,
+cộng dồn histogram score theo class từng chunk, bộ nhớ cố định, kèm cận sai số.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from evidently import Dataset
+from evidently.core.report import Context
+
+from ..reference_profile import load_reference_profile
+
+
+def _ks_from_sorted(y_sorted: np.ndarray) -> Tuple[float, int, np.ndarray, np.ndarray]:
+    """
+    KS từ labels đã sort theo y_pred desc (không cần sort lại).
+    Return:
+      ks_value, ks_index, cum_bad, cum_good
+    """
+    total_bad = (y_sorted == 1).sum()
+    total_good = (y_sorted == 0).sum()
+
+    if total_bad == 0 or total_good == 0:
+        return np.nan, 0, np.zeros(len(y_sorted), dtype=float), np.zeros(len(y_sorted), dtype=float)
+
+    cum_bad = np.cumsum(y_sorted == 1) / total_bad
+    cum_good = np.cumsum(y_sorted == 0) / total_good
+
+    ks_arr = np.abs(cum_bad - cum_good)
+    ks_index = int(np.argmax(ks_arr))
+    ks_value = float(ks_arr[ks_index])
+    return ks_value, ks_index, cum_bad, cum_good
+
+
+def _roc_from_sorted(y_sorted: np.ndarray, p_sorted: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ROC (fpr, tpr, thresholds) tại các ngưỡng score khác nhau; dòng cùng score được gom lại."""
+    if len(p_sorted) == 0:
+        return np.zeros(1), np.zeros(1), np.array([np.inf])
+    last_of_group = np.r_[np.flatnonzero(np.diff(p_sorted)), len(p_sorted) - 1]
+    tps = np.cumsum(y_sorted == 1)[last_of_group]
+    fps = (last_of_group + 1) - tps
+    n_bad, n_good = tps[-1], fps[-1]
+    tpr = np.r_[0.0, tps / n_bad] if n_bad > 0 else np.full(len(tps) + 1, np.nan)
+    fpr = np.r_[0.0, fps / n_good] if n_good > 0 else np.full(len(fps) + 1, np.nan)
+    return fpr, tpr, np.r_[np.inf, p_sorted[last_of_group]]
+
+
+@dataclass
+class Discrimination:
+    """Kết quả của kernel cho một dataset (bad=1, good=0, sort theo y_pred desc)."""
+    labels_sorted: np.ndarray
+    scores_sorted: np.ndarray
+    auc: float
+    gini: float
+    ks: float
+    ks_index: int
+    cum_bad: np.ndarray
+    cum_good: np.ndarray
+    roc_fpr: np.ndarray
+    roc_tpr: np.ndarray
+    roc_thresholds: np.ndarray
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.labels_sorted)
+
+    @property
+    def n_bad(self) -> int:
+        return int((self.labels_sorted == 1).sum())
+
+    @property
+    def default_rate(self) -> float:
+        return self.n_bad / self.n_rows if self.n_rows else np.nan
+
+    def gains_table(self, n_groups: int = 10) -> pd.DataFrame:
+        """
+        Bảng lift / gains theo n_groups nhóm population bằng nhau (group 1 = risk cao nhất).
+        Cột: group, n, n_bad, bad_rate, cum_bad_capture, lift, cum_lift
+        """
+        n = self.n_rows
+        if n == 0:
+            return pd.DataFrame(columns=["group", "n", "n_bad", "bad_rate", "cum_bad_capture", "lift", "cum_lift"])
+        group = np.arange(n) * n_groups // n
+        counts = np.bincount(group, minlength=n_groups)
+        bads = np.bincount(group, weights=(self.labels_sorted == 1), minlength=n_groups)
+        overall = self.default_rate
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bad_rate = bads / counts
+            cum_rate = np.cumsum(bads) / np.cumsum(counts)
+            table = pd.DataFrame({
+                "group": np.arange(1, n_groups + 1),
+                "n": counts,
+                "n_bad": bads.astype(int),
+                "bad_rate": bad_rate,
+                "cum_bad_capture": np.cumsum(bads) / max(self.n_bad, 1),
+                "lift": bad_rate / overall,
+                "cum_lift": cum_rate / overall,
+            })
+        return table[table["n"] > 0].reset_index(drop=True)
+
+
+def discrimination_from_sorted(y_sorted: np.ndarray, p_sorted: np.ndarray) -> Discrimination:
+    """Kernel trên dữ liệu đã sort theo y_pred desc (vd. scores trong reference profile)."""
+    y_sorted = np.asarray(y_sorted).astype(int)
+    p_sorted = np.asarray(p_sorted).astype(float)
+    ks_value, ks_index, cum_bad, cum_good = _ks_from_sorted(y_sorted)
+    fpr, tpr, thresholds = _roc_from_sorted(y_sorted, p_sorted)
+    # Diện tích dưới ROC theo hình thang (cùng kết quả với sklearn.roc_auc_score)
+    auc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+    return Discrimination(
+        labels_sorted=y_sorted,
+        scores_sorted=p_sorted,
+        auc=auc,
+        gini=2 * auc - 1,
+        ks=ks_value,
+        ks_index=ks_index,
+        cum_bad=cum_bad,
+        cum_good=cum_good,
+        roc_fpr=fpr,
+        roc_tpr=tpr,
+        roc_thresholds=thresholds,
+    )
+
+
+def valid_pairs(y_true, y_pred) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (y_true, y_pred) dạng float, bỏ các dòng thiếu label hoặc score (vd. label chưa về).
+    Cùng định nghĩa cho AUC / Gini / KS, default rate và reference profile.
+    """
+    y_true = pd.to_numeric(pd.Series(y_true), errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    y_pred = pd.to_numeric(pd.Series(y_pred), errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    valid = ~(np.isnan(y_true) | np.isnan(y_pred))
+    return y_true[valid], y_pred[valid]
+
+
+def compute_discrimination(y_true, y_pred) -> Discrimination:
+    """Sort y_pred desc MỘT lần (stable) rồi tính toàn bộ kết quả; dòng thiếu label / score bị bỏ."""
+    y_true, y_pred = valid_pairs(y_true, y_pred)
+    y_true = y_true.astype(int)
+    order = np.argsort(-y_pred, kind="stable")
+    return discrimination_from_sorted(y_true[order], y_pred[order])
+
+
+def get_discrimination(context: Context, dataset: Dataset, true_column: str, pred_column: str) -> Discrimination:
+    """
+    Kết quả kernel cho `dataset`, memoize trong `context` (một Context / một lần chạy report),
+    để AUC / Gini / KS trong cùng report không sort lại dữ liệu.
+    """
+    cache = getattr(context, "_discrimination_cache", None)
+    if cache is None:
+        cache = {}
+        context._discrimination_cache = cache
+    key = (id(dataset), true_column, pred_column)
+    hit = cache.get(key)
+    if hit is not None and hit[0] is dataset:
+        return hit[1]
+    result = compute_discrimination(dataset.column(true_column).data, dataset.column(pred_column).data)
+    cache[key] = (dataset, result)
+    return result
+
+
+@lru_cache(maxsize=8)
+def profile_discrimination(profile_path: str) -> Discrimination:
+    """Kernel cho reference từ profile (scores đã sort sẵn, không cần sort lại)."""
+    profile = load_reference_profile(profile_path)
+    return discrimination_from_sorted(profile.labels_sorted, profile.scores_sorted)
+
+
+# ---- Streaming mode: histogram score theo class, bộ nhớ cố định ----
+
+@dataclass
+class StreamingDiscrimination:
+    """
+    AUC / Gini / KS tính từ ScoreHistogram, kèm cận sai số so với tính trên toàn bộ dữ liệu:
+    - |AUC - AUC_exact| <= auc_error_bound = 0.5 * sum_b(bad_b * good_b) / (n_bad * n_good)
+      (chỉ các cặp bad/good rơi vào CÙNG một bin là không biết thứ tự; histogram tính mỗi cặp 0.5)
+    - KS <= KS_exact <= KS + ks_error_bound, ks_error_bound = max_b max(bad_b / n_bad, good_b / n_good)
+      (KS chỉ được đánh giá tại biên bin; bên trong một bin mỗi CDF tăng tối đa bằng tỉ trọng của bin)
+    - Gini: sai số <= 2 * auc_error_bound
+    """
+    auc: float
+    gini: float
+    ks: float
+    auc_error_bound: float
+    ks_error_bound: float
+    n_rows: int
+    n_bad: int
+    n_missing: int
+
+    @property
+    def default_rate(self) -> float:
+        return self.n_bad / self.n_rows if self.n_rows else np.nan
+
+
+class ScoreHistogram:
+    """
+    Histogram score độ phân giải cố định cho từng class (bad=1 / good=0), cộng dồn theo chunk
+    (vd. từng row group Parquet) -> KS / AUC / Gini với bộ nhớ O(n_bins), không cần sort.
+    Score ngoài score_range được dồn vào bin đầu / cuối (cận sai số vẫn đúng vì tính từ counts thực).
+    """
+
+    def __init__(self, n_bins: int = 10_000, score_range: Tuple[float, float] = (0.0, 1.0)):
+        self.n_bins = n_bins
+        self.score_range = (float(score_range[0]), float(score_range[1]))
+        self.bad = np.zeros(n_bins, dtype=np.int64)
+        self.good = np.zeros(n_bins, dtype=np.int64)
+        self.n_missing = 0
+
+    def _bin_index(self, y_pred: np.ndarray) -> np.ndarray:
+        lo, hi = self.score_range
+        idx = np.floor((y_pred - lo) / (hi - lo) * self.n_bins).astype(np.int64)
+        return np.clip(idx, 0, self.n_bins - 1)
+
+    def update(self, y_true, y_pred) -> "ScoreHistogram":
+        y_true = np.asarray(y_true, dtype=float)
+        y_pred = np.asarray(y_pred, dtype=float)
+        valid = ~(np.isnan(y_true) | np.isnan(y_pred))
+        self.n_missing += int((~valid).sum())
+        idx = self._bin_index(y_pred[valid])
+        is_bad = y_true[valid] == 1
+        self.bad += np.bincount(idx[is_bad], minlength=self.n_bins)
+        self.good += np.bincount(idx[~is_bad], minlength=self.n_bins)
+        return self
+
+    def merge(self, other: "ScoreHistogram") -> "ScoreHistogram":
+        if other.n_bins != self.n_bins or other.score_range != self.score_range:
+            raise ValueError("Cannot merge ScoreHistogram with different n_bins / score_range")
+        self.bad += other.bad
+        self.good += other.good
+        self.n_missing += other.n_missing
+        return self
+
+    def to_dict(self) -> Dict:
+        # Chỉ lưu các bin có dữ liệu (histogram của một ngày thường rất thưa)
+        index = np.flatnonzero(self.bad + self.good)
+        return {
+            "n_bins": self.n_bins,
+            "score_range": list(self.score_range),
+            "index": index.tolist(),
+            "bad": self.bad[index].tolist(),
+            "good": self.good[index].tolist(),
+            "n_missing": self.n_missing,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ScoreHistogram":
+        hist = cls(n_bins=int(data["n_bins"]), score_range=tuple(data["score_range"]))
+        index = np.asarray(data["index"], dtype=np.int64)
+        hist.bad[index] = data["bad"]
+        hist.good[index] = data["good"]
+        hist.n_missing = int(data["n_missing"])
+        return hist
+
+    def result(self) -> StreamingDiscrimination:
+        n_bad, n_good = int(self.bad.sum()), int(self.good.sum())
+        if n_bad == 0 or n_good == 0:
+            return StreamingDiscrimination(
+                auc=np.nan, gini=np.nan, ks=np.nan, auc_error_bound=np.nan, ks_error_bound=np.nan,
+                n_rows=n_bad + n_good, n_bad=n_bad, n_missing=self.n_missing,
+            )
+        # Risk cao trước: duyệt bin từ score cao xuống thấp, mỗi bin là một nhóm ties
+        tpr = np.r_[0.0, np.cumsum(self.bad[::-1]) / n_bad]
+        fpr = np.r_[0.0, np.cumsum(self.good[::-1]) / n_good]
+        auc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+        auc_bound = 0.5 * float(np.sum(self.bad.astype(float) * self.good)) / (n_bad * n_good)
+        return StreamingDiscrimination(
+            auc=auc,
+            gini=2 * auc - 1,
+            ks=float(np.max(np.abs(tpr - fpr))),
+            auc_error_bound=auc_bound,
+            ks_error_bound=float(max(self.bad.max() / n_bad, self.good.max() / n_good)),
+            n_rows=n_bad + n_good,
+            n_bad=n_bad,
+            n_missing=self.n_missing,
+        )
+
+
+def stream_discrimination(
+    batches,
+    true_column: str,
+    pred_column: str,
+    n_bins: int = 10_000,
+    score_range: Tuple[float, float] = (0.0, 1.0),
+) -> StreamingDiscrimination:
+    """KS / AUC / Gini từ một iterable các DataFrame (chunk) chứa true_column và pred_column."""
+    hist = ScoreHistogram(n_bins=n_bins, score_range=score_range)
+    for batch in batches:
+        hist.update(batch[true_column].to_numpy(), batch[pred_column].to_numpy())
+    return hist.result()
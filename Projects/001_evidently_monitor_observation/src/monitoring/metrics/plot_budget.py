@@ -0,0 +1,129 @@
+"""
+Size budget cho widgets của các custom metrics (config `report_budget`).
+
+Chỉ ảnh hưởng phần vẽ (figure nhúng trong HTML), giá trị metric / test luôn tính trên FULL data:
+- curve (KS, drift theo thời gian): decimate min-max theo bucket -> giữ điểm đầu / cuối và
+  cực trị của mỗi bucket (vd. điểm KS lớn nhất), số float làm tròn `plot_digits`
+- histogram numeric: gộp các bin liền kề còn <= max_hist_bins (cùng edges cho current / reference)
+- categorical: giữ max_categories giá trị nhiều nhất (current + reference), còn lại gộp "other"
+- số feature vẽ (WOE, IV summary): <= max_features
+
+Report chạy với metadata {"report_mode": "metrics_only"} (GenericModelMonitor headless) thì
+custom metrics không dựng widget nào (`widgets_enabled`), chỉ tính value + tests.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from evidently._pydantic_compat import BaseModel
+from evidently.legacy.metric_results import Distribution
+
+OTHER_CATEGORY = "other"
+METRICS_ONLY = "metrics_only"
+
+
+class PlotBudget(BaseModel):
+    max_plot_points: int = 1000   # số điểm tối đa mỗi curve
+    max_hist_bins: int = 50       # số bin tối đa mỗi histogram numeric
+    max_categories: int = 30      # số category tối đa mỗi histogram categorical
+    max_features: int = 50        # số feature tối đa mỗi widget theo feature
+    plot_digits: Optional[int] = 6  # làm tròn toạ độ khi vẽ (None = giữ nguyên)
+
+
+def budget_of(metric) -> PlotBudget:
+    return getattr(metric, "plot_budget", None) or PlotBudget()
+
+
+def widgets_enabled(context) -> bool:
+    """False khi report chạy metrics-only (metadata report_mode) -> không dựng figure / widget."""
+    metadata = getattr(context.configuration, "metadata", None) or {}
+    return metadata.get("report_mode") != METRICS_ONLY
+
+
+def decimate_indices(values: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Index các điểm giữ lại: chia thành ~max_points/2 bucket, mỗi bucket giữ argmin + argmax
+    của `values` (+ điểm đầu / cuối) -> hình dạng và đỉnh của curve không bị mất như linspace.
+    """
+    n = len(values)
+    if n <= max_points:
+        return np.arange(n)
+    values = np.nan_to_num(np.asarray(values, dtype=float))
+    n_buckets = max(1, (max_points - 2) // 2)
+    bounds = np.linspace(0, n, n_buckets + 1, dtype=int)
+    bucket = np.repeat(np.arange(n_buckets), np.diff(bounds))
+    # Sort theo (bucket, value): phần tử đầu / cuối của mỗi bucket là argmin / argmax
+    order = np.lexsort((values, bucket))
+    return np.unique(np.concatenate([[0, n - 1], order[bounds[:-1]], order[bounds[1:] - 1]]))
+
+
+def _round(values: np.ndarray, digits: Optional[int]) -> np.ndarray:
+    values = np.asarray(values)
+    if digits is None or not np.issubdtype(values.dtype, np.floating):
+        return values
+    return np.round(values, digits)
+
+
+def decimate_curve(x, *ys, budget: PlotBudget, key=None) -> Tuple[np.ndarray, ...]:
+    """
+    (x, y1, y2, ...) sau khi decimate theo `key` (mặc định y1) và làm tròn.
+    Mọi curve dùng cùng index -> các đường vẫn thẳng hàng theo x.
+    """
+    key = ys[0] if key is None else key
+    idx = decimate_indices(key, budget.max_plot_points)
+    return tuple(_round(np.asarray(v)[idx], budget.plot_digits) for v in (x, *ys))
+
+
+def decimate_frame(df: pd.DataFrame, budget: PlotBudget, key: Optional[str] = None) -> pd.DataFrame:
+    """Rows của `df` (vd. scatter đã aggregate của Evidently) sau khi decimate theo cột `key`."""
+    if len(df) <= budget.max_plot_points:
+        return df
+    values = df[key] if key is not None and key in df.columns else np.arange(len(df))
+    df = df.iloc[decimate_indices(np.asarray(values), budget.max_plot_points)]
+    if budget.plot_digits is None:
+        return df
+    return df.round(budget.plot_digits)
+
+
+def _merge_bins(dist: Distribution, stride: int) -> Distribution:
+    edges = np.asarray(dist.x)
+    counts = np.asarray(dist.y, dtype=float)
+    starts = np.arange(0, len(counts), stride)
+    return Distribution(x=np.append(edges[starts], edges[-1]), y=np.add.reduceat(counts, starts))
+
+
+def _cap_categories(dist: Distribution, keep: list) -> Distribution:
+    counts = dict(zip(list(dist.x), np.asarray(dist.y, dtype=float)))
+    kept = set(keep)
+    other = sum(v for k, v in counts.items() if k not in kept)
+    return Distribution(
+        x=[str(k) for k in keep] + [OTHER_CATEGORY],
+        y=[float(counts.get(k, 0.0)) for k in keep] + [float(other)],
+    )
+
+
+def budget_distributions(
+    current: Distribution,
+    reference: Distribution,
+    budget: PlotBudget,
+) -> Tuple[Distribution, Distribution]:
+    """
+    Histogram current / reference (cùng bins, như get_distribution_for_column) trong budget.
+    Numeric: x là edges (len(y) + 1) -> gộp bin liền kề; categorical: x là labels -> top + "other".
+    """
+    numeric = len(current.x) == len(current.y) + 1
+    if numeric:
+        n_bins = len(current.y)
+        if n_bins <= budget.max_hist_bins or len(reference.y) != n_bins:
+            return current, reference
+        stride = int(np.ceil(n_bins / budget.max_hist_bins))
+        return _merge_bins(current, stride), _merge_bins(reference, stride)
+
+    totals = {}
+    for dist in (current, reference):
+        for k, v in zip(list(dist.x), np.asarray(dist.y, dtype=float)):
+            totals[k] = totals.get(k, 0.0) + v
+    if len(totals) <= budget.max_categories:
+        return current, reference
+    keep = sorted(totals, key=totals.get, reverse=True)[:max(1, budget.max_categories - 1)]
+    return _cap_categories(current, keep), _cap_categories(reference, keep)
@@ -0,0 +1,171 @@
+"""
+Binning dùng chung cho IVSummaryMetric và BasicWOEMetric.
+
+Mỗi dataset chỉ được bin MỘT lần trong một lần chạy report (WOEBinning memoize trong
+Evidently Context, giống discrimination kernel), cả hai metric đọc cùng kết quả:
+- cùng tiền xử lý: strip tên cột, category -> object, bỏ dòng thiếu target
+- cùng quy ước label: bad = target == 0 (không quay lại, như Y_BAD trong utils)
+- cùng chính sách missing: missing là bin riêng ("missing", is_special_values=True) cho cả
+  numeric và categorical (không fill median / "MISSING", không tạo cột _isna)
+- current được bin theo breaks của reference (reference profile hoặc reference_data)
+- nếu có breaks artifact (scorecard.breaks_artifact, xem breaks_artifact.py): cả current và
+  reference chỉ gán bin theo breaks cố định của scorecard production, không fit breaks;
+  chỉ các feature có trong artifact được bin
+- IV của feature = total_iv của bảng WOE -> tab IV và tab WOE cùng một con số
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from evidently import Dataset
+from evidently.core.report import Context
+
+from ..breaks_artifact import ScorecardBreaks, load_breaks_artifact
+from ..reference_profile import load_reference_profile
+from . import woe_engine
+
+BAD_LABEL = "0"  # positive class cho woe_engine: target == 0 là bad
+
+
+def extract_breaks_from_bins(bins: Dict) -> Dict:
+    """
+    Trích xuất breaks từ bins dict để tái sử dụng cho dataset khác.
+    """
+    breaks_list = {}
+    for feat, bin_df in bins.items():
+        if bin_df is not None and len(bin_df) > 0 and 'breaks' in bin_df.columns:
+            # Lấy breaks từ bin_df, bỏ qua 'missing' và 'special'
+            breaks = bin_df['breaks'].dropna().tolist()
+            breaks = [b for b in breaks if b not in ['missing', 'special', 'Missing', 'Special']]
+            if breaks:
+                breaks_list[feat] = breaks
+    return breaks_list
+
+
+@dataclass
+class WOEBinning:
+    bins: Dict[str, pd.DataFrame]   # feature -> bảng WOE (woe_engine.BIN_COLUMNS)
+    features: List[str]             # features có trong data (feature hằng số không có bảng)
+
+    @property
+    def breaks_list(self) -> Dict[str, list]:
+        return extract_breaks_from_bins(self.bins)
+
+    @property
+    def iv(self) -> pd.DataFrame:
+        """[feature, iv] sort giảm dần; feature hằng số có IV = 0."""
+        values = [
+            float(self.bins[f]['total_iv'].iloc[0]) if f in self.bins and len(self.bins[f]) else 0.0
+            for f in self.features
+        ]
+        return (
+            pd.DataFrame({'feature': self.features, 'iv': values})
+            .sort_values('iv', ascending=False, kind='stable')
+            .reset_index(drop=True)
+        )
+
+    def subset(self, features: List[str]) -> "WOEBinning":
+        keep = [f for f in features if f in self.features]
+        return WOEBinning({f: self.bins[f] for f in keep if f in self.bins}, keep)
+
+
+def prepare_binning_frame(df: pd.DataFrame, target: str, features: List[str]) -> Tuple[pd.DataFrame, List[str]]:
+    """Frame [features + target] cho binning (không copy cột không dùng tới)."""
+    columns = {c.strip(): c for c in df.columns}
+    if target not in columns:
+        raise KeyError(f"Target column '{target}' not found. Available columns: {list(columns)[:30]}")
+    used = [c for c in features if c in columns and c != target]
+    data = {c: df[columns[c]] for c in used + [target]}
+    for c in used:
+        if isinstance(data[c].dtype, pd.CategoricalDtype):
+            # category -> object để categorical được sắp theo bad rate
+            data[c] = data[c].astype("object")
+    return pd.DataFrame(data, copy=False), used
+
+
+def compute_woe_binning(
+    df: pd.DataFrame,
+    target: str,
+    features: List[str],
+    reference: Optional[Union[WOEBinning, ScorecardBreaks]] = None,
+    init_breaks: Optional[Dict[str, list]] = None,
+) -> WOEBinning:
+    """
+    WOE bins cho `df`; nếu có `reference` (binning hoặc breaks artifact) thì dùng breaks của reference.
+    init_breaks: init bins của tree theo feature (vd. từ quantile sketch của reference rất lớn).
+    """
+    features = [c.strip() for c in features]
+    frame, used = prepare_binning_frame(df, target.strip(), features)
+    bins = woe_engine.woebin(
+        frame, y=target.strip(), x=used, positive=BAD_LABEL,
+        breaks_list=reference.breaks_list if reference is not None else None,
+        init_breaks=init_breaks,
+    )
+    return WOEBinning(bins, used)
+
+
+def get_woe_binning(
+    context: Context,
+    dataset: Dataset,
+    target: str,
+    features: List[str],
+    reference: Optional[Union[WOEBinning, ScorecardBreaks]] = None,
+) -> WOEBinning:
+    """WOEBinning cho `dataset`, memoize trong `context` (một lần / dataset / report)."""
+    cache = getattr(context, "_woe_binning_cache", None)
+    if cache is None:
+        cache = {}
+        context._woe_binning_cache = cache
+    key = (id(dataset), target, tuple(features), id(reference))
+    hit = cache.get(key)
+    if hit is not None and hit[0] is dataset and hit[1] is reference:
+        return hit[2]
+    result = compute_woe_binning(dataset.as_dataframe(), target, features, reference=reference)
+    cache[key] = (dataset, reference, result)
+    return result
+
+
+@lru_cache(maxsize=8)
+def profile_binning(profile_path: str, features: Tuple[str, ...]) -> WOEBinning:
+    """WOEBinning của reference từ profile (không bin lại reference)."""
+    profile = load_reference_profile(profile_path)
+    return WOEBinning(profile.woe_bins, profile.iv['feature'].tolist()).subset(list(features))
+
+
+def _profile_matches(profile_path: str, frozen: Optional[ScorecardBreaks]) -> bool:
+    """Profile chỉ dùng được nếu WOE bins trong đó được tính với cùng breaks artifact."""
+    woe_breaks = getattr(load_reference_profile(profile_path), "woe_breaks", None)
+    return woe_breaks == (frozen.fingerprint() if frozen is not None else None)
+
+
+def get_scorecard_binning(
+    context: Context,
+    current_data: Dataset,
+    reference_data: Optional[Dataset],
+    target: str,
+    features: List[str],
+    reference_profile: Optional[str] = None,
+    breaks_artifact: Optional[str] = None,
+    breaks_version: Optional[str] = None,
+) -> Tuple[WOEBinning, Optional[WOEBinning]]:
+    """
+    (current, reference) dùng chung cho các metric scorecard trong cùng report.
+    Có breaks artifact: cả 2 gán bin theo breaks cố định. Không có: current được bin
+    theo breaks của reference nếu có reference.
+    """
+    features = [c.strip() for c in features]
+    frozen = load_breaks_artifact(breaks_artifact, breaks_version) if breaks_artifact else None
+    if frozen is not None:
+        features = [c for c in features if c in frozen.breaks]
+    reference = None
+    if reference_data is not None and reference_profile and _profile_matches(reference_profile, frozen):
+        reference = profile_binning(reference_profile, tuple(features))
+    elif reference_data is not None:
+        reference = get_woe_binning(context, reference_data, target, features, reference=frozen)
+    current = get_woe_binning(
+        context, current_data, target, features,
+        reference=frozen if frozen is not None else reference,
+    )
+    return current, reference
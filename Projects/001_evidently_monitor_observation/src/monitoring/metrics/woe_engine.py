@@ -0,0 +1,547 @@
+"""
+WOE / IV binning engine (NumPy), thay cho scorecardpy.woebin / scorecardpy.iv.
+
+- Cùng thuật toán tree-like của scorecardpy: init bins (pretty breaks hoặc giá trị distinct
+  cho numeric, từng giá trị cho categorical), gộp bin không có good / bad, rồi thêm dần
+  breakpoint cho total IV lớn nhất (dừng theo stop_limit / bin_num_limit / count_distr_limit).
+  Mỗi candidate được đánh giá trên vector counts của init bins (không groupby pandas).
+- Gán bin: np.searchsorted (numeric) / pd.factorize (categorical). Good / bad của mọi feature
+  được đếm cùng lúc: codes của từng feature cộng offset, xếp thành ma trận, một np.bincount.
+- Tính codes và chọn breaks chạy song song theo feature (thread pool).
+- method="quantile": breaks equal-frequency (bin_num_limit bins) thay cho tree.
+
+Output cùng dạng với scorecardpy: `woebin` trả về dict feature -> DataFrame (BIN_COLUMNS),
+`iv` trả về DataFrame [variable, info_value]; breaks của bảng reference dùng lại được làm
+breaks_list cho current. Missing luôn là bin riêng ("missing", is_special_values=True) trừ khi
+breaks_list có phần tử chứa "missing".
+`bin_counts` / `iv_from_counts`: counts good / bad theo breaks cố định, cộng dồn được giữa
+các partition (xem accumulators.py).
+"""
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+BIN_COLUMNS = [
+    'variable', 'bin', 'count', 'count_distr', 'good', 'bad', 'badprob',
+    'woe', 'bin_iv', 'total_iv', 'breaks', 'is_special_values',
+]
+BIN_METHODS = ("tree", "quantile")
+
+_INF_TOKENS = {'-inf', 'inf', '-Inf', 'Inf'}
+_STACK_CELLS = 50_000_000  # số ô tối đa của ma trận codes cho một lần bincount
+
+
+def _map_threads(func, items, n_jobs: Optional[int] = None) -> list:
+    items = list(items)
+    n_jobs = n_jobs or min(len(items), os.cpu_count() or 1)
+    if n_jobs <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        return list(pool.map(func, items))
+
+
+def _label_mask(y: pd.Series, positive: str, strict: bool = True):
+    """
+    (is_bad, keep): y -> 1 nếu giá trị thuộc `positive` ("bad|1"), bỏ dòng y NaN.
+    strict=False cho phép partition chỉ có một class (vd. counts của một ngày).
+    """
+    keep = y.notna().to_numpy()
+    values = y.to_numpy()[keep]
+    if pd.api.types.is_numeric_dtype(y):
+        values = values.astype(int)
+    values = values.astype(str)
+    if not strict:
+        return np.isin(values, str(positive).split('|')), keep
+    if len(np.unique(values)) != 2:
+        raise ValueError(f"The length of unique values in y column '{y.name}' != 2")
+    is_bad = np.isin(values, str(positive).split('|'))
+    if not is_bad.any():
+        raise ValueError(f"The positive value in '{y.name}' is not specified")
+    return is_bad, keep
+
+
+def _numeric_values(s: pd.Series) -> np.ndarray:
+    values = s.to_numpy(dtype=float, na_value=np.nan)
+    # scorecardpy thay inf bằng -999
+    return np.where(np.isinf(values), -999.0, values)
+
+
+def _stacked_counts(codes: List[np.ndarray], sizes: List[int], is_bad: np.ndarray):
+    """
+    (good, bad) cho từng feature: codes (0..size-1) của mọi feature cộng offset theo feature,
+    xếp thành ma trận (rows x features) và đếm bằng một np.bincount cho mỗi block features.
+    """
+    offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+    total = np.zeros(offsets[-1], dtype=np.int64)
+    bad = np.zeros(offsets[-1], dtype=np.int64)
+    n_rows = len(is_bad)
+    block = max(1, _STACK_CELLS // max(n_rows, 1))
+    for start in range(0, len(codes), block):
+        idx = range(start, min(start + block, len(codes)))
+        stacked = np.empty((n_rows, len(idx)), dtype=np.int64)
+        for j, k in enumerate(idx):
+            np.add(codes[k], offsets[k], out=stacked[:, j], casting="unsafe")
+        total += np.bincount(stacked.ravel(), minlength=offsets[-1])
+        bad += np.bincount(stacked[is_bad].ravel(), minlength=offsets[-1])
+    return [
+        (total[lo:hi] - bad[lo:hi], bad[lo:hi])
+        for lo, hi in zip(offsets[:-1], offsets[1:])
+    ]
+
+
+def _iv_01(good: np.ndarray, bad: np.ndarray) -> np.ndarray:
+    """IV từng bin; count 0 được thay bằng 0.9 (giống scorecardpy)."""
+    good = np.where(good == 0, 0.9, good).astype(float)
+    bad = np.where(bad == 0, 0.9, bad).astype(float)
+    distr_bad, distr_good = bad / bad.sum(), good / good.sum()
+    return (distr_bad - distr_good) * np.log(distr_bad / distr_good)
+
+
+def _woe_01(good: np.ndarray, bad: np.ndarray) -> np.ndarray:
+    good = np.where(good == 0, 0.9, good).astype(float)
+    bad = np.where(bad == 0, 0.9, bad).astype(float)
+    return np.log((bad / bad.sum()) / (good / good.sum()))
+
+
+def _pretty(low: float, high: float, n: float) -> np.ndarray:
+    """Breakpoints 'đẹp' như hàm pretty của R (giống scorecardpy)."""
+    def nicenumber(x):
+        exp = np.floor(np.log10(abs(x)))
+        f = abs(x) / 10 ** exp
+        if f < 1.5:
+            nf = 1.
+        elif f < 3.:
+            nf = 2.
+        elif f < 7.:
+            nf = 5.
+        else:
+            nf = 10.
+        return np.sign(x) * nf * 10. ** exp
+    d = abs(nicenumber((high - low) / (n - 1)))
+    miny = np.floor(low / d) * d
+    maxy = np.ceil(high / d) * d
+    return np.arange(miny, maxy + 0.5 * d, d)
+
+
+def _initial_breaks(x: np.ndarray, init_count_distr: float) -> np.ndarray:
+    """Breaks (không gồm ±inf) của init bins cho giá trị numeric không missing."""
+    q01, q25, q75, q99 = np.percentile(x, np.array([0.01, 0.25, 0.75, 0.99]) * 100.0)
+    iqr = q75 - q25
+    low, high = (q01, q99) if iqr == 0 else (q25, q75)
+    kept = x[(x >= low - 3 * iqr) & (x <= high + 3 * iqr)]
+    n = np.trunc(1 / init_count_distr)
+    uniq = np.unique(kept)
+    if len(uniq) < n:
+        n = len(uniq)
+    brk = uniq if len(uniq) < 10 else _pretty(uniq.min(), uniq.max(), n)
+    return np.sort(brk[(brk > x.min()) & (brk <= x.max())])
+
+
+def initial_breaks_from_sketch(sketch, init_count_distr: float = 0.02) -> np.ndarray:
+    """
+    _initial_breaks từ KLLSketch của reference (quantile_sketch.py) thay vì sort cả cột:
+    percentiles xấp xỉ, giá trị distinct chính xác khi cột ít giá trị; trùng với _initial_breaks
+    khi sketch còn chính xác (chưa compact).
+    """
+    if sketch.n == 0:
+        return np.array([])
+    q01, q25, q75, q99 = sketch.quantiles([0.01, 0.25, 0.75, 0.99])
+    iqr = q75 - q25
+    low, high = (q01, q99) if iqr == 0 else (q25, q75)
+    n = np.trunc(1 / init_count_distr)
+    if sketch.distinct is not None:
+        values = np.array(sorted(sketch.distinct), dtype=float)
+    else:
+        values = sketch.items()[0]
+    uniq = np.unique(values[(values >= low - 3 * iqr) & (values <= high + 3 * iqr)])
+    if not len(uniq):
+        return np.array([])
+    if sketch.distinct is None and not sketch.is_exact:
+        # Cột nhiều giá trị: sketch chỉ giữ một phần -> số giá trị distinct >= distinct_limit
+        n_unique = max(len(uniq), sketch.distinct_limit + 1)
+    else:
+        n_unique = len(uniq)
+    if n_unique < n:
+        n = n_unique
+    brk = uniq if n_unique < 10 else _pretty(uniq.min(), uniq.max(), n)
+    return np.sort(brk[(brk > sketch.min) & (brk <= sketch.max)])
+
+
+def _quantile_breaks(x: np.ndarray, n_bins: int) -> np.ndarray:
+    brk = np.unique(np.quantile(x, np.linspace(0, 1, n_bins + 1)[1:-1]))
+    return brk[(brk > x.min()) & (brk <= x.max())]
+
+
+def _interval_label(left: float, right: float) -> str:
+    return '[{},{})'.format(float(left), float(right))
+
+
+def _merge_empty_bins(inner: np.ndarray, good: np.ndarray, bad: np.ndarray):
+    """
+    Bin rỗng gộp vào bin kế tiếp (bỏ breakpoint bên phải bin rỗng, như check_empty_bins
+    của scorecardpy). Return (good, bad, labels) theo breaks mới.
+    """
+    keep = (good + bad)[:-1] > 0
+    if not keep.all():
+        new_inner = inner[keep]
+        gid = np.concatenate([np.searchsorted(new_inner, inner, side='left'), [len(new_inner)]])
+        good = np.bincount(gid, weights=good, minlength=len(new_inner) + 1).astype(np.int64)
+        bad = np.bincount(gid, weights=bad, minlength=len(new_inner) + 1).astype(np.int64)
+        inner = new_inner
+    edges = [float('-inf')] + inner.tolist() + [float('inf')]
+    return good, bad, [_interval_label(edges[k], edges[k + 1]) for k in range(len(edges) - 1)]
+
+
+def _merge_zero_bins(good, bad, labels: List[str], brkp: list, n_rows: int):
+    """Gộp dần bin có good == 0 hoặc bad == 0 vào bin kề có count nhỏ hơn (giống scorecardpy)."""
+    good, bad, labels, brkp = list(good), list(bad), list(labels), list(brkp)
+    while True:
+        count = [g + b for g, b in zip(good, bad)]
+        zero = [i for i in range(len(count)) if good[i] == 0 or bad[i] == 0]
+        if not zero:
+            break
+        if len(count) == 1:
+            return [], [], [], []
+        i = min(zero, key=lambda k: count[k])
+        lag = count[i - 1] if i > 0 else n_rows + 1
+        lead = count[i + 1] if i < len(count) - 1 else n_rows + 1
+        j = i + 1 if lag > lead else i - 1
+        lo, hi = min(i, j), max(i, j)
+        good[lo:hi + 1] = [good[lo] + good[hi]]
+        bad[lo:hi + 1] = [bad[lo] + bad[hi]]
+        labels[lo:hi + 1] = [labels[lo] + '%,%' + labels[hi]]
+        brkp[lo:hi + 1] = [brkp[j]]
+    return good, bad, labels, brkp
+
+
+def _coarse_counts(cuts: list, brkp: np.ndarray, good: np.ndarray, bad: np.ndarray):
+    """Gom init bins theo cuts (bin [cuts[k-1], cuts[k]) theo brkp)."""
+    gid = np.searchsorted(np.asarray(cuts, dtype=float), brkp, side='right')
+    size = len(cuts) + 1
+    return gid, np.bincount(gid, weights=good, minlength=size), np.bincount(gid, weights=bad, minlength=size)
+
+
+def _tree_breaks(good, bad, brkp, n_rows, count_distr_limit, stop_limit, bin_num_limit, categorical):
+    """
+    Breakpoints tốt nhất (trên thang brkp của init bins) theo tree-like binning.
+    None = giữ nguyên init bins.
+    """
+    good, bad = np.asarray(good, dtype=float), np.asarray(bad, dtype=float)
+    brkp = np.asarray(brkp, dtype=float)
+    n_init = len(good)
+    if n_init <= 1:
+        return None
+    best = []
+    iv_prev, iv_chg, step = 1e-10, 1, 1
+    result = None
+    while iv_chg >= stop_limit and step + 1 <= min(bin_num_limit, n_init):
+        candidates = sorted(set(brkp.tolist()) - {float('-inf'), float('inf')} - set(best))
+        chosen, chosen_iv = None, None
+        for c in candidates:
+            _, g, b = _coarse_counts(sorted(best + [c]), brkp, good, bad)
+            count = g + b
+            if len(candidates) > 1:
+                # pandas chỉ giữ bin có dữ liệu khi gom nhiều candidate cùng lúc
+                nonempty = count > 0
+                g, b, count = g[nonempty], b[nonempty], count[nonempty]
+            if count.min() / n_rows < count_distr_limit:
+                continue
+            total_iv = _iv_01(g, b).sum()
+            if chosen_iv is None or total_iv > chosen_iv:
+                chosen, chosen_iv = c, total_iv
+        if chosen is not None:
+            best = best + [chosen]
+        if categorical:
+            best = [c for c in best if c != brkp.min()]
+        best = sorted(best)
+        _, g, b = _coarse_counts(best, brkp, good, bad)
+        iv_cur = _iv_01(g, b).sum()
+        iv_chg = iv_cur / iv_prev - 1
+        iv_prev = iv_cur
+        step += 1
+        result = best
+    return result
+
+
+@dataclass
+class _FeaturePlan:
+    """
+    Codes của một feature: 0 = missing (bin special), 1..n = init bins / phần tử breaks,
+    n+1 = slot "missing" không special (giá trị categorical ngoài breaks, hoặc phần tử
+    breaks chỉ gồm "missing").
+    """
+    variable: str
+    numeric: bool
+    codes: np.ndarray
+    labels: List[str]                   # nhãn slot 1..n
+    inner: Optional[np.ndarray] = None  # numeric: breaks (không gồm ±inf) của slot 1..n
+    given: bool = False                 # breaks từ breaks_list / quantile (không chạy tree)
+    missing_edge: Optional[float] = None  # numeric: missing gộp vào bin có cận phải này
+    n_missing: int = 0
+    sort_badprob: bool = True
+
+    @property
+    def size(self) -> int:
+        return len(self.labels) + 2
+
+
+def _split_breaks(breaks: list) -> List[List[str]]:
+    return [str(b).split('%,%') for b in breaks]
+
+
+def _plan_numeric(variable, values, breaks, method, init_count_distr, bin_num_limit, init=None) -> _FeaturePlan:
+    missing = np.isnan(values)
+    x = values[~missing]
+    missing_edge = missing_alone = None
+    if breaks is not None:
+        tokens = _split_breaks(breaks)
+        cuts = sorted({float(t) for parts in tokens for t in parts if t != 'missing' and t not in _INF_TOKENS})
+        inner = np.asarray(cuts, dtype=float)
+        for parts in tokens:
+            if 'missing' in parts:
+                others = [t for t in parts if t != 'missing']
+                missing_alone = not others
+                if others:
+                    missing_edge = float(others[-1])
+        given = True
+    elif method == "quantile" and len(x):
+        inner, given = _quantile_breaks(x, bin_num_limit), True
+    elif init is not None:
+        inner, given = np.asarray(init, dtype=float), False
+    else:
+        inner = _initial_breaks(x, init_count_distr) if len(x) else np.array([])
+        given = False
+    codes = np.searchsorted(inner, values, side='right') + 1
+    edges = [float('-inf')] + inner.tolist() + [float('inf')]
+    labels = [_interval_label(edges[i], edges[i + 1]) for i in range(len(edges) - 1)]
+    if missing_edge is not None:
+        # bin có cận phải missing_edge = bin chứa giá trị ngay dưới missing_edge
+        codes[missing] = np.searchsorted(inner, missing_edge, side='left') + 1
+    else:
+        codes[missing] = len(labels) + 1 if missing_alone else 0
+    return _FeaturePlan(
+        variable, True, codes, labels, inner=inner, given=given,
+        missing_edge=missing_edge, n_missing=int(missing.sum()),
+    )
+
+
+def _plan_categorical(variable, s: pd.Series, breaks) -> _FeaturePlan:
+    if breaks is not None:
+        tokens = _split_breaks(breaks)
+        lookup = {t: k + 1 for k, parts in enumerate(tokens) for t in parts if t != 'missing'}
+        # NaN vào phần tử có "missing" nếu có, ngược lại là bin special
+        missing_code = next((k + 1 for k, parts in enumerate(tokens) if 'missing' in parts), 0)
+        codes_raw, uniques = pd.factorize(s, sort=False)
+        slot = np.array([lookup.get(v, len(tokens) + 1) for v in uniques] + [missing_code], dtype=np.int64)
+        return _FeaturePlan(variable, False, slot[codes_raw], [str(b) for b in breaks], given=True)
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        codes = s.cat.codes.to_numpy().astype(np.int64) + 1
+        labels = [str(c) for c in s.cat.categories]
+        return _FeaturePlan(variable, False, codes, labels, sort_badprob=False)
+    codes_raw, uniques = pd.factorize(s, sort=True)
+    return _FeaturePlan(
+        variable, False, codes_raw.astype(np.int64) + 1, [str(v) for v in uniques],
+        sort_badprob=s.dtype.name != 'bool',
+    )
+
+
+def _format_bins(variable, rows) -> pd.DataFrame:
+    """rows: list (bin, good, bad, is_sv) -> bảng như scorecardpy.binning_format."""
+    binning = pd.DataFrame(rows, columns=['bin', 'good', 'bad', 'is_special_values'])
+    good = binning['good'].to_numpy(dtype=np.int64)
+    bad = binning['bad'].to_numpy(dtype=np.int64)
+    binning['good'], binning['bad'] = good, bad
+    binning.insert(0, 'variable', variable)
+    count = good + bad
+    binning['count'] = count
+    binning['count_distr'] = count / count.sum()
+    binning['badprob'] = bad / count
+    binning['woe'] = _woe_01(good, bad)
+    binning['bin_iv'] = _iv_01(good, bad)
+    binning['total_iv'] = binning['bin_iv'].sum()
+    binning['breaks'] = binning['bin']
+    if any('[' in str(b) for b in binning['bin']):
+        def re_extract_all(x):
+            gp23 = re.match(r"^\[(.*), *(.*)\)((%,%missing)*)", x)
+            return x if gp23 is None else gp23.group(2) + gp23.group(3)
+        binning['breaks'] = [re_extract_all(b) for b in binning['bin']]
+    return binning[BIN_COLUMNS]
+
+
+def _finish_given(plan: _FeaturePlan, good, bad) -> list:
+    """Bins theo breaks cố định (breaks_list hoặc quantile); bin không có dữ liệu bị bỏ."""
+    n = len(plan.labels)
+    g, b, labels = good[1:n + 1], bad[1:n + 1], plan.labels
+    if plan.numeric:
+        g, b, labels = _merge_empty_bins(plan.inner, g, b)
+        if plan.missing_edge is not None and plan.n_missing:
+            edge = _interval_label(0, plan.missing_edge).split(',')[1]
+            labels = [x + '%,%missing' if x.endswith(',' + edge) else x for x in labels]
+    rows = [[labels[k], g[k], b[k], False] for k in range(len(labels)) if g[k] + b[k] > 0]
+    if good[n + 1] + bad[n + 1] > 0:
+        rows.append(['missing', good[n + 1], bad[n + 1], False])
+    return rows
+
+
+def _finish_tree(plan: _FeaturePlan, good, bad, n_rows, count_distr_limit, stop_limit, bin_num_limit) -> list:
+    """Init bins -> gộp bin thiếu good / bad -> tree-like breaks."""
+    n = len(plan.labels)
+    g, b = good[1:n + 1], bad[1:n + 1]
+    if plan.numeric:
+        g, b, labels = _merge_empty_bins(plan.inner, g, b)
+        brkp = [float(re.match(r'^\[(.*),.+', x).group(1)) for x in labels]
+    else:
+        labels = plan.labels
+        if plan.sort_badprob:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                order = np.argsort(b / (g + b), kind='quicksort')
+            g, b, labels = g[order], b[order], [labels[k] for k in order]
+        brkp = list(range(n))
+
+    g, b, labels, brkp = _merge_zero_bins(g, b, labels, brkp, n_rows)
+    if not labels:
+        return []
+    if plan.numeric:
+        labels = [re.sub(r'(?<=,).+%,%.+,', '', x) if '%,%' in x else x for x in labels]
+        brkp = [float(re.match(r'^\[(.*),.+', x).group(1)) for x in labels]
+
+    best = _tree_breaks(g, b, brkp, n_rows, count_distr_limit, stop_limit, bin_num_limit, not plan.numeric)
+    if best is None:
+        return [[labels[k], g[k], b[k], False] for k in range(len(labels))]
+
+    gid, cg, cb = _coarse_counts(best, np.asarray(brkp, dtype=float), np.asarray(g, dtype=float), np.asarray(b, dtype=float))
+    edges = [float('-inf')] + best + [float('inf')]
+    rows = []
+    for k in range(len(edges) - 1):
+        if plan.numeric:
+            label = _interval_label(edges[k], edges[k + 1])
+        else:
+            label = '%,%'.join(labels[i] for i in np.flatnonzero(gid == k))
+        rows.append([label, int(cg[k]), int(cb[k]), False])
+    return rows
+
+
+def _finish(plan: _FeaturePlan, good, bad, n_rows, count_distr_limit, stop_limit, bin_num_limit) -> pd.DataFrame:
+    rows = [['missing', good[0], bad[0], True]] if good[0] + bad[0] > 0 else []
+    if plan.given:
+        rows += _finish_given(plan, good, bad)
+    else:
+        rows += _finish_tree(plan, good, bad, n_rows, count_distr_limit, stop_limit, bin_num_limit)
+    return _format_bins(plan.variable, rows)
+
+
+def woebin(
+    dt: pd.DataFrame,
+    y: str,
+    x: List[str],
+    breaks_list: Optional[Dict[str, list]] = None,
+    positive: str = "bad|1",
+    method: str = "tree",
+    init_count_distr: float = 0.02,
+    count_distr_limit: float = 0.05,
+    stop_limit: float = 0.1,
+    bin_num_limit: int = 8,
+    n_jobs: Optional[int] = None,
+    init_breaks: Optional[Dict[str, np.ndarray]] = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    WOE binning cho các feature `x` (thay cho `sc.woebin`, cùng tham số mặc định).
+
+    Feature có breaks trong `breaks_list` dùng đúng breaks đó (bin rỗng gộp vào bin kế tiếp),
+    feature còn lại được binning theo `method`. Feature chỉ có một giá trị bị bỏ qua.
+    init_breaks: init bins có sẵn cho method="tree" (vd. initial_breaks_from_sketch), bỏ qua
+    bước tính percentiles / distinct trên cả cột.
+    """
+    if method not in BIN_METHODS:
+        raise ValueError(f"method must be one of {BIN_METHODS}, got {method!r}")
+    is_bad, keep = _label_mask(dt[y], positive)
+    if not keep.all():
+        dt = dt[keep]
+    breaks_list = breaks_list or {}
+    init_breaks = init_breaks or {}
+    features = [c for c in x if c in dt.columns and c != y and dt[c].nunique(dropna=False) > 1]
+
+    def plan(feature):
+        s = dt[feature]
+        if s.dtype == object:
+            s = s.mask(s == "")  # chuỗi rỗng = missing
+        if pd.api.types.is_numeric_dtype(s):
+            return _plan_numeric(
+                feature, _numeric_values(s), breaks_list.get(feature), method, init_count_distr, bin_num_limit,
+                init=init_breaks.get(feature) if method == "tree" else None,
+            )
+        return _plan_categorical(feature, s, breaks_list.get(feature))
+
+    plans = _map_threads(plan, features, n_jobs)
+    counts = _stacked_counts([p.codes for p in plans], [p.size for p in plans], is_bad)
+    n_rows = len(is_bad)
+    tables = _map_threads(
+        lambda args: _finish(args[0], *args[1], n_rows, count_distr_limit, stop_limit, bin_num_limit),
+        zip(plans, counts), n_jobs,
+    )
+    return dict(zip(features, tables))
+
+
+def bin_counts(
+    dt: pd.DataFrame,
+    y: str,
+    breaks_list: Dict[str, list],
+    positive: str = "bad|1",
+    n_jobs: Optional[int] = None,
+) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    (good, bad) counts theo slot bin của breaks cố định (0 = missing, 1..n = phần tử breaks,
+    n+1 = missing không special). Số slot chỉ phụ thuộc breaks nên counts của các partition
+    khác nhau cộng được với nhau; feature không có trong `dt` bị bỏ qua.
+    """
+    is_bad, keep = _label_mask(dt[y], positive, strict=False)
+    if not keep.all():
+        dt = dt[keep]
+    features = [c for c in breaks_list if c in dt.columns and c != y]
+
+    def plan(feature):
+        s = dt[feature]
+        if s.dtype == object:
+            s = s.mask(s == "")  # chuỗi rỗng = missing
+        if pd.api.types.is_numeric_dtype(s):
+            return _plan_numeric(feature, _numeric_values(s), breaks_list[feature], "tree", 0.02, 8)
+        return _plan_categorical(feature, s, breaks_list[feature])
+
+    plans = _map_threads(plan, features, n_jobs)
+    counts = _stacked_counts([p.codes for p in plans], [p.size for p in plans], is_bad)
+    return dict(zip(features, counts))
+
+
+def iv_from_counts(good: np.ndarray, bad: np.ndarray) -> float:
+    """IV từ counts theo bin (bin rỗng bị bỏ, giống bảng woebin với breaks cố định)."""
+    good, bad = np.asarray(good), np.asarray(bad)
+    used = good + bad > 0
+    if not used.any():
+        return 0.0
+    return float(_iv_01(good[used], bad[used]).sum())
+
+
+def iv(dt: pd.DataFrame, y: str, x: List[str], positive: str = "bad|1", n_jobs: Optional[int] = None) -> pd.DataFrame:
+    """IV theo từng giá trị distinct của feature (thay cho `sc.iv`), sort giảm dần."""
+    is_bad, keep = _label_mask(dt[y], positive)
+    if not keep.all():
+        dt = dt[keep]
+    features = [c for c in x if c in dt.columns and c != y]
+
+    def codes(feature):
+        s = dt[feature]
+        if pd.api.types.is_numeric_dtype(s):
+            uniq, inverse = np.unique(_numeric_values(s), return_inverse=True)
+            return inverse.ravel().astype(np.int64), len(uniq)
+        inverse, uniq = pd.factorize(s.astype(str))
+        return inverse.astype(np.int64), len(uniq)
+
+    coded = _map_threads(codes, features, n_jobs)
+    counts = _stacked_counts([c for c, _ in coded], [n for _, n in coded], is_bad)
+    values = [float(_iv_01(good[good + bad > 0], bad[good + bad > 0]).sum()) for good, bad in counts]
+    return pd.DataFrame({'variable': features, 'info_value': values}).sort_values(by='info_value', ascending=False)
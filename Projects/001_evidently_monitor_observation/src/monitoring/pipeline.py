@@ -3,7 +3,7 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import json
 import warnings
 warnings.filterwarnings('ignore')
@@ -17,15 +17,58 @@ from evidently.legacy.metric_preset import TargetDriftPreset, DataQualityPreset
 from sklearn.metrics import roc_auc_score
 import scorecardpy as sc
 import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor
 
 SCR_PATH = 'D:/WORK_F88/Tracy/Projects/001_evidently_monitor_observation'
 sys.path.append(SCR_PATH)
 
 from src.monitoring.utils import (load_config, 
-get_html_from_evidently,
 get_from_file,
 replace_html_content
 )
+from src.monitoring.html_report import (
+    RenderedReport,
+    render_snapshot,
+    standalone_html,
+    tabbed_html,
+    write_dashboard,
+    write_html,
+    write_payload,
+)
+from src.monitoring.data_loader import day_keys, load_monitoring_data, iter_score_batches, period_bounds
+from src.monitoring.dataset_factory import EvidentlyDatasetFactory
+from src.monitoring.reference_profile import (
+    fingerprint_frames,
+    profile_path,
+    build_reference_profile,
+    save_reference_profile,
+)
+from src.monitoring.accumulators import (
+    AccumulatorSpec,
+    AccumulatorStore,
+    accumulate,
+    drift_table,
+    iv_table,
+    reference_drift_table,
+    spec_from_profile,
+)
+from src.monitoring.sinks import get_metrics_sink
+from src.monitoring.results import (
+    MonitoringResult,
+    StageRecords,
+    WidgetRecord,
+    feature_iv_records,
+    read_parquet,
+    reference_drift_records,
+    stage_records,
+)
+from src.monitoring.breaks_artifact import (
+    ScorecardBreaks,
+    breaks_from_bins,
+    load_breaks_artifact,
+    save_breaks_artifact,
+)
 from src.monitoring.metrics import (
     AUCMetric,
     GiniMetric,
@@ -33,11 +76,35 @@ from src.monitoring.metrics import (
     KSMetric,
     BasicWOEMetric,
     IVSummaryMetric,
+    get_feature_iv,
     MyValueDrift,
     MyValueDriftCalculation,
     MyValueDrift_2,
     MyValueDriftCalculation_2,
+    FeatureDriftPreset,
+    FeatureDriftHeatmap,
+    DataProfilePreset,
 )
+from src.monitoring.drift_engine import SUPPORTED_METHODS, stream_fit_bins
+from src.monitoring.quantile_sketch import DEFAULT_K, save_sketch
+from src.monitoring.metrics.discrimination import StreamingDiscrimination, stream_discrimination
+from src.monitoring.metrics.plot_budget import METRICS_ONLY, PlotBudget
+from src.monitoring.summary_report import render_result
+
+REPORT_MODES = ('single_file', 'dashboard', METRICS_ONLY)
+
+
+def _run_stage_in_worker(monitor: "GenericModelMonitor", method_name: str, kwargs: Dict):
+    """
+    Chạy một stage trong worker process.
+    Trả về records + report đã render (string, pickle thẳng; Snapshot của Evidently không pickle
+    được và không cần ở process cha).
+    Lỗi được bắt và trả về dạng text để một stage lỗi không làm hỏng các stage khác.
+    """
+    try:
+        return "ok", getattr(monitor, method_name)(**kwargs)
+    except Exception:
+        return "error", traceback.format_exc()
 
 
 class GenericModelMonitor:
@@ -56,6 +123,58 @@ class GenericModelMonitor:
         self.target_column = self.config['columns']['target']
         self.predict_column = self.config['columns']['prediction']
         self.base_path = self.config['base_path']['path']
+        # Chế độ chạy các stage: "sequential" hoặc "process" (process pool)
+        execution_config = self.config.get('execution', {})
+        self.execution_mode = execution_config.get('mode', 'sequential')
+        self.max_workers = execution_config.get('max_workers', 4)
+        # Reference profile cache (mặc định: <reports_dir>/_reference_profile)
+        self.profile_cache_dir = self.config.get('baseline', {}).get(
+            'profile_cache_dir', str(Path(self.output_dir) / '_reference_profile')
+        )
+        # Quantile sketch cho reference rất lớn: bins drift / init breaks WOE từ Parquet đọc stream
+        sketch_config = (self.config.get('baseline') or {}).get('quantile_sketch') or {}
+        self.sketch_enabled = bool(sketch_config.get('enabled', False))
+        self.sketch_k = sketch_config.get('k', DEFAULT_K)
+        self.sketch_chunk_rows = sketch_config.get('chunk_rows', 500_000)
+        # Breaks artifact của scorecard production (None = học breaks WOE từ reference)
+        scorecard_config = self.config.get('scorecard') or {}
+        self.breaks_artifact = scorecard_config.get('breaks_artifact')
+        if self.breaks_artifact and not Path(self.breaks_artifact).is_absolute():
+            self.breaks_artifact = str(Path(self.base_path) / self.breaks_artifact)
+        self.breaks_artifact_version = scorecard_config.get('breaks_artifact_version')
+        # Accumulators theo ngày (counts cộng dồn cho monthly / rolling window)
+        accumulator_config = self.config.get('accumulators') or {}
+        self.accumulator_dir = accumulator_config.get('store_dir', str(Path(self.output_dir) / '_accumulators'))
+        self.rolling_days = accumulator_config.get('rolling_days', 30)
+        self.score_bins = accumulator_config.get('score_bins', 10_000)
+        self.write_accumulators = accumulator_config.get('write_current', True)
+        # Metrics sink (Postgres / SQLite); chỉ ghi khi output.persist_metrics = true
+        output_config = self.config.get('output') or {}
+        self.db_connection = output_config.get('db_connection')
+        self.table_metrics = output_config.get('table_metrics', 'score_model_metrics')
+        self.table_feature_metrics = output_config.get('table_feature_metrics', 'score_feature_metrics')
+        self.persist_metrics_enabled = output_config.get('persist_metrics', False)
+        # HTML: "single_file" (mỗi file tự chứa JS) hoặc "dashboard" (asset bundle dùng chung + payload theo tab)
+        self.report_mode = output_config.get('report_mode', 'single_file')
+        # metrics_only: không dựng widget / HTML, chỉ metrics + tests (lưu Parquet, HTML dựng sau bằng render_result)
+        if self.report_mode not in REPORT_MODES:
+            raise ValueError(f"output.report_mode must be one of {REPORT_MODES}, got {self.report_mode!r}")
+        self.assets_dir = output_config.get('assets_dir') or str(Path(self.output_dir) / '_assets')
+        self.dashboard_gzip = output_config.get('dashboard_gzip', False)
+
+        # Size budget cho figure của custom metrics + ngưỡng cảnh báo size của mỗi report
+        budget_config = dict(self.config.get('report_budget') or {})
+        self.max_report_bytes = budget_config.pop('max_report_bytes', None)
+        self.plot_budget = PlotBudget(**{k: v for k, v in budget_config.items() if v is not None})
+        # Evidently Dataset factory: không copy frame, cache timestamp đã convert + DataDefinition
+        self.dataset_factory = EvidentlyDatasetFactory(
+            id_column=self.id_column,
+            timestamp_column=self.timestamp_column,
+            numerical_columns=self.numerical_columns,
+            categorical_columns=self.categorical_columns,
+            target_column=self.target_column,
+            predict_column=self.predict_column,
+        )
         # self.datetime_columns = self.config['columns']['datetime_column']
             
     def _to_evidently_dataset(
@@ -64,46 +183,27 @@ class GenericModelMonitor:
         include_target: bool = False,
         include_prediction: bool = False,
         include_timestamp: bool = True,
+        exclude_columns: tuple = (),
     ) -> Dataset:
         """
         Chuyển pandas DataFrame thành Evidently Dataset với definition phù hợp.
+        Không copy `df`; timestamp đã convert và DataDefinition được cache theo frame
+        (xem EvidentlyDatasetFactory, thống kê ở `self.dataset_factory.stats`).
         
         Args:
             df: DataFrame cần chuyển đổi
             include_target: Thêm target column vào numerical
             include_prediction: Thêm prediction column vào numerical
             include_timestamp: Bao gồm timestamp column trong Dataset (cho drift theo thời gian)
+            exclude_columns: Các cột của df không đưa vào Dataset
         """
-        df = df.copy()
-        
-        # Xử lý timestamp_column: convert sang datetime nếu cần
-        timestamp_col = None
-        if include_timestamp and self.timestamp_column and self.timestamp_column in df.columns:
-            if not pd.api.types.is_datetime64_any_dtype(df[self.timestamp_column]):
-                print('converting timestamp column to datetime: ', self.timestamp_column)
-                df[self.timestamp_column] = pd.to_datetime(df[self.timestamp_column],format='%Y%m%d', errors='coerce')
-            timestamp_col = self.timestamp_column
-
-        # if not pd.api.types.is_datetime64_any_dtype(df[self.datetime_columns]):
-        #     df[self.datetime_columns] = pd.to_datetime(df[self.datetime_columns],format='%Y%m%d', errors='coerce')
-
-        num_cols = [c for c in self.numerical_columns if c in df.columns]
-        cat_cols = [c for c in self.categorical_columns if c in df.columns]
-        
-        # Thêm target/prediction vào numerical nếu có
-        if include_target and self.target_column in df.columns:
-            num_cols = num_cols + [self.target_column]
-        if include_prediction and self.predict_column in df.columns:
-            num_cols = num_cols + [self.predict_column]
-        
-        definition = DataDefinition(
-            id_column=self.id_column if self.id_column in df.columns else None,
-            timestamp=timestamp_col,  
-            numerical_columns=num_cols,  
-            categorical_columns=cat_cols,
+        return self.dataset_factory.build(
+            df,
+            include_target=include_target,
+            include_prediction=include_prediction,
+            include_timestamp=include_timestamp,
+            exclude_columns=exclude_columns,
         )
-        
-        return Dataset.from_pandas(df, data_definition=definition)
     
     def _merge_dataframes(
         self,
@@ -141,118 +241,336 @@ class GenericModelMonitor:
         
         return result
 
+    def _join_keys(self, *frames: pd.DataFrame) -> List[pd.MultiIndex]:
+        """
+        Key [id_column, timestamp_column] cho từng frame, đã kiểm tra unique.
+        Nếu có key trùng (vd. 1 khách hàng nhiều khoản vay trong cùng ngày), thêm
+        thứ tự xuất hiện trong key làm level thứ 3 cho MỌI frame, để dòng thứ n của
+        features ghép với dòng thứ n của labels / score thay vì nhân chéo.
+        """
+        keys = [self.id_column, self.timestamp_column]
+        n_dup = [int(df.duplicated(keys).sum()) for df in frames]
+        if not any(n_dup):
+            return [pd.MultiIndex.from_frame(df[keys]) for df in frames]
+        print(f"  ⚠ Duplicated keys {keys}: {n_dup} -> match by order of appearance")
+        return [
+            pd.MultiIndex.from_arrays(
+                [df[self.id_column], df[self.timestamp_column], df.groupby(keys, sort=False).cumcount()]
+            )
+            for df in frames
+        ]
+
+    def build_aligned_frame(
+        self,
+        features_df: pd.DataFrame,
+        labels_df: Optional[pd.DataFrame] = None,
+        score_df: Optional[pd.DataFrame] = None,
+    ) -> pd.DataFrame:
+        """
+        Ghép features + labels + score thành MỘT frame (left join theo features) cho một phía.
+        Chỉ lấy target từ labels và prediction từ score (không có cột _x/_y); căn dòng theo
+        key [id_column, timestamp_column] đã validate unique, features chỉ bị copy một lần.
+        Frame trả về được dùng chung cho mọi stage -> các stage không được sửa trực tiếp.
+        """
+        extra = [
+            (df, col) for df, col in ((labels_df, self.target_column), (score_df, self.predict_column))
+            if df is not None and col not in features_df.columns
+        ]
+        if not extra:
+            return features_df
+
+        columns, keyed = {}, []
+        for df, col in extra:
+            if self.id_column in df.columns and self.id_column in features_df.columns:
+                keyed.append((df, col))
+            else:
+                # Không có id_column -> ghép theo vị trí (giống _merge_dataframes)
+                columns[col] = df[col].values
+        if keyed:
+            index, *other_indexes = self._join_keys(features_df, *[df for df, _ in keyed])
+            for (df, col), other_index in zip(keyed, other_indexes):
+                columns[col] = df[col].set_axis(other_index).reindex(index).to_numpy()
+        return features_df.assign(**columns)
+
+    def labeled_frame(self, df: pd.DataFrame, side: str, stage: str) -> pd.DataFrame:
+        """
+        Chỉ các dòng có đủ target và prediction (tương đương inner join labels + score) cho các
+        stage cần label (performance, default rate / WOE). Frame ghép sẵn là left join theo features:
+        dòng chưa có label (label về muộn) hoặc score mang NaN -> bị bỏ, số dòng bị bỏ được in ra.
+        Drift / data quality vẫn dùng toàn bộ frame.
+        """
+        cols = [c for c in (self.target_column, self.predict_column) if c in df.columns]
+        keep = df[cols].notna().all(axis=1)
+        n_dropped = int((~keep).sum())
+        if not n_dropped:
+            return df
+        print(f"  ⚠ {stage}: drop {n_dropped}/{len(df)} {side} rows without {' / '.join(cols)}")
+        return df[keep]
+
+    def get_scorecard_breaks(self) -> Optional[ScorecardBreaks]:
+        """Breaks artifact theo config (None nếu không cấu hình scorecard.breaks_artifact)."""
+        if not self.breaks_artifact:
+            return None
+        breaks = load_breaks_artifact(self.breaks_artifact, self.breaks_artifact_version)
+        missing = [c for c in self.numerical_columns + self.categorical_columns if c not in breaks.breaks]
+        if missing:
+            print(f"  ⚠ Features not in breaks artifact {breaks.version} (skipped in WOE / IV): {missing}")
+        return breaks
+
+    def export_breaks_artifact(
+        self,
+        path: str,
+        ref_df: Optional[pd.DataFrame] = None,
+        bins: Optional[Dict] = None,
+        version: Optional[str] = None,
+    ) -> str:
+        """
+        Đóng băng breaks WOE thành artifact (.json / .parquet) để dùng cho scorecard.breaks_artifact.
+        Ưu tiên `bins` lúc train scorecard (woe_engine / scorecardpy); nếu không có thì học
+        breaks từ `ref_df`. version mặc định = model.baseline_id.
+        """
+        from src.monitoring.metrics.scorecard_binning import compute_woe_binning
+
+        print(f"▶ Export Breaks Artifact...")
+        if bins is None:
+            bins = compute_woe_binning(
+                ref_df, self.target_column, self.numerical_columns + self.categorical_columns
+            ).bins
+        version = version or str(self.config['model'].get('baseline_id', ''))
+        path = save_breaks_artifact(breaks_from_bins(bins, version), path)
+        print(f"  Save to: {path}")
+        return path
+
+    def get_reference_profile(
+        self,
+        ref_features: pd.DataFrame,
+        ref_labels: pd.DataFrame,
+        ref_score: pd.DataFrame,
+        ref_df: Optional[pd.DataFrame] = None,
+    ) -> str:
+        """
+        Trả về path tới reference profile (bins, WOE tables, IV, scores đã sort, summary stats).
+        Profile được tính một lần và cache theo content hash của reference + cấu hình cột;
+        các lần chạy sau chỉ hash lại reference và load file. Mọi phần của profile (kể cả
+        drift bins từ quantile sketch) tính trên đúng các frame đã hash; reference vẫn nằm
+        trong bộ nhớ (fingerprint, WOE, discrimination).
+        """
+        print(f"▶ Reference Profile...")
+        settings = {
+            'numeric': self.numerical_columns,
+            'categorical': self.categorical_columns,
+            'id': self.id_column,
+            'timestamp': self.timestamp_column,
+            'target': self.target_column,
+            'prediction': self.predict_column,
+        }
+        breaks = self.get_scorecard_breaks()
+        if breaks is not None:
+            # Profile tính WOE bằng breaks cố định -> đổi artifact thì profile cũng đổi
+            settings['woe_breaks'] = breaks.fingerprint()
+        if self.sketch_enabled:
+            settings['quantile_sketch'] = {'k': self.sketch_k}
+        fingerprint = fingerprint_frames(ref_features, ref_labels, ref_score, settings=settings)
+        cache_dir = Path(self.base_path) / self.profile_cache_dir
+        path = profile_path(cache_dir, fingerprint)
+        if path.exists():
+            print(f"  Reuse cached profile: {path}")
+            return str(path)
+
+        drift_bins = sketch = None
+        if self.sketch_enabled:
+            drift_bins, sketch = self.sketch_reference_bins(ref_features, ref_score)
+            sketch_path = save_sketch(sketch, cache_dir / f"reference_sketch_{fingerprint[:16]}.json")
+            print(f"  Save to: {sketch_path}")
+        if ref_df is None:
+            ref_df = self.build_aligned_frame(ref_features, labels_df=ref_labels, score_df=ref_score)
+        profile = build_reference_profile(
+            ref_df,
+            numeric_features=self.numerical_columns,
+            categorical_features=self.categorical_columns,
+            target_column=self.target_column,
+            predict_column=self.predict_column,
+            fingerprint=fingerprint,
+            breaks=breaks,
+            drift_bins=drift_bins,
+            sketch=sketch,
+            # Cùng tập dòng với stage Scorecard Health / Performance -> profile cho cùng IV / AUC
+            labeled_df=self.labeled_frame(ref_df, 'reference', 'Reference Profile'),
+        )
+        path = save_reference_profile(profile, cache_dir)
+        print(f"  Save to: {path}")
+        return path
+
+    def sketch_reference_bins(self, ref_features: pd.DataFrame, ref_score: pd.DataFrame):
+        """
+        Drift bins của reference (features + prediction) từ quantile sketch, duyệt các frame
+        được truyền vào (cùng dữ liệu với fingerprint của profile) theo chunk
+        (baseline.quantile_sketch.chunk_rows) hai lần: sketch -> edges, rồi đếm counts.
+        Không sort toàn bộ cột; reference vẫn nằm trong bộ nhớ.
+        Return (bins, FrameSketch của features).
+        """
+        rows = self.sketch_chunk_rows
+
+        def batches(df):
+            return lambda: (df.iloc[start:start + rows] for start in range(0, len(df), rows))
+
+        bins, sketch = stream_fit_bins(
+            batches(ref_features), self.numerical_columns, self.categorical_columns, k=self.sketch_k,
+        )
+        score_bins, _ = stream_fit_bins(batches(ref_score), [self.predict_column], k=self.sketch_k)
+        bins.update(score_bins)
+        errors = [sk.rank_error() for sk in sketch.numeric.values()]
+        print(f"  Quantile sketch: {sketch.n_rows} rows | k={self.sketch_k} | "
+              f"rank error ~ {max(errors, default=0.0):.4f} (1 std) | {len(json.dumps(sketch.to_dict())) / 1e3:.1f} KB")
+        return bins, sketch
+
     def check_data_quality(
         self, 
-        cur_features: pd.DataFrame, 
-        ref_features: pd.DataFrame,
-        period: str
+        cur_features: Optional[pd.DataFrame] = None, 
+        ref_features: Optional[pd.DataFrame] = None,
+        period: Optional[str] = None,
+        cur_df: Optional[pd.DataFrame] = None,
+        ref_df: Optional[pd.DataFrame] = None,
     ) -> Dict:
         """
-        Kiểm tra chất lượng dữ liệu (chỉ cần features):
-        - Missing values
-        - Duplicates
-        - Out-of-range values
-        - Constant columns
+        Kiểm tra chất lượng dữ liệu (chỉ cần features), một pass mỗi cột (DataProfilePreset):
+        - Missing values (theo cột + cả dataset), empty rows
+        - Duplicated rows
+        - Constant columns, số giá trị distinct (HyperLogLog khi frame lớn)
+        - Min / max / mean / std / quantiles cột numeric (so với reference)
+
+        cur_df / ref_df: frame đã ghép sẵn (build_aligned_frame); chỉ các cột features được dùng.
         """
         print(f"▶ Data Quality Check...")
-        from evidently import Report
-        from evidently.metrics import (
-            DatasetMissingValueCount, EmptyRowsCount, 
-            DuplicatedRowCount, ConstantColumnsCount,
-            ColumnCorrelationMatrix,ColumnCorrelations,
-            DatasetCorrelations,
-        )
-        from evidently.presets import DataSummaryPreset
-
         # Convert to Evidently Dataset
-        cur_dataset = self._to_evidently_dataset(cur_features)
-        ref_dataset = self._to_evidently_dataset(ref_features)
+        # Frame ghép sẵn có thêm target / prediction -> bỏ ra để ColumnCount, duplicates... chỉ tính trên features
+        label_cols = (self.target_column, self.predict_column)
+        cur_dataset = self._to_evidently_dataset(cur_features if cur_df is None else cur_df, exclude_columns=label_cols)
+        ref_dataset = self._to_evidently_dataset(ref_features if ref_df is None else ref_df, exclude_columns=label_cols)
 
         report = Report([
-            DatasetMissingValueCount(),
-            DuplicatedRowCount(),
-            EmptyRowsCount(),
-            ConstantColumnsCount(),
-            DataSummaryPreset(),
-            DatasetCorrelations(),
+            DataProfilePreset(plot_budget=self.plot_budget),
         ],
-        include_tests=True
+        include_tests=True,
+        metadata=self._report_metadata(),
         )
-        
+
         ev = report.run(cur_dataset, ref_dataset)
-        result_json = ev.json()
         
         period_dir = Path(self.base_path) / self.output_dir / period
         period_dir.mkdir(parents=True, exist_ok=True)
         report_path = str(period_dir / f"{self.model_name}_{period}_data_quality.html")
         
-        ev.save_html(report_path)
-        print(f"  Save to: {report_path}")
+        rendered, report_path = self._save_report(ev, report_path, 'Data Quality')
 
-        return result_json, ev, report_path
+        return self._stage_records('data_quality', ev, rendered), rendered, report_path
     
     def detect_drift(
         self, 
-        cur_features: pd.DataFrame, 
-        ref_features: pd.DataFrame,
-        cur_score: pd.DataFrame,
-        ref_score: pd.DataFrame,
-        period: str
+        cur_features: Optional[pd.DataFrame] = None, 
+        ref_features: Optional[pd.DataFrame] = None,
+        cur_score: Optional[pd.DataFrame] = None,
+        ref_score: Optional[pd.DataFrame] = None,
+        period: Optional[str] = None,
+        reference_profile: Optional[str] = None,
+        cur_df: Optional[pd.DataFrame] = None,
+        ref_df: Optional[pd.DataFrame] = None,
     ) -> Dict:
         """
         Phát hiện Drift (cần features + score + timestamp):
-        - Numeric features: KS test hoặc Wasserstein
-        - Categorical: Chi-square hoặc PSI
+        - Numeric features: PSI, KS hoặc Wasserstein
+        - Categorical: PSI
         - Score drift: PSI
+        - PSI theo (feature x timestamp): heatmap (drift.feature_heatmap)
         - Sử dụng timestamp_column để chia theo thời gian (không theo index)
+
+        Feature drift tính bằng drift_engine cho mọi cột trong một pass (FeatureDriftPreset,
+        threshold theo drift.thresholds, bins reference lấy từ reference profile nếu có);
+        method khác (vd. chisquare, jensenshannon) -> DataDriftPreset của Evidently.
         """
         print(f"▶ Drift Detection...")
         
-        # Merge features + score (timestamp_column sẽ được merge cùng nếu có trong score)
-        cur_df = self._merge_dataframes(cur_features, score_df=cur_score)
-        ref_df = self._merge_dataframes(ref_features, score_df=ref_score)
+        # Merge features + score nếu chưa có frame ghép sẵn
+        if cur_df is None:
+            cur_df = self.build_aligned_frame(cur_features, score_df=cur_score)
+        if ref_df is None:
+            ref_df = self.build_aligned_frame(ref_features, score_df=ref_score)
 
         cur_dataset = self._to_evidently_dataset(cur_df, include_prediction=True, include_timestamp=True)
         ref_dataset = self._to_evidently_dataset(ref_df, include_prediction=True, include_timestamp=True)
         # print(f"cur_dataset: {cur_dataset.as_dataframe().head()}")
         drift_config = self.config['drift']
+        num_method = drift_config['method_numeric']
+        cat_method = drift_config['method_categorical']
+        thresholds = drift_config.get('thresholds') or {}
+        method_thresholds = {
+            'psi': thresholds.get('psi_feature'),
+            'ks': thresholds.get('ks_feature'),
+            'wasserstein': thresholds.get('wasserstein_feature'),
+        }
         
+        # Feature Drift
+        if num_method in SUPPORTED_METHODS and cat_method == 'psi':
+            feature_drift = FeatureDriftPreset(
+                columns=[*self.numerical_columns, *self.categorical_columns],
+                num_method=num_method,
+                cat_method=cat_method,
+                num_threshold=method_thresholds[num_method],
+                cat_threshold=method_thresholds[cat_method],
+                psi_threshold=method_thresholds['psi'],
+                drift_share=thresholds.get('dataset_drift_share', 0.5),
+                plot_budget=self.plot_budget,
+                include_tests=True,
+            )
+        else:
+            feature_drift = DataDriftPreset(
+                columns=[*self.numerical_columns, *self.categorical_columns],
+                num_method=num_method,
+                cat_method=cat_method,
+                include_tests=True
+            )
+
         # Build metrics list
         metrics = [
             
             MyValueDrift_2(
                 column=self.predict_column, 
                 method="psi", 
-                timestamp_column=self.timestamp_column
-            ),
-            # Feature Drift
-            DataDriftPreset(
-                columns=[*self.numerical_columns, *self.categorical_columns],
-                num_method=drift_config['method_numeric'],
-                cat_method=drift_config['method_categorical'],
-                include_tests=True
+                timestamp_column=self.timestamp_column,
+                plot_budget=self.plot_budget,
             ),
+            feature_drift,
             ]
+        # PSI (feature x timestamp) trong một pass, vẽ thành một heatmap
+        if drift_config.get('feature_heatmap', True) and self.timestamp_column:
+            metrics.append(FeatureDriftHeatmap(
+                timestamp_column=self.timestamp_column,
+                columns=[*self.numerical_columns, *self.categorical_columns],
+                threshold=method_thresholds['psi'],
+                plot_budget=self.plot_budget,
+            ))
         
-        report = Report(metrics, include_tests=True)
+        report = Report(metrics, include_tests=True, metadata=self._report_metadata(reference_profile))
         
         ev = report.run(current_data=cur_dataset, reference_data=ref_dataset)
         
         period_dir = Path(self.base_path) / self.output_dir / period
         period_dir.mkdir(parents=True, exist_ok=True)
         drift_html_path = str(period_dir / f"{self.model_name}_{period}_drift.html")
-        ev.save_html(drift_html_path)
-        print(f"  Save to: {drift_html_path}")
+        rendered, drift_html_path = self._save_report(ev, drift_html_path, 'Data and Score Drift')
      
-        return ev.json(), ev, drift_html_path
+        return self._stage_records('drift', ev, rendered), rendered, drift_html_path
     
     def evaluate_performance(
         self, 
-        cur_labels: pd.DataFrame, 
-        ref_labels: pd.DataFrame,
-        cur_score: pd.DataFrame,
-        ref_score: pd.DataFrame,
-        period: str
+        cur_labels: Optional[pd.DataFrame] = None, 
+        ref_labels: Optional[pd.DataFrame] = None,
+        cur_score: Optional[pd.DataFrame] = None,
+        ref_score: Optional[pd.DataFrame] = None,
+        period: Optional[str] = None,
+        reference_profile: Optional[str] = None,
+        cur_df: Optional[pd.DataFrame] = None,
+        ref_df: Optional[pd.DataFrame] = None,
     ) -> Dict:
         """
         Đánh giá performance (cần labels + score):
@@ -262,41 +580,216 @@ class GenericModelMonitor:
         """
         print(f"▶ Performance Evaluation...")
         
-        # Merge labels + score
-        cur_df = cur_labels.copy()
-        cur_df[self.predict_column] = cur_score[self.predict_column].values
-        
-        ref_df = ref_labels.copy()
-        ref_df[self.predict_column] = ref_score[self.predict_column].values
+        # Merge labels + score theo key nếu chưa có frame ghép sẵn
+        if cur_df is None:
+            cur_df = self.build_aligned_frame(cur_labels, score_df=cur_score)
+        if ref_df is None:
+            ref_df = self.build_aligned_frame(ref_labels, score_df=ref_score)
+        cur_df = self.labeled_frame(cur_df, 'current', 'Performance')
+        ref_df = self.labeled_frame(ref_df, 'reference', 'Performance')
         
         # Convert to Evidently Dataset
         cur_dataset = self._to_evidently_dataset(cur_df, include_target=True, include_prediction=True)
         ref_dataset = self._to_evidently_dataset(ref_df, include_target=True, include_prediction=True)
          
+        # Confidence interval cho current; test FAIL khi giá trị reference nằm ngoài CI
+        ci_config = (self.config.get('performance') or {}).get('confidence_interval') or {}
+        ci = dict(
+            ci_method=ci_config.get('method'),
+            ci_level=ci_config.get('level', 0.95),
+            n_resamples=ci_config.get('n_resamples', 1000),
+        )
+        
         report = Report([
-            AUCMetric(true_column=self.target_column, pred_column=self.predict_column),
-            GiniMetric(true_column=self.target_column, pred_column=self.predict_column),
-            KSMetric(true_column=self.target_column, pred_column=self.predict_column),
+            AUCMetric(true_column=self.target_column, pred_column=self.predict_column, **ci),
+            GiniMetric(true_column=self.target_column, pred_column=self.predict_column, **ci),
+            KSMetric(true_column=self.target_column, pred_column=self.predict_column,
+                     plot_budget=self.plot_budget, **ci),
         ],
-        # include_tests=True
+        include_tests=ci['ci_method'] is not None,
+        metadata=self._report_metadata(reference_profile),
         )
         ev = report.run(cur_dataset, ref_dataset)
         
         period_dir = Path(self.base_path) / self.output_dir / period
         period_dir.mkdir(parents=True, exist_ok=True)
         perf_html_path = str(period_dir / f"{self.model_name}_{period}_evaluate_performance.html")
-        ev.save_html(perf_html_path)
-        print(f"  Save to: {perf_html_path}")
-    
-        return ev.json(), ev, perf_html_path
+        rendered, perf_html_path = self._save_report(ev, perf_html_path, 'Model Performance')
     
+        return self._stage_records('performance', ev, rendered), rendered, perf_html_path
+
+    def evaluate_performance_streaming(
+        self,
+        side: str = 'current',
+        period: Optional[str] = None,
+        period_end: Optional[str] = None,
+        n_bins: int = 10_000,
+        score_range: tuple = (0.0, 1.0),
+        batch_size: int = 500_000,
+    ) -> StreamingDiscrimination:
+        """
+        AUC / Gini / KS cho bảng score lớn hơn RAM: đọc labels + score theo chunk
+        (Parquet row groups) từ path trong config, cộng dồn histogram score theo class.
+        Bộ nhớ cố định theo n_bins; kết quả kèm auc_error_bound / ks_error_bound
+        (xem StreamingDiscrimination).
+        """
+        print(f"▶ Performance Evaluation (streaming, {side})...")
+        batches = iter_score_batches(self.config, side, period=period, period_end=period_end, batch_size=batch_size)
+        result = stream_discrimination(
+            batches, self.target_column, self.predict_column, n_bins=n_bins, score_range=score_range
+        )
+        print(f"  rows={result.n_rows} | AUC={result.auc:.4f} (±{result.auc_error_bound:.2e}) | "
+              f"Gini={result.gini:.4f} | KS={result.ks:.4f} (+{result.ks_error_bound:.2e})")
+        return result
+
+    def get_accumulator_store(self, reference_profile: str) -> Tuple[AccumulatorSpec, AccumulatorStore]:
+        """Spec (bins cố định theo reference profile / breaks artifact) và store tương ứng."""
+        breaks = self.get_scorecard_breaks()
+        spec = spec_from_profile(
+            reference_profile,
+            target_column=self.target_column,
+            predict_column=self.predict_column,
+            woe_breaks=breaks.breaks if breaks is not None else None,
+            score_bins=self.score_bins,
+        )
+        return spec, AccumulatorStore(Path(self.base_path) / self.accumulator_dir, spec.spec_id)
+
+    def accumulate_period(
+        self,
+        period: str,
+        reference_profile: str,
+        cur_df: Optional[pd.DataFrame] = None,
+    ) -> str:
+        """
+        Cập nhật accumulator của một ngày (period YYYYMMDD): quét dữ liệu ngày đó MỘT lần,
+        lưu counts drift / WOE / score. Chạy lại cùng ngày sẽ ghi đè (vd. khi labels về muộn).
+        """
+        print(f"▶ Accumulate Counts ({period})...")
+        if cur_df is None:
+            cur_features, cur_labels, cur_score = load_monitoring_data(
+                self.config, 'current', period=period, base_path=self.base_path
+            )
+            cur_df = self.build_aligned_frame(cur_features, labels_df=cur_labels, score_df=cur_score)
+        spec, store = self.get_accumulator_store(reference_profile)
+        path = store.save(accumulate(spec, cur_df, period))
+        print(f"  Save to: {path}")
+        return path
+
+    def accumulate_current(self, reference_profile: str, cur_df: pd.DataFrame) -> List[str]:
+        """
+        Accumulator cho từng ngày có trong cur_df (theo timestamp_column), mỗi ngày quét MỘT lần;
+        ngày đã có bị ghi đè. Run sau dùng làm reference kỳ trước / trailing (compare_references)
+        và rolling_metrics. Return danh sách ngày đã ghi.
+        """
+        print(f"▶ Accumulate Counts (current)...")
+        keys = day_keys(cur_df[self.timestamp_column])
+        spec, store = self.get_accumulator_store(reference_profile)
+        days = []
+        for day, idx in keys.groupby(keys).indices.items():
+            store.save(accumulate(spec, cur_df.iloc[idx], day))
+            days.append(day)
+        if days:
+            print(f"  {len(days)} day(s) {days[0]}..{days[-1]} | Save to: {store.directory}")
+        n_unknown = int(keys.isna().sum())
+        if n_unknown:
+            print(f"  ⚠ {n_unknown} rows without a valid {self.timestamp_column} not accumulated")
+        return days
+
+    def rolling_metrics(
+        self,
+        reference_profile: str,
+        end_period: Optional[str] = None,
+        days: Optional[int] = None,
+        month: Optional[str] = None,
+    ) -> Dict:
+        """
+        Drift / IV / KS-AUC cho cả tháng (month=YYYYMM) hoặc rolling `days` ngày kết thúc tại
+        end_period (mặc định accumulators.rolling_days), chỉ cộng counts đã lưu.
+        Return dict: periods, n_rows, drift (DataFrame), iv (DataFrame), performance (StreamingDiscrimination | None)
+        """
+        spec, store = self.get_accumulator_store(reference_profile)
+        if month is not None:
+            print(f"▶ Monthly Metrics from Accumulators ({month})...")
+            acc = store.month(month)
+        else:
+            days = days or self.rolling_days
+            print(f"▶ Rolling Metrics from Accumulators ({days} days to {end_period})...")
+            acc = store.window(end_period, days=days)
+        performance = acc.score.result() if acc.score is not None else None
+        print(f"  Periods: {len(acc.periods)} | rows: {acc.n_rows}")
+        return {
+            'periods': acc.periods,
+            'n_rows': acc.n_rows,
+            'drift': drift_table(spec, acc),
+            'iv': iv_table(acc),
+            'performance': performance,
+        }
+
+    def compare_references(
+        self,
+        reference_profile: str,
+        period: str,
+        cur_df: Optional[pd.DataFrame] = None,
+        previous: bool = True,
+        trailing: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """
+        Drift của current so với nhiều reference trong một lần: baseline (reference profile),
+        kỳ trước (previous) và `trailing` kỳ gần nhất. Period dạng YYYYMM / YYYYMMDD -> kỳ theo
+        lịch (AccumulatorStore.previous: tháng trước / ngày trước, kể cả khi current thiếu ngày
+        cuối tháng); period khác -> theo khoảng ngày thực của current (min..max timestamp_column,
+        cùng số ngày, xem AccumulatorStore.preceding).
+        Current được gán bin + đếm một lần; reference kỳ trước / trailing cộng từ accumulators
+        đã lưu (accumulate_current / accumulate_period), không đọc lại raw rows. Reference chưa có
+        accumulator nào bị bỏ qua.
+        Return DataFrame dài [reference, column, n_rows, n_reference, psi, ks, ks_pvalue, wasserstein]
+        """
+        print(f"▶ Drift vs References ({period})...")
+        if cur_df is None:
+            cur_features, cur_labels, cur_score = load_monitoring_data(
+                self.config, 'current', period=period, base_path=self.base_path
+            )
+            cur_df = self.build_aligned_frame(cur_features, labels_df=cur_labels, score_df=cur_score)
+        spec, store = self.get_accumulator_store(reference_profile)
+        period = str(period)
+        if period.isdigit() and len(period) in (6, 8):
+            start, end = period_bounds(period)
+        else:
+            days = day_keys(cur_df[self.timestamp_column]).dropna() if self.timestamp_column in cur_df.columns else None
+            if days is None or not len(days):
+                raise ValueError(
+                    f"Period '{period}' is not YYYYMM / YYYYMMDD and current has no {self.timestamp_column}"
+                )
+            start, end = days.min(), days.max()
+        print(f"  Current: {pd.Timestamp(start):%Y%m%d}..{pd.Timestamp(end):%Y%m%d}")
+
+        windows = {}
+        if previous:
+            windows['previous'] = 1
+        if trailing:
+            windows[f'trailing_{trailing}'] = trailing
+        references = {'baseline': None}
+        for name, n_periods in windows.items():
+            acc = store.preceding(start, end, n_periods)
+            if not acc.periods:
+                print(f"  ⚠ Skip reference '{name}': no stored accumulator before {pd.Timestamp(start):%Y%m%d}")
+                continue
+            print(f"  {name}: {len(acc.periods)} period(s) {acc.periods[0]}..{acc.periods[-1]} | rows: {acc.n_rows}")
+            references[name] = acc
+
+        with_pvalue = self.config['drift']['method_numeric'] == 'ks'
+        return reference_drift_table(spec, cur_df, references, with_pvalue=with_pvalue)
+
     def evaluate_scorecard_health(
         self, 
-        cur_features: pd.DataFrame, 
-        ref_features: pd.DataFrame,
-        cur_labels: pd.DataFrame,
-        ref_labels: pd.DataFrame,
-        period: str
+        cur_features: Optional[pd.DataFrame] = None, 
+        ref_features: Optional[pd.DataFrame] = None,
+        cur_labels: Optional[pd.DataFrame] = None,
+        ref_labels: Optional[pd.DataFrame] = None,
+        period: Optional[str] = None,
+        reference_profile: Optional[str] = None,
+        cur_df: Optional[pd.DataFrame] = None,
+        ref_df: Optional[pd.DataFrame] = None,
     ) -> Dict:
         """
         Kiểm tra sức khỏe scorecard (cần features + labels):
@@ -306,9 +799,13 @@ class GenericModelMonitor:
         """
         print(f"▶ Scorecard Health Check...")
         
-        # Merge features + labels
-        cur_df = self._merge_dataframes(cur_features, labels_df=cur_labels)
-        ref_df = self._merge_dataframes(ref_features, labels_df=ref_labels)
+        # Merge features + labels nếu chưa có frame ghép sẵn
+        if cur_df is None:
+            cur_df = self.build_aligned_frame(cur_features, labels_df=cur_labels)
+        if ref_df is None:
+            ref_df = self.build_aligned_frame(ref_features, labels_df=ref_labels)
+        cur_df = self.labeled_frame(cur_df, 'current', 'Scorecard Health')
+        ref_df = self.labeled_frame(ref_df, 'reference', 'Scorecard Health')
         
         # Convert to Evidently Dataset
         cur_dataset = self._to_evidently_dataset(cur_df, include_target=True)
@@ -322,22 +819,33 @@ class GenericModelMonitor:
             IVSummaryMetric(
                 numeric_features=self.numerical_columns,
                 categorical_features=self.categorical_columns,
-                target_column=self.target_column),
+                target_column=self.target_column,
+                breaks_artifact=self.breaks_artifact,
+                breaks_artifact_version=self.breaks_artifact_version,
+                plot_budget=self.plot_budget),
             BasicWOEMetric(
                 features=self.numerical_columns + self.categorical_columns,
-                target_column=self.target_column),
+                target_column=self.target_column,
+                breaks_artifact=self.breaks_artifact,
+                breaks_artifact_version=self.breaks_artifact_version,
+                plot_budget=self.plot_budget),
         ],
         # include_tests=True
+        metadata=self._report_metadata(reference_profile),
         )
         ev = report.run(cur_dataset, ref_dataset)
         
         period_dir = Path(self.base_path) / self.output_dir / period
         period_dir.mkdir(parents=True, exist_ok=True)
         perf_html_path = str(period_dir / f"{self.model_name}_{period}_default_rate_iv_woe.html")
-        ev.save_html(perf_html_path)
-        print(f"  Save to: {perf_html_path}")
-        
-        return ev.json(), ev, perf_html_path
+        rendered, perf_html_path = self._save_report(ev, perf_html_path, 'Scorecard Health')
+
+        # IV theo feature (cùng bins với Mean_IV / WOE của report) -> features của stage
+        records = self._stage_records('scorecard', ev, rendered)
+        feature_iv = get_feature_iv(ev.context)
+        if feature_iv is not None:
+            records.features = feature_iv_records(feature_iv)
+        return records, rendered, perf_html_path
 
 
     def combine_html_reports(self, html_paths: List[str], period: str) -> str:
@@ -374,6 +882,122 @@ class GenericModelMonitor:
         print("Save to ", output_html_path)
         return output_html_path
     
+    def _report_metadata(self, reference_profile: Optional[str] = None) -> Dict[str, str]:
+        # Custom metrics đọc report_mode từ metadata của Report (metrics_only -> không dựng widget)
+        # và path reference profile (không truyền vào metric -> không nằm trong metric_id / metric_name)
+        metadata = {'report_mode': self.report_mode}
+        if reference_profile:
+            metadata['reference_profile'] = str(reference_profile)
+        return metadata
+
+    def _save_report(self, ev, html_path: str, title: str) -> Tuple[Optional[RenderedReport], Optional[str]]:
+        """
+        Render report một lần (dùng lại cho file combined) và ghi file HTML của stage.
+        Chế độ dashboard: ghi payload của report + trang một tab (payload dùng chung với file combined).
+        Chế độ metrics_only: không render, không ghi file -> (None, None).
+        """
+        if self.report_mode == METRICS_ONLY:
+            return None, None
+        report = render_snapshot(ev)
+        self._check_report_size(report, title)
+        if self.report_mode == 'dashboard':
+            write_payload(report, html_path, gzip=self.dashboard_gzip)
+            write_dashboard(html_path, [(title, report)], Path(self.base_path) / self.assets_dir, gzip=self.dashboard_gzip)
+        else:
+            write_html(html_path, standalone_html(report))
+        print(f"  Save to: {html_path}")
+        return report, html_path
+
+    def _check_report_size(self, report: RenderedReport, title: str) -> None:
+        """In size của dashboard + widget nặng nhất; cảnh báo khi vượt report_budget.max_report_bytes."""
+        if not report.widget_bytes:
+            return
+        metric, widget_title, _, largest = max(report.widget_bytes, key=lambda w: w[3])
+        name = metric if widget_title in ("", metric) else f"{metric} / {widget_title}"
+        print(f"  Report size: {report.size_bytes / 1e6:.2f} MB (largest widget: {name}: {largest / 1e6:.2f} MB)")
+        if self.max_report_bytes and report.size_bytes > self.max_report_bytes:
+            print(f"  ⚠ {title}: report size {report.size_bytes / 1e6:.2f} MB > "
+                  f"report_budget.max_report_bytes ({self.max_report_bytes / 1e6:.2f} MB)")
+
+    def _stage_records(self, stage: str, ev, rendered: Optional[RenderedReport] = None) -> StageRecords:
+        """Metrics / tests của một stage lấy thẳng từ Snapshot (không qua ev.json()) + bytes theo widget."""
+        records = stage_records(
+            stage, ev,
+            performance_config=self.config.get('performance'),
+            psi_threshold=(self.config.get('drift') or {}).get('thresholds', {}).get('psi_feature'),
+        )
+        if rendered is not None:
+            records.widgets = [WidgetRecord(stage, *widget) for widget in rendered.widget_bytes]
+        return records
+
+    def _run_stages(self, stages: List[tuple], parallel: bool, max_workers: int) -> Dict:
+        """
+        Chạy các stage (key, method_name, kwargs) tuần tự hoặc song song trên process pool.
+        Trả về dict key -> (records, report, html_path), giữ đúng thứ tự của `stages`
+        (report: RenderedReport; report.snapshot chỉ có ở chế độ tuần tự).
+        Ở chế độ song song, stage bị lỗi được log và trả về None thay vì raise.
+        """
+        if not parallel or len(stages) <= 1:
+            return {key: getattr(self, method_name)(**kwargs) for key, method_name, kwargs in stages}
+
+        print(f"\n▶ Running {len(stages)} stages in parallel (max_workers={max_workers})...")
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(stages))) as pool:
+            futures = [
+                (key, pool.submit(_run_stage_in_worker, self, method_name, kwargs))
+                for key, method_name, kwargs in stages
+            ]
+            # Gom kết quả theo thứ tự stages (không theo thứ tự hoàn thành)
+            results = {}
+            for key, future in futures:
+                try:
+                    status, payload = future.result()
+                except Exception:
+                    status, payload = "error", traceback.format_exc()
+                if status == "ok":
+                    results[key] = payload
+                    print(f"  [{key}] Save to: {payload[2]}" if payload[2] else f"  [{key}] Done (metrics only)")
+                else:
+                    results[key] = None
+                    print(f"  [{key}] FAILED:\n{payload}")
+        return results
+
+    def persist_metrics(self, result: MonitoringResult) -> Dict[str, int]:
+        """
+        Ghi metrics / features của `result` (run_monitoring) vào output.db_connection theo
+        score_model_daily / score_feature_daily, idempotent theo (model, period).
+        Return số rows đã ghi theo bảng.
+        """
+        print(f"▶ Persist Metrics...")
+        sink = get_metrics_sink(self.db_connection, self.table_metrics, self.table_feature_metrics)
+        written = sink.write(
+            self.model_name, result.period, result.metrics_frame(), result.features_frame(),
+            data_reference_id=f"{self.model_name}_{self.config['model'].get('baseline_id', 'reference')}",
+            data_current_id=f"{self.model_name}_{result.period}",
+        )
+        for table, n_rows in written.items():
+            print(f"  Save to: {table} ({n_rows} rows)")
+        return written
+
+    def render_result(self, result: Optional[MonitoringResult] = None, period: Optional[str] = None) -> str:
+        """
+        HTML tóm tắt từ kết quả đã có, không chạy lại Evidently (vd. sau một run metrics_only):
+        `result` trả về từ run_monitoring, hoặc `period` -> đọc Parquet đã lưu trong folder của period.
+        Ghi <period>/<model>_<period>_summary.html (dashboard nếu report_mode = dashboard).
+        """
+        print(f"▶ Summary report...")
+        if result is None:
+            period_dir = Path(self.base_path) / self.output_dir / str(period)
+            result = read_parquet(period_dir, self.model_name, str(period))
+        period_dir = Path(self.base_path) / self.output_dir / str(result.period)
+        html_path = str(period_dir / f"{self.model_name}_{result.period}_summary.html")
+        report = render_result(result, budget=self.plot_budget)
+        if self.report_mode == 'dashboard':
+            write_dashboard(html_path, [('Summary', report)], Path(self.base_path) / self.assets_dir, gzip=self.dashboard_gzip)
+        else:
+            write_html(html_path, standalone_html(report))
+        print(f"  Save to: {html_path}")
+        return html_path
+
     def run_monitoring(
         self, 
         period: str,
@@ -389,7 +1013,14 @@ class GenericModelMonitor:
         data_quality: bool = True,
         drift: bool = True,
         performance: bool = True,
-        scorecard: bool = True
+        scorecard: bool = True,
+        use_reference_profile: bool = True,
+        reference_profile: Optional[str] = None,
+        parallel: Optional[bool] = None,
+        max_workers: Optional[int] = None,
+        ref_df: Optional[pd.DataFrame] = None,
+        persist_metrics: Optional[bool] = None,
+        accumulate_current: Optional[bool] = None,
     ):
         """
         Chạy toàn bộ monitoring pipeline cho 1 period.
@@ -406,6 +1037,19 @@ class GenericModelMonitor:
             drift: Chạy Drift Detection report (cần features + score)
             performance: Chạy Performance Evaluation report (cần labels + score)
             scorecard: Chạy Scorecard Health report (cần features + labels)
+            use_reference_profile: Dùng reference profile đã cache thay vì tính lại trên reference
+            reference_profile: Path tới profile đã có sẵn (vd. từ backfill) -> không hash lại reference
+            parallel: Chạy 4 stage song song trên process pool (None -> theo config `execution.mode`)
+            max_workers: Số process tối đa (None -> theo config `execution.max_workers`)
+            ref_df: Reference đã ghép sẵn (build_aligned_frame), vd. dùng chung cho nhiều period
+            persist_metrics: Ghi metrics vào output.db_connection (None -> theo config `output.persist_metrics`)
+            accumulate_current: Ghi accumulator từng ngày của current (None -> theo config
+                `accumulators.write_current`), cần reference profile + timestamp_column
+
+        Return:
+            MonitoringResult: metrics / drift + IV theo feature / tests của period, html_path = report
+            đã combine (hoặc folder của period nếu không combine; None ở chế độ metrics_only, kết
+            quả được lưu Parquet trong folder của period, HTML dựng sau bằng render_result)
         """
         print(f"\n{'='*70}")
         print(f"MODEL: {self.model_name} | PERIOD: {period}")
@@ -419,104 +1063,139 @@ class GenericModelMonitor:
         print(f"  Reference - features: {ref_features.shape}, labels: {ref_labels.shape}, score: {ref_score.shape}")
         print(f"  Current   - features: {cur_features.shape}, labels: {cur_labels.shape}, score: {cur_score.shape}")
         
-        # Initialize variables
-        ev_1 = ev_2 = ev_3 = ev_4 = None
+        # Ghép features + labels + score MỘT lần cho mỗi phía, mọi stage dùng chung
+        cur_df = self.build_aligned_frame(cur_features, labels_df=cur_labels, score_df=cur_score)
+        if ref_df is None:
+            ref_df = self.build_aligned_frame(ref_features, labels_df=ref_labels, score_df=ref_score)
+
+        # 0. Reference profile (tính một lần, cache theo content hash)
+        if not use_reference_profile:
+            reference_profile = None
+        elif reference_profile is None and (drift or scorecard or performance):
+            reference_profile = self.get_reference_profile(ref_features, ref_labels, ref_score, ref_df=ref_df)
         
+        stages = []
         # 1. Data Quality (chỉ cần features)
         if data_quality:
-            dq_result, ev_1, html_1 = self.check_data_quality(
-                cur_features=cur_features, 
-                ref_features=ref_features, 
+            stages.append(('data_quality', 'check_data_quality', dict(
+                cur_df=cur_df, 
+                ref_df=ref_df, 
                 period=period
-            )
+            )))
         
         # 2. Drift Detection (cần features + score)
         if drift:
-            drift_result, ev_2, html_2 = self.detect_drift(
-                cur_features=cur_features, 
-                ref_features=ref_features,
-                cur_score=cur_score,
-                ref_score=ref_score,
-                period=period
-            )
+            stages.append(('drift', 'detect_drift', dict(
+                cur_df=cur_df, 
+                ref_df=ref_df,
+                period=period,
+                reference_profile=reference_profile,
+            )))
         
         # 3. Scorecard Health (cần features + labels)
         if scorecard:
-            scorecard_result, ev_3, html_3 = self.evaluate_scorecard_health(
-                cur_features=cur_features,
-                ref_features=ref_features,
-                cur_labels=cur_labels,
-                ref_labels=ref_labels,
-                period=period
-            )
+            stages.append(('scorecard', 'evaluate_scorecard_health', dict(
+                cur_df=cur_df,
+                ref_df=ref_df,
+                period=period,
+                reference_profile=reference_profile,
+            )))
         
         # 4. Performance Evaluation (cần labels + score)
         if performance:
-            perf_result, ev_4, html_4 = self.evaluate_performance(
-                cur_labels=cur_labels,
-                ref_labels=ref_labels,
-                cur_score=cur_score,
-                ref_score=ref_score,
-                period=period
-            )
+            stages.append(('performance', 'evaluate_performance', dict(
+                cur_df=cur_df,
+                ref_df=ref_df,
+                period=period,
+                reference_profile=reference_profile,
+            )))
+
+        if parallel is None:
+            parallel = self.execution_mode == 'process'
+        results = self._run_stages(stages, parallel, max_workers or self.max_workers)
+        reports = [
+            results[key][1] if results.get(key) is not None else None
+            for key in ('data_quality', 'drift', 'scorecard', 'performance')
+        ]
         
-        # Combine all reports if all flags are True
-        if all([data_quality, drift, performance, scorecard]):
-            ev_html1 = get_html_from_evidently(ev_1)
-            ev_html2 = get_html_from_evidently(ev_2)
-            ev_html3 = get_html_from_evidently(ev_3)
-            ev_html4 = get_html_from_evidently(ev_4)
-            format_html_path = r'D:\WORK_F88\Tracy\Projects\001_evidently_monitor_observation\src\monitoring\format.html'
-       
-            new_content = f"""
-            <div class="tab">
-            <button class="tablinks active" onclick="openTab(event, 'tab1')">Overview</button>
-            <button class="tablinks" onclick="openTab(event, 'tab2')">Data and Score Drift</button>
-            <button class="tablinks" onclick="openTab(event, 'tab3')">Scorecard Health</button>
-            <button class="tablinks" onclick="openTab(event, 'tab4')">Model Performance</button>
-            </div>
-
-            <div id="tab1" class="tabcontent active">{ev_html1}</div>
-            <div id="tab2" class="tabcontent">{ev_html2}</div>
-            <div id="tab3" class="tabcontent">{ev_html3}</div>
-            <div id="tab4" class="tabcontent">{ev_html4}</div>
-            """
-
-            new_html_content = replace_html_content(format_html_path, new_content)
+        # Combine all reports if all flags are True (và không stage nào lỗi)
+        # Dùng lại report đã render của từng stage, JS bundle của Evidently chỉ nhúng một lần
+        if self.report_mode == METRICS_ONLY:
+            output_html_path = None
+            print(f"\n✅ Metrics computed (report_mode={METRICS_ONLY}, no HTML)")
+        elif all([data_quality, drift, performance, scorecard]) and all(report is not None for report in reports):
+            titles = ['Overview', 'Data and Score Drift', 'Scorecard Health', 'Model Performance']
             output_html_path = str(period_dir / f"{self.model_name}_{period}_all_model_monitoring_report_tabs.html")
-            with open(output_html_path, "w", encoding="utf-8") as f:
-                f.write(new_html_content)
+            if self.report_mode == 'dashboard':
+                write_dashboard(
+                    output_html_path, list(zip(titles, reports)),
+                    Path(self.base_path) / self.assets_dir, gzip=self.dashboard_gzip,
+                )
+            else:
+                write_html(output_html_path, tabbed_html(list(zip(titles, reports))))
             print(f"\n✅ Combined report saved to: {output_html_path}")
         else:
             output_html_path = str(period_dir)
             print(f"\n✅ Individual reports saved to: {output_html_path}")
+
+        result = MonitoringResult(self.model_name, period, html_path=output_html_path)
+        for key, value in results.items():
+            if value is None:
+                result.failed_stages.append(key)
+            else:
+                result.add_stage(value[0], html_path=value[2])
+        # Accumulator từng ngày của current -> reference kỳ trước / trailing của các run sau
+        if accumulate_current is None:
+            accumulate_current = self.write_accumulators
+        if accumulate_current and reference_profile is not None and self.timestamp_column in cur_df.columns:
+            self.accumulate_current(reference_profile, cur_df)
+
+        # Drift so với baseline / kỳ trước / trailing window (counts từ accumulators, current bin một lần)
+        references_config = self.config['drift'].get('references') or {}
+        if drift and reference_profile is not None and (
+                references_config.get('previous') or references_config.get('trailing_periods')):
+            table = self.compare_references(
+                reference_profile, period, cur_df=cur_df,
+                previous=bool(references_config.get('previous')),
+                trailing=references_config.get('trailing_periods'),
+            )
+            thresholds = self.config['drift'].get('thresholds') or {}
+            result.add_stage(reference_drift_records(
+                table, thresholds.get('psi_feature', 0.25), thresholds.get('dataset_drift_share'),
+            ))
+
+        # Metrics-only: lưu kết quả cạnh reports của period -> render_result(period=...) dựng HTML sau
+        if self.report_mode == METRICS_ONLY:
+            for path in result.to_parquet(period_dir).values():
+                print(f"  Save to: {path}")
+
+        if persist_metrics is None:
+            persist_metrics = self.persist_metrics_enabled
+        if persist_metrics:
+            self.persist_metrics(result)
+
+        if not parallel:
+            print(f"  Dataset factory: {self.dataset_factory.summary()}")
             
-        return output_html_path
+        return result
 
 
 # ===== USAGE =====
 if __name__ == "__main__":
-    # Khởi tạo monitor
-    monitor = GenericModelMonitor(
-        r'D:\WORK_F88\Tracy\Projects\001_evidently_monitor_observation\data\dummy_data\monitoring_config.yaml'
-    )
-
-    BASE_DATA_PATH = r'D:\WORK_F88\Tracy\Projects\001_evidently_monitor_observation\data\dummy_data'
+    # Khởi tạo monitor (chạy từ thư mục project: python -m src.monitoring.pipeline;
+    # path trong config tương đối theo base_path.path = ".")
+    monitor = GenericModelMonitor('data/dummy_data/monitoring_config.yaml')
 
     # ==================== Load DataFrames riêng biệt ====================
-    # Reference data
-    ref_features = pd.read_csv(f'{BASE_DATA_PATH}/ref_all_features.csv')
-    ref_labels = pd.read_csv(f'{BASE_DATA_PATH}/ref_all_labels.csv')
-    ref_score = pd.read_csv(f'{BASE_DATA_PATH}/ref_all_score.csv')
+    # Đọc theo config (Parquet / CSV): chỉ các cột cần dùng, lọc period ngay khi đọc
+    # Reference data (baseline.reference_*)
+    ref_features, ref_labels, ref_score = load_monitoring_data(monitor.config, 'reference')
 
-    # Current data
-    cur_features = pd.read_csv(f'{BASE_DATA_PATH}/cur_all_features.csv')
-    cur_labels = pd.read_csv(f'{BASE_DATA_PATH}/cur_all_labels.csv')
-    cur_score = pd.read_csv(f'{BASE_DATA_PATH}/cur_all_score.csv')
-    ref_labels.columns = ['CUSTOMER_CODE', 'LOAN_ID', 'LABEL', 'SCORING_DATE']
+    # Current data (data.current_*), chỉ tháng 202601
+    cur_features, cur_labels, cur_score = load_monitoring_data(monitor.config, 'current', period='202601')
 
     result = monitor.run_monitoring(
-    period='20260127',
+    period='202601',
     # Reference data (3 DataFrames)
     ref_features=ref_features,
     ref_labels=ref_labels,
@@ -534,4 +1213,4 @@ if __name__ == "__main__":
     )
 
     
-    print(f"\n✅ Report saved to: {result}")
\ No newline at end of file
+    print(f"\n✅ Report saved to: {result.html_path}")
\ No newline at end of file
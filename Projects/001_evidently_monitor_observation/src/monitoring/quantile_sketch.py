@@ -0,0 +1,293 @@
+"""
+Quantile sketch (KLL) cho reference rất lớn.
+
+Bins của reference (PSI deciles, lưới KS / Wasserstein, init breaks WOE) cần quantile của
+từng cột, tức là sort toàn bộ cột. `KLLSketch` thay bằng sketch cộng dồn được:
+- item ở level h có weight 2^h; capacity của level trên cùng là k, mỗi level dưới nhỏ hơn 2/3
+  -> giữ tối đa ~3k giá trị. Level vượt capacity -> sort, chỉ compact phần vượt (các giá trị
+  lớn nhất, giữ một nửa với offset ngẫu nhiên nhưng xác định theo seed, đẩy lên level trên),
+  nên kể cả khi update một chunk rất lớn level trên cùng vẫn giữ ~k giá trị
+- `rank_error()`: ước lượng 1 độ lệch chuẩn của sai số rank chuẩn hoá, gồm sai số compact và
+  sai số lượng tử hoá của item nặng nhất (weight ~ n / 1.5k -> ~ 1 / (5k)); sai số lớn nhất
+  quan sát được khoảng 3 lần giá trị này
+- `update` theo chunk, `merge` giữa các partition (chạy song song rồi gộp), JSON nhỏ (`to_dict`)
+- min / max / mean / std chính xác; giá trị distinct đếm chính xác khi cột có ít giá trị
+  (<= distinct_limit), dùng cho cột discrete và init breaks WOE
+- khi chưa compact lần nào (n nhỏ) quantile trùng với np.quantile trên toàn bộ dữ liệu
+
+`FrameSketch`: sketch của nhiều cột một frame (numeric -> KLLSketch, categorical -> value
+counts chính xác), cũng merge / serialize được. Bins suy ra từ sketch: drift_engine.fit_sketch_bins.
+"""
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_K = 200
+# Đủ để nhận cột discrete (drift_engine.DISCRETE_MAX_UNIQUE) và init breaks WOE (< 1 / init_count_distr giá trị)
+DISTINCT_LIMIT = 64
+_CAPACITY_DECAY = 2 / 3
+
+
+class KLLSketch:
+    """Quantile sketch cộng dồn được cho một cột numeric (NaN bị bỏ qua)."""
+
+    def __init__(self, k: int = DEFAULT_K, distinct_limit: int = DISTINCT_LIMIT, seed: int = 0):
+        self.k = int(k)
+        self.distinct_limit = int(distinct_limit)
+        self.seed = int(seed)
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self.n = 0
+        self.min = np.nan
+        self.max = np.nan
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.distinct: Optional[Dict[float, int]] = {}
+        self.n_compactions = 0
+        self._variance = 0.0  # tổng phương sai sai số rank (đơn vị rows) của các lần compact
+
+    # ---- cập nhật ----
+    def update(self, values) -> "KLLSketch":
+        x = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=float)
+        x = x[~np.isnan(x)]
+        if not len(x):
+            return self
+        self._merge_moments(len(x), float(x.mean()), float(((x - x.mean()) ** 2).sum()), float(x.min()), float(x.max()))
+        if self.distinct is not None:
+            uniq, counts = np.unique(x, return_counts=True)
+            self._merge_distinct(dict(zip(uniq.tolist(), counts.tolist())))
+        self.levels[0] = np.concatenate([self.levels[0], x])
+        self._compress()
+        return self
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        if other.n == 0:
+            return self
+        self._merge_moments(other.n, other.mean, other.m2, other.min, other.max)
+        if self.distinct is not None:
+            self._merge_distinct(other.distinct)
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self._variance += other._variance
+        self.n_compactions += other.n_compactions
+        self._compress()
+        return self
+
+    def _merge_moments(self, n: int, mean: float, m2: float, lo: float, hi: float) -> None:
+        # Chan et al.: gộp mean / M2 của 2 phần
+        total = self.n + n
+        delta = mean - self.mean
+        self.m2 += m2 + delta ** 2 * self.n * n / total
+        self.mean += delta * n / total
+        self.n = total
+        self.min = lo if np.isnan(self.min) else min(self.min, lo)
+        self.max = hi if np.isnan(self.max) else max(self.max, hi)
+
+    def _merge_distinct(self, other: Optional[Dict[float, int]]) -> None:
+        if other is None:
+            self.distinct = None
+            return
+        for value, count in other.items():
+            self.distinct[value] = self.distinct.get(value, 0) + count
+        if len(self.distinct) > self.distinct_limit:
+            self.distinct = None
+
+    def _capacity(self, h: int) -> int:
+        depth = len(self.levels) - 1 - h
+        return max(2, int(np.ceil(self.k * _CAPACITY_DECAY ** depth)))
+
+    def _compress(self) -> None:
+        h = 0
+        while h < len(self.levels):
+            items = self.levels[h]
+            if len(items) <= self._capacity(h):
+                h += 1
+                continue
+            if h + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(items)
+            # Chỉ compact phần vượt capacity (các giá trị lớn nhất, số chẵn, tối thiểu nửa capacity
+            # để số lần compact không tăng theo số lần update); phần còn lại giữ ở level h
+            capacity = self._capacity(h)
+            n_compact = max(len(items) - capacity, capacity // 2)
+            n_compact = min(n_compact + n_compact % 2, len(items) - len(items) % 2)
+            keep, items = items[:len(items) - n_compact], items[len(items) - n_compact:]
+            offset = int(np.random.default_rng([self.seed, self.n_compactions]).integers(2))
+            self.levels[h] = keep
+            self.levels[h + 1] = np.concatenate([self.levels[h + 1], items[offset::2]])
+            # Query nằm trong khoảng compact: số item <= query lẻ (xác suất 1/2) -> rank lệch ±2^h
+            self._variance += float(2 ** h) ** 2 / 2
+            self.n_compactions += 1
+            h = 0
+
+    # ---- truy vấn ----
+    @property
+    def is_exact(self) -> bool:
+        return self.n_compactions == 0
+
+    @property
+    def std(self) -> float:
+        """Độ lệch chuẩn (ddof=0, như np.std)."""
+        return float(np.sqrt(self.m2 / self.n)) if self.n else np.nan
+
+    @property
+    def size(self) -> int:
+        """Số giá trị đang giữ."""
+        return int(sum(len(items) for items in self.levels))
+
+    def rank_error(self) -> float:
+        """
+        Ước lượng sai số rank chuẩn hoá (1 độ lệch chuẩn) của quantiles; 0 khi chưa compact.
+        Gồm sai số của các lần compact và sai số lượng tử hoá của item nặng nhất (weight w ->
+        rank của quantile lệch đều trong một khoảng rộng w, phương sai w^2 / 12).
+        """
+        if not self.n or self.is_exact:
+            return 0.0
+        top = max(h for h, items in enumerate(self.levels) if len(items))
+        return float(np.sqrt(self._variance + float(2 ** top) ** 2 / 12) / self.n)
+
+    def items(self):
+        """(values đã sort, weights) của các giá trị đang giữ."""
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2 ** h, dtype=np.int64) for h, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        return values[order], weights[order]
+
+    def quantiles(self, qs: Sequence[float]) -> np.ndarray:
+        """
+        Quantiles xấp xỉ (như np.quantile khi sketch còn chính xác); q = 0 / 1 -> min / max chính xác.
+        """
+        qs = np.asarray(qs, dtype=float)
+        if self.n == 0:
+            return np.full(qs.shape, np.nan)
+        if self.is_exact:
+            return np.quantile(self.levels[0], qs)
+        values, weights = self.items()
+        cum = np.cumsum(weights)
+        idx = np.searchsorted(cum, qs * cum[-1], side="left")
+        out = values[np.clip(idx, 0, len(values) - 1)]
+        out[qs <= 0] = self.min
+        out[qs >= 1] = self.max
+        return out
+
+    # ---- serialize ----
+    def to_dict(self) -> Dict:
+        return {
+            "k": self.k,
+            "distinct_limit": self.distinct_limit,
+            "seed": self.seed,
+            "levels": [items.tolist() for items in self.levels],
+            "n": self.n,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "m2": self.m2,
+            "distinct": None if self.distinct is None else [[v, c] for v, c in self.distinct.items()],
+            "n_compactions": self.n_compactions,
+            "variance": self._variance,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "KLLSketch":
+        sketch = cls(data["k"], data["distinct_limit"], data["seed"])
+        sketch.levels = [np.asarray(items, dtype=float) for items in data["levels"]]
+        sketch.n = int(data["n"])
+        sketch.min, sketch.max = float(data["min"]), float(data["max"])
+        sketch.mean, sketch.m2 = float(data["mean"]), float(data["m2"])
+        sketch.distinct = None if data["distinct"] is None else {float(v): int(c) for v, c in data["distinct"]}
+        sketch.n_compactions = int(data["n_compactions"])
+        sketch._variance = float(data["variance"])
+        return sketch
+
+
+@dataclass
+class FrameSketch:
+    """
+    Sketch của một frame theo cột: numeric -> KLLSketch, categorical (hoặc cột khai báo numeric
+    nhưng dtype không phải số) -> value counts chính xác. Cộng dồn theo chunk / partition.
+    """
+    k: int = DEFAULT_K
+    n_rows: int = 0
+    numeric: Dict[str, KLLSketch] = field(default_factory=dict)
+    categorical: Dict[str, Dict] = field(default_factory=dict)
+    n_missing: Dict[str, int] = field(default_factory=dict)
+
+    def update(self, df: pd.DataFrame, numeric: List[str], categorical: List[str] = ()) -> "FrameSketch":
+        self.n_rows += len(df)
+        for col in list(numeric) + list(categorical):
+            if col not in df.columns:
+                continue
+            s = df[col]
+            self.n_missing[col] = self.n_missing.get(col, 0) + int(s.isna().sum())
+            if col in numeric and col not in self.categorical and pd.api.types.is_numeric_dtype(s):
+                self.numeric.setdefault(col, KLLSketch(self.k)).update(s)
+            else:
+                counts = self.categorical.setdefault(col, {})
+                for value, count in s.value_counts(dropna=True, sort=False).items():
+                    if count:
+                        value = value.item() if isinstance(value, np.generic) else value
+                        counts[value] = counts.get(value, 0) + int(count)
+        return self
+
+    def merge(self, other: "FrameSketch") -> "FrameSketch":
+        self.n_rows += other.n_rows
+        for col, sketch in other.numeric.items():
+            if col in self.numeric:
+                self.numeric[col].merge(sketch)
+            else:
+                self.numeric[col] = KLLSketch.from_dict(sketch.to_dict())
+        for col, counts in other.categorical.items():
+            mine = self.categorical.setdefault(col, {})
+            for value, count in counts.items():
+                mine[value] = mine.get(value, 0) + count
+        for col, count in other.n_missing.items():
+            self.n_missing[col] = self.n_missing.get(col, 0) + count
+        return self
+
+    def to_dict(self) -> Dict:
+        return {
+            "k": self.k,
+            "n_rows": self.n_rows,
+            "numeric": {c: s.to_dict() for c, s in self.numeric.items()},
+            "categorical": {c: [[v, n] for v, n in counts.items()] for c, counts in self.categorical.items()},
+            "n_missing": self.n_missing,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "FrameSketch":
+        return cls(
+            k=int(data["k"]),
+            n_rows=int(data["n_rows"]),
+            numeric={c: KLLSketch.from_dict(s) for c, s in data["numeric"].items()},
+            categorical={c: {v: int(n) for v, n in pairs} for c, pairs in data["categorical"].items()},
+            n_missing={c: int(n) for c, n in data["n_missing"].items()},
+        )
+
+
+def sketch_batches(batches, numeric: List[str], categorical: List[str] = (), k: int = DEFAULT_K) -> FrameSketch:
+    """FrameSketch từ một luồng chunk DataFrame (vd. data_loader.iter_frame_batches)."""
+    sketch = FrameSketch(k=k)
+    for batch in batches:
+        sketch.update(batch, numeric, categorical)
+    return sketch
+
+
+def save_sketch(sketch: FrameSketch, path) -> str:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Ghi ra file tạm rồi rename để không để lại file hỏng nếu bị ngắt giữa chừng
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(sketch.to_dict(), f, separators=(",", ":"))
+    tmp.replace(path)
+    return str(path)
+
+
+def load_sketch(path) -> FrameSketch:
+    with open(path, "r", encoding="utf-8") as f:
+        return FrameSketch.from_dict(json.load(f))
@@ -0,0 +1,181 @@
+"""
+Reference profile.
+
+Reference là baseline cố định (training data, `baseline_id` trong config), nên mọi
+thứ suy ra từ nó (drift bins, WOE tables, IV, scores đã sort, summary stats, AUC/KS)
+chỉ cần tính MỘT lần. Profile được lưu ra disk với tên file = content hash của
+reference, các lần chạy sau chỉ cần load lại và metrics đọc trực tiếp từ profile.
+
+Reference rất lớn: drift bins có thể dựng từ quantile sketch đọc stream theo chunk
+(drift_engine.stream_fit_bins) và truyền vào qua `drift_bins`; sketch đó cũng cho init
+breaks của WOE tree (`sketch`), không sort lại các cột numeric.
+"""
+import hashlib
+import json
+import pickle
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .drift_engine import ColumnBins, fit_batch_bins, fit_column_bins
+
+if TYPE_CHECKING:
+    from .breaks_artifact import ScorecardBreaks
+    from .quantile_sketch import FrameSketch
+
+# Tăng khi thay đổi nội dung / cách tính profile để cache cũ tự vô hiệu
+PROFILE_VERSION = 6
+
+
+@dataclass
+class ReferenceProfile:
+    fingerprint: str
+    n_rows: int
+    summary_stats: Dict[str, Dict[str, float]]
+    drift_bins: Dict[str, ColumnBins]
+    woe_bins: Dict[str, pd.DataFrame]
+    iv: pd.DataFrame
+    scores_sorted: np.ndarray   # prediction sort giảm dần (risk cao trước)
+    labels_sorted: np.ndarray   # target theo cùng thứ tự
+    performance: Dict[str, float]
+    woe_breaks: Optional[str] = None  # fingerprint của breaks artifact dùng cho woe_bins (None = breaks học từ reference)
+
+
+def fingerprint_frames(*frames: pd.DataFrame, settings: Optional[Dict] = None) -> str:
+    """
+    Content hash (sha256) của các DataFrame + settings dùng để build profile.
+    Hash theo giá trị từng dòng (không phụ thuộc index), tên cột và dtypes.
+    """
+    h = hashlib.sha256()
+    h.update(f"profile_v{PROFILE_VERSION}".encode())
+    if settings is not None:
+        h.update(json.dumps(settings, sort_keys=True, default=str).encode())
+    for df in frames:
+        h.update("|".join(map(str, df.columns)).encode())
+        h.update("|".join(map(str, df.dtypes)).encode())
+        h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _summary_stats(df: pd.DataFrame, columns: List[str]) -> Dict[str, Dict[str, float]]:
+    stats = {}
+    for col in columns:
+        s = df[col]
+        entry = {"count": int(s.notna().sum()), "missing": int(s.isna().sum()), "n_unique": int(s.nunique())}
+        if pd.api.types.is_numeric_dtype(s):
+            entry.update(
+                mean=float(s.mean()), std=float(s.std()),
+                min=float(s.min()), max=float(s.max()),
+            )
+        stats[col] = entry
+    return stats
+
+
+def build_reference_profile(
+    ref_df: pd.DataFrame,
+    numeric_features: List[str],
+    categorical_features: List[str],
+    target_column: str,
+    predict_column: str,
+    fingerprint: str,
+    breaks: Optional["ScorecardBreaks"] = None,
+    drift_bins: Optional[Dict[str, ColumnBins]] = None,
+    sketch: Optional["FrameSketch"] = None,
+    labeled_df: Optional[pd.DataFrame] = None,
+) -> ReferenceProfile:
+    """
+    Tính toàn bộ reference profile từ reference đã merge (features + labels + score).
+    Nếu có `breaks` (breaks artifact của scorecard) thì WOE tables dùng breaks cố định đó.
+    drift_bins: bins đã dựng sẵn (vd. drift_engine.stream_fit_bins), cột thiếu được fit trên ref_df.
+    sketch: quantile sketch của features reference -> init breaks của WOE tree cho cột numeric.
+    labeled_df: các dòng của ref_df mà stage scorecard / performance dùng (pipeline.labeled_frame);
+    WOE / IV và discrimination tính trên frame này. None = các dòng có đủ target và prediction.
+    """
+    # Import muộn để tránh vòng import (metrics -> reference_profile -> metrics)
+    from .metrics.scorecard_binning import compute_woe_binning
+    from .metrics.discrimination import compute_discrimination
+    from .metrics.woe_engine import initial_breaks_from_sketch
+
+    if labeled_df is None:
+        cols = [c for c in (target_column, predict_column) if c in ref_df.columns]
+        labeled_df = ref_df[ref_df[cols].notna().all(axis=1)]
+
+    num = [c for c in numeric_features if c in ref_df.columns]
+    cat = [c for c in categorical_features if c in ref_df.columns]
+
+    # Drift bins (features + prediction)
+    given = drift_bins or {}
+    fitted = fit_batch_bins(ref_df, [c for c in num if c not in given], [c for c in cat if c not in given])
+    drift_bins = {c: given.get(c, fitted.get(c)) for c in num + cat}
+    if predict_column in given:
+        drift_bins[predict_column] = given[predict_column]
+    elif predict_column in ref_df.columns:
+        drift_bins[predict_column] = fit_column_bins(ref_df[predict_column], predict_column)
+
+    # WOE tables + IV (IV = total_iv của cùng bảng WOE, như IVSummaryMetric / BasicWOEMetric)
+    woe_features = num + cat if breaks is None else [c for c in num + cat if c in breaks.breaks]
+    init_breaks = None
+    if sketch is not None and breaks is None:
+        init_breaks = {c: initial_breaks_from_sketch(sketch.numeric[c]) for c in num if c in sketch.numeric}
+    binning = compute_woe_binning(labeled_df, target_column, woe_features, reference=breaks, init_breaks=init_breaks)
+
+    # Scores đã sort + performance (cùng discrimination kernel với AUC / Gini / KS metrics);
+    # kernel bỏ dòng thiếu label / score (valid_pairs) -> default_rate cùng định nghĩa với DefaultRateMetric
+    disc = compute_discrimination(labeled_df[target_column], labeled_df[predict_column])
+    performance = {
+        "auc": disc.auc,
+        "gini": disc.gini,
+        "ks": float(disc.ks),
+        "default_rate": float(disc.default_rate),
+    }
+
+    return ReferenceProfile(
+        fingerprint=fingerprint,
+        n_rows=len(ref_df),
+        summary_stats=_summary_stats(ref_df, num + cat + [predict_column]),
+        drift_bins=drift_bins,
+        woe_bins=binning.bins,
+        iv=binning.iv,
+        scores_sorted=disc.scores_sorted,
+        labels_sorted=disc.labels_sorted,
+        performance=performance,
+        woe_breaks=breaks.fingerprint() if breaks is not None else None,
+    )
+
+
+def profile_path(cache_dir, fingerprint: str) -> Path:
+    return Path(cache_dir) / f"reference_profile_{fingerprint[:16]}.pkl"
+
+
+def save_reference_profile(profile: ReferenceProfile, cache_dir) -> str:
+    path = profile_path(cache_dir, profile.fingerprint)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Ghi ra file tạm rồi rename để không để lại profile hỏng nếu bị ngắt giữa chừng
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(profile, f, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp.replace(path)
+    return str(path)
+
+
+def report_reference_profile(context, path: Optional[str] = None) -> Optional[str]:
+    """
+    Path reference profile cho metric trong report: `path` nếu metric được truyền path, ngược lại
+    metadata "reference_profile" của Report (pipeline truyền qua metadata -> path tuyệt đối không
+    nằm trong metric_id / metric_name của metric).
+    """
+    if path:
+        return path
+    metadata = getattr(context.configuration, "metadata", None) or {}
+    return metadata.get("reference_profile") or None
+
+
+@lru_cache(maxsize=8)
+def load_reference_profile(path: str) -> ReferenceProfile:
+    """Load profile từ disk (cache trong process; tên file đã chứa content hash)."""
+    with open(path, "rb") as f:
+        return pickle.load(f)
@@ -0,0 +1,369 @@
+"""
+Kết quả monitoring dạng có cấu trúc.
+
+Mỗi stage lấy metrics / tests trực tiếp từ metric results của Snapshot (`stage_records`),
+không qua ev.json() rồi parse lại dict lồng nhau. run_monitoring gom các stage thành một
+MonitoringResult nhỏ gọn (pickle được, trả về từ worker process):
+- metrics:  [stage, metric_id, metric_type, metric_name, metric_value, threshold, status]
+            (tên metric theo score_model_daily.csv, xem METRIC_NAMES)
+- features: [feature_name, psi, iv_ref, iv_current, status]
+- tests:    [stage, test_id, metric_id, name, status, description]
+- widgets:  [stage, metric_name, widget_title, widget_type, size_bytes]
+            (bytes mỗi widget đóng góp vào dashboard HTML, xem html_report.widget_sizes)
+
+Export columnar: `MonitoringResult.to_arrow()` / `to_parquet(directory)`; nhiều model-period
+(vd. backfill) gộp thành một bảng mỗi loại bằng `results_to_arrow(results)`. Đọc lại bằng
+`MonitoringResult.from_arrow(tables, model_name, period)` / `read_parquet(directory, ...)`
+(vd. dựng HTML sau cho run metrics-only, xem summary_report.py).
+"""
+from dataclasses import asdict, dataclass, field, fields
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Tên metric trong bảng (như score_model_daily.csv) theo type của metric Evidently
+METRIC_NAMES = {
+    "MyValueDrift_2": "PSI_Score",
+    "DriftedColumnsCount": "Drifted_Columns_Share",
+    "DriftedFeaturesCount": "Drifted_Columns_Share",
+    "FeatureDriftHeatmap": "Feature_Period_Drift_Share",
+    "DefaultRateMetric": "Default_Rate",
+    "IVSummaryMetric": "Mean_IV",
+    "AUCMetric": "AUC_ROC",
+    "GiniMetric": "Gini",
+    "KSMetric": "KS",
+}
+# Ngưỡng tối thiểu trong config performance (status = PASS nếu value >= threshold)
+MIN_THRESHOLD_KEYS = {"AUC_ROC": "target_auc_min", "Gini": "target_gini_min", "KS": "target_ks_min"}
+# Metrics không có giá trị số có nghĩa (widget WOE) -> không có record
+SKIP_METRICS = {"BasicWOEMetric"}
+
+_STATUS = {"SUCCESS": "PASS", "FAIL": "FAIL", "WARNING": "WARN", "ERROR": "ERROR", "SKIPPED": "SKIP"}
+_STATUS_ORDER = ["SKIP", "PASS", "WARN", "ERROR", "FAIL"]
+
+
+@dataclass
+class MetricRecord:
+    stage: str
+    metric_id: str
+    metric_type: str
+    metric_name: str
+    metric_value: Optional[float]
+    threshold: Optional[float] = None
+    status: Optional[str] = None
+
+
+@dataclass
+class FeatureRecord:
+    feature_name: str
+    psi: Optional[float] = None
+    iv_ref: Optional[float] = None
+    iv_current: Optional[float] = None
+    status: Optional[str] = None
+
+
+@dataclass
+class TestRecord:
+    stage: str
+    test_id: str
+    metric_id: str
+    name: str
+    status: str
+    description: str = ""
+
+
+@dataclass
+class WidgetRecord:
+    stage: str
+    metric_name: str
+    widget_title: str
+    widget_type: str
+    size_bytes: int
+
+
+@dataclass
+class StageRecords:
+    """Records của một stage; features = psi theo feature (stage drift) / IV theo feature (stage scorecard)."""
+    stage: str
+    metrics: List[MetricRecord] = field(default_factory=list)
+    tests: List[TestRecord] = field(default_factory=list)
+    features: List[FeatureRecord] = field(default_factory=list)
+    widgets: List[WidgetRecord] = field(default_factory=list)
+
+
+def _scalar(value) -> Optional[float]:
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float, np.floating, np.integer)):
+        return float(value)
+    return None
+
+
+def _status(test) -> Optional[str]:
+    return _STATUS.get(getattr(test.status, "value", test.status))
+
+
+def _worst(left: Optional[str], right: Optional[str]) -> Optional[str]:
+    if left is None or right is None:
+        return left or right
+    return max(left, right, key=_STATUS_ORDER.index)
+
+
+def stage_records(
+    stage: str,
+    ev,
+    performance_config: Optional[Dict] = None,
+    psi_threshold: Optional[float] = None,
+) -> StageRecords:
+    """
+    Records từ Snapshot `ev` của một stage (cùng nội dung với ev.dict(), không serialize).
+    Metric có tên trong METRIC_NAMES dùng tên đó; metric khác dùng metric_name của Evidently,
+    value dạng dict (vd. {count, share}) được tách thành "<metric_name>.<key>".
+    Status của metric = test xấu nhất của metric đó; AUC / Gini / KS có ngưỡng trong config
+    performance thì status = PASS nếu value >= ngưỡng. psi / status của feature lấy từ
+    ValueDrift / FeatureDrift (method=psi) (psi >= psi_threshold nếu metric không có test).
+    """
+    performance_config = performance_config or {}
+    records = StageRecords(stage)
+    results = ev.metric_results
+    for key in ev._top_level_metrics:
+        result = results.get(key)
+        if result is None or result.metric_value_location is None:
+            continue
+        metric = result.metric_value_location.metric
+        metric_id = str(metric.metric_id)
+        config = metric.params
+        metric_type = config.get("type", "").split(":")[-1]
+
+        status = None
+        for test in result.tests:
+            test_status = _status(test)
+            status = _worst(status, test_status)
+            records.tests.append(TestRecord(
+                stage=stage,
+                test_id=str(test.id),
+                metric_id=str(test.metric_config.metric_id),
+                name=test.name,
+                status=test_status or str(test.status),
+                description=test.description,
+            ))
+        if metric_type in SKIP_METRICS:
+            continue
+
+        value = result.to_simple_dict()
+        name = METRIC_NAMES.get(metric_type, result.explicit_metric_id())
+        threshold = _scalar(config.get("threshold", config.get("drift_share")))
+        if name in MIN_THRESHOLD_KEYS and performance_config.get(MIN_THRESHOLD_KEYS[name]) is not None:
+            threshold = float(performance_config[MIN_THRESHOLD_KEYS[name]])
+            status = "PASS" if _scalar(value) is not None and value >= threshold else "FAIL"
+
+        row = dict(stage=stage, metric_id=metric_id, metric_type=metric_type, threshold=threshold, status=status)
+        if isinstance(value, dict):
+            if metric_type in METRIC_NAMES and "share" in value:
+                records.metrics.append(MetricRecord(metric_name=name, metric_value=_scalar(value["share"]), **row))
+            else:
+                records.metrics.extend(
+                    MetricRecord(metric_name=f"{name}.{k}", metric_value=_scalar(v), **row)
+                    for k, v in value.items() if _scalar(v) is not None
+                )
+        elif _scalar(value) is not None:
+            records.metrics.append(MetricRecord(metric_name=name, metric_value=_scalar(value), **row))
+
+        if metric_type in ("ValueDrift", "FeatureDrift") and config.get("method") == "psi":
+            psi = _scalar(value)
+            if status is None and psi is not None and psi_threshold is not None:
+                status = "FAIL" if psi >= psi_threshold else "PASS"
+            records.features.append(FeatureRecord(config["column"], psi=psi, status=status))
+    return records
+
+
+def feature_iv_records(feature_iv: pd.DataFrame) -> List[FeatureRecord]:
+    """feature_iv: DataFrame [feature, iv_ref, iv_current] (metrics.IVSummaryMetric.get_feature_iv)."""
+    return [
+        FeatureRecord(rec["feature"], iv_ref=_scalar(rec.get("iv_ref")), iv_current=_scalar(rec.get("iv_current")))
+        for rec in feature_iv.to_dict("records")
+    ]
+
+
+def reference_drift_records(
+    table: pd.DataFrame,
+    psi_threshold: float,
+    drift_share: Optional[float] = None,
+    stage: str = "drift_references",
+) -> StageRecords:
+    """
+    Records từ accumulators.reference_drift_table: mỗi reference (gồm baseline, cùng bins PSI
+    với kỳ trước / trailing để so sánh được với nhau) -> Drifted_Columns_Share_vs_<reference>
+    (cột có psi >= psi_threshold, không tính cột thiếu counts phía reference) và Mean_PSI_vs_<reference>.
+    """
+    records = StageRecords(stage)
+    for reference, group in table.groupby("reference", sort=False):
+        psi = group["psi"].dropna()
+        share = float((psi >= psi_threshold).mean()) if len(psi) else None
+        status = None
+        if share is not None and drift_share is not None:
+            status = "FAIL" if share >= drift_share else "PASS"
+        row = dict(stage=stage, metric_id=f"reference_drift:{reference}", metric_type="ReferenceDrift")
+        records.metrics.append(MetricRecord(
+            metric_name=f"Drifted_Columns_Share_vs_{reference}", metric_value=share,
+            threshold=_scalar(drift_share), status=status, **row,
+        ))
+        records.metrics.append(MetricRecord(
+            metric_name=f"Mean_PSI_vs_{reference}", metric_value=float(psi.mean()) if len(psi) else None, **row,
+        ))
+    return records
+
+
+def _schema(record_type, extra: Dict[str, pa.DataType]) -> pa.Schema:
+    types = {"metric_value": pa.float64(), "threshold": pa.float64(), "psi": pa.float64(),
+             "iv_ref": pa.float64(), "iv_current": pa.float64(), "size_bytes": pa.int64()}
+    keys = [pa.field(k, t) for k, t in extra.items()]
+    return pa.schema(keys + [pa.field(f.name, types.get(f.name, pa.string())) for f in fields(record_type)])
+
+
+_KEYS = {"model_name": pa.string(), "period": pa.string()}
+SCHEMAS = {
+    "metrics": _schema(MetricRecord, _KEYS),
+    "features": _schema(FeatureRecord, _KEYS),
+    "tests": _schema(TestRecord, _KEYS),
+    "widgets": _schema(WidgetRecord, _KEYS),
+}
+_RECORD_TYPES = {"metrics": MetricRecord, "features": FeatureRecord, "tests": TestRecord, "widgets": WidgetRecord}
+
+
+@dataclass
+class MonitoringResult:
+    """Kết quả run_monitoring của một (model_name, period)."""
+    model_name: str
+    period: str
+    html_path: Optional[str] = None
+    stage_html: Dict[str, str] = field(default_factory=dict)
+    metrics: List[MetricRecord] = field(default_factory=list, repr=False)
+    features: List[FeatureRecord] = field(default_factory=list, repr=False)
+    tests: List[TestRecord] = field(default_factory=list, repr=False)
+    widgets: List[WidgetRecord] = field(default_factory=list, repr=False)
+    failed_stages: List[str] = field(default_factory=list)
+
+    def __fspath__(self) -> str:
+        # Tương thích với code cũ dùng giá trị trả về của run_monitoring như path
+        if self.html_path is None:
+            raise TypeError(
+                f"No HTML report for {self.model_name} {self.period} (metrics_only mode or no stage rendered); "
+                f"build it with render_result() or use .html_path"
+            )
+        return self.html_path
+
+    def add_stage(self, records: StageRecords, html_path: Optional[str] = None) -> None:
+        self.metrics.extend(records.metrics)
+        self.tests.extend(records.tests)
+        self.widgets.extend(records.widgets)
+        self._merge_features(records.features)
+        if html_path is not None:
+            self.stage_html[records.stage] = html_path
+
+    def _merge_features(self, records: Iterable[FeatureRecord]) -> None:
+        by_name = {f.feature_name: f for f in self.features}
+        for record in records:
+            existing = by_name.get(record.feature_name)
+            if existing is None:
+                self.features.append(record)
+                by_name[record.feature_name] = record
+                continue
+            for name in ("psi", "iv_ref", "iv_current", "status"):
+                if getattr(record, name) is not None:
+                    setattr(existing, name, getattr(record, name))
+
+    def metric(self, metric_name: str, stage: Optional[str] = None) -> Optional[float]:
+        """Giá trị của metric theo tên (vd. "AUC_ROC"); None nếu không có."""
+        for record in self.metrics:
+            if record.metric_name == metric_name and (stage is None or record.stage == stage):
+                return record.metric_value
+        return None
+
+    @property
+    def failed_tests(self) -> List[TestRecord]:
+        return [t for t in self.tests if t.status == "FAIL"]
+
+    def _frame(self, kind: str) -> pd.DataFrame:
+        columns = [f.name for f in fields(_RECORD_TYPES[kind])]
+        return pd.DataFrame([asdict(r) for r in getattr(self, kind)], columns=columns)
+
+    def metrics_frame(self) -> pd.DataFrame:
+        return self._frame("metrics")
+
+    def features_frame(self) -> pd.DataFrame:
+        return self._frame("features")
+
+    def tests_frame(self) -> pd.DataFrame:
+        return self._frame("tests")
+
+    def widgets_frame(self) -> pd.DataFrame:
+        return self._frame("widgets")
+
+    def to_arrow(self) -> Dict[str, pa.Table]:
+        """Một pyarrow.Table cho mỗi loại record (metrics / features / tests / widgets), có thêm model_name, period."""
+        keys = {"model_name": self.model_name, "period": str(self.period)}
+        return {
+            kind: pa.Table.from_pylist([{**keys, **asdict(r)} for r in getattr(self, kind)], schema=schema)
+            for kind, schema in SCHEMAS.items()
+        }
+
+    def to_parquet(self, directory) -> Dict[str, str]:
+        """Ghi <directory>/<model>_<period>_<kind>.parquet. Return kind -> path."""
+        return write_parquet(self.to_arrow(), directory, f"{self.model_name}_{self.period}")
+
+    @classmethod
+    def from_arrow(cls, tables: Dict[str, pa.Table], model_name: str, period: str) -> "MonitoringResult":
+        """Records của (model_name, period) từ các bảng của to_arrow / results_to_arrow (thiếu loại nào thì rỗng)."""
+        result = cls(model_name, str(period))
+        for kind, record_type in _RECORD_TYPES.items():
+            table = tables.get(kind)
+            if table is None:
+                continue
+            names = [f.name for f in fields(record_type)]
+            getattr(result, kind).extend(
+                record_type(**{name: row.get(name) for name in names})
+                for row in table.to_pylist()
+                if row["model_name"] == model_name and row["period"] == str(period)
+            )
+        return result
+
+
+def results_to_arrow(results: Iterable[Optional[MonitoringResult]]) -> Dict[str, pa.Table]:
+    """Gộp kết quả của nhiều model-period thành một bảng cho mỗi loại record (bỏ qua None)."""
+    tables = [r.to_arrow() for r in results if r is not None]
+    return {
+        kind: pa.concat_tables([t[kind] for t in tables]) if tables else schema.empty_table()
+        for kind, schema in SCHEMAS.items()
+    }
+
+
+def read_parquet(directory, model_name: str, period: str) -> MonitoringResult:
+    """Đọc lại <directory>/<model>_<period>_<kind>.parquet (MonitoringResult.to_parquet)."""
+    directory = Path(directory)
+    tables = {}
+    for kind in SCHEMAS:
+        path = directory / f"{model_name}_{period}_{kind}.parquet"
+        if path.exists():
+            tables[kind] = pq.read_table(path)
+    if not tables:
+        raise FileNotFoundError(f"No stored results for {model_name} / {period} in {directory}")
+    return MonitoringResult.from_arrow(tables, model_name, period)
+
+
+def write_parquet(tables: Dict[str, pa.Table], directory, prefix: str) -> Dict[str, str]:
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = {}
+    for kind, table in tables.items():
+        path = directory / f"{prefix}_{kind}.parquet"
+        # Ghi ra file tạm rồi rename để không để lại file hỏng nếu bị ngắt giữa chừng
+        tmp = path.with_name(path.name + ".tmp")
+        pq.write_table(table, tmp)
+        tmp.replace(path)
+        paths[kind] = str(path)
+    return paths
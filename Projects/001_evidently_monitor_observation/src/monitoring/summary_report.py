@@ -0,0 +1,83 @@
+"""
+HTML tóm tắt dựng từ kết quả đã lưu (MonitoringResult, hoặc Parquet của to_parquet qua
+results.read_parquet), không cần data hay Snapshot của Evidently.
+
+Dùng cho run metrics-only (`output.report_mode: metrics_only`): run theo lịch chỉ tính metrics
++ tests và lưu kết quả, HTML tạo sau khi cần (GenericModelMonitor.render_result). Widgets là
+widgets chuẩn của Evidently (counter / table / plotly) -> render bằng html_report như report
+thường (single file hoặc dashboard). Figure cần raw data (KS curve, WOE theo bin) không có
+trong kết quả đã lưu -> muốn có thì chạy lại period đó với report_mode single_file / dashboard.
+"""
+from typing import List, Optional
+
+import numpy as np
+import plotly.graph_objects as go
+from evidently.legacy.model.widget import BaseWidgetInfo
+from evidently.legacy.renderers.html_widgets import CounterData, counter, plotly_figure, table_data
+
+from src.monitoring.html_report import RenderedReport, render_widgets
+from src.monitoring.metrics.plot_budget import PlotBudget
+from src.monitoring.results import MonitoringResult
+
+
+def _fmt(value: Optional[float]) -> str:
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return "-"
+    return f"{value:.4f}"
+
+
+def summary_widgets(result: MonitoringResult, budget: Optional[PlotBudget] = None) -> List[BaseWidgetInfo]:
+    """Counter tổng quan + bảng metrics theo stage + PSI / IV theo feature + bảng tests (FAIL trước)."""
+    budget = budget or PlotBudget()
+    failed = result.failed_tests
+    widgets = [counter(
+        title=f"{result.model_name} | {result.period}",
+        counters=[
+            CounterData("Metrics", str(len(result.metrics))),
+            CounterData("Tests failed", f"{len(failed)}/{len(result.tests)}"),
+            CounterData("Failed stages", ", ".join(result.failed_stages) or "-"),
+        ],
+    )]
+
+    stages = list(dict.fromkeys(m.stage for m in result.metrics))
+    for stage in stages:
+        widgets.append(table_data(
+            title=f"Metrics: {stage}",
+            column_names=["Metric", "Value", "Threshold", "Status"],
+            data=[
+                [m.metric_name, _fmt(m.metric_value), _fmt(m.threshold), m.status or "-"]
+                for m in result.metrics if m.stage == stage
+            ],
+        ))
+
+    if result.features:
+        # Feature drift nhất trước, số feature vẽ theo size budget
+        features = sorted(result.features, key=lambda f: -1 if f.psi is None else f.psi, reverse=True)
+        shown = features[:budget.max_features]
+        fig = go.Figure()
+        fig.add_trace(go.Bar(x=[f.feature_name for f in shown], y=[f.psi for f in shown], name="PSI"))
+        fig.add_trace(go.Bar(x=[f.feature_name for f in shown], y=[f.iv_ref for f in shown], name="IV reference"))
+        fig.add_trace(go.Bar(x=[f.feature_name for f in shown], y=[f.iv_current for f in shown], name="IV current"))
+        fig.update_layout(barmode="group", xaxis_title="Feature", height=420, legend_title="")
+        widgets.append(plotly_figure(title=f"PSI / IV by feature ({len(shown)}/{len(features)})", figure=fig))
+        widgets.append(table_data(
+            title="Features",
+            column_names=["Feature", "PSI", "IV reference", "IV current", "Status"],
+            data=[
+                [f.feature_name, _fmt(f.psi), _fmt(f.iv_ref), _fmt(f.iv_current), f.status or "-"]
+                for f in features
+            ],
+        ))
+
+    if result.tests:
+        tests = failed + [t for t in result.tests if t.status != "FAIL"]
+        widgets.append(table_data(
+            title="Tests",
+            column_names=["Stage", "Test", "Status", "Description"],
+            data=[[t.stage, t.name, t.status, t.description] for t in tests],
+        ))
+    return widgets
+
+
+def render_result(result: MonitoringResult, budget: Optional[PlotBudget] = None) -> RenderedReport:
+    return render_widgets(summary_widgets(result, budget))
@@ -17,13 +17,8 @@ def replace_html_content(format_html_path, new_content):
     return new_html_content
 
 def get_html_from_evidently(ev_report):
-    """Return HTML content as string from Evidently report object."""
-    import tempfile
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".html")
-    ev_report.save_html(tmp.name)
-    with open(tmp.name, "r", encoding="utf-8") as f:
-        html = f.read()
-    return html
+    """Return HTML content as string from Evidently report object (render trong memory, không qua file tạm)."""
+    return ev_report.get_html_str(as_iframe=False)
 
 def get_from_file(path):
     print(f"path: {path}")